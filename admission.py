@@ -0,0 +1,164 @@
+import asyncio
+import collections
+import contextvars
+import math
+import time
+
+# ----------------------------- ADMISSION CONTROL -----------------------------
+# Saat pasar buka, request /predict datang serentak. Tanpa batas semuanya antre di
+# pool sampai klien menyerah (timeout 30 detik) dan kerja yang sudah dilakukan terbuang.
+# - in-flight + antrean terbatas: kalau penuh langsung 503 + Retry-After
+# - token bucket per klien: satu klien tidak bisa menghabiskan kapasitas (429)
+# - deadline dari header X-Request-Timeout: kerja untuk klien yang sudah menyerah
+#   dibuang sebelum inferensi (504)
+
+DEADLINE_HEADER = "x-request-timeout"  # detik relatif, tidak bergantung jam klien
+CLIENT_HEADER = "x-client-id"
+
+deadline = contextvars.ContextVar("smartfish_deadline", default=None)
+
+class Rejected(Exception):
+    def __init__(self, status_code: int, reason: str, detail: str, retry_after: float = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.reason = reason  # label metrik: queue_full, queue_timeout, rate_limited, deadline
+        self.detail = detail
+        self.retry_after = retry_after
+
+    def headers(self):
+        if self.retry_after is None:
+            return None
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+class TokenBucket:
+    """Token bucket per klien; klien yang lama tidak aktif dibuang (LRU, max_clients)."""
+
+    def __init__(self, rate: float, burst: int, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_clients = max_clients
+        self._buckets = collections.OrderedDict()  # client -> (tokens, last)
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def take(self, client: str, now: float = None):
+        """(ok, retry_after_detik)."""
+        if not self.enabled:
+            return True, 0.0
+        now = time.monotonic() if now is None else now
+        tokens, last = self._buckets.pop(client, (float(self.burst), now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        ok = tokens >= 1.0
+        if ok:
+            tokens -= 1.0
+        self._buckets[client] = (tokens, now)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return ok, 0.0 if ok else (1.0 - tokens) / self.rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+class Admission:
+    def __init__(self, max_inflight: int, max_queue: int, queue_timeout: float,
+                 rate: float = 0.0, burst: int = 1, default_timeout: float = 0.0, max_clients: int = 10000):
+        self.max_inflight = max(1, max_inflight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.default_timeout = default_timeout
+        self.buckets = TokenBucket(rate, burst, max_clients)
+        self.inflight = 0
+        self._waiters = collections.deque()
+        self.admitted = 0
+        self.rejected = collections.Counter()  # reason -> jumlah
+        self.queue_wait_total = 0.0
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def client_id(self, headers, client_host: str = None):
+        return (headers.get(CLIENT_HEADER) or client_host or "unknown")[:128]
+
+    def request_deadline(self, headers, now: float, default: float = None):
+        default = self.default_timeout if default is None else default
+        try:
+            timeout = float(headers.get(DEADLINE_HEADER) or default)
+        except ValueError:
+            timeout = default
+        return now + timeout if timeout > 0 else None
+
+    def check_deadline(self, stage: str):
+        """Dipanggil sebelum kerja mahal (decode, inferensi); tanpa deadline tidak melakukan apa pun."""
+        d = deadline.get()
+        if d is not None and time.monotonic() >= d:
+            raise self._reject(504, "deadline", f"Deadline request terlewati sebelum {stage}; klien sudah berhenti menunggu.")
+
+    def _reject(self, status: int, reason: str, detail: str, retry_after: float = None):
+        self.rejected[reason] += 1
+        return Rejected(status, reason, detail, retry_after)
+
+    def _retry_hint(self):
+        # perkiraan kasar: antrean penuh butuh kira-kira satu putaran queue_timeout untuk turun
+        return max(1.0, min(self.queue_timeout, 30.0))
+
+    async def acquire(self, client: str, until: float = None):
+        """Ambil slot in-flight; Rejected kalau dibatasi, antrean penuh, atau deadline lewat saat menunggu."""
+        ok, retry = self.buckets.take(client)
+        if not ok:
+            raise self._reject(429, "rate_limited", "Terlalu banyak request dari klien ini, coba lagi sebentar.", retry)
+        if self.inflight < self.max_inflight and not self._waiters:
+            self.inflight += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject(503, "queue_full", "Server sedang penuh, coba lagi sebentar.", self._retry_hint())
+
+        # antre FIFO; slot diserahkan langsung oleh release() ke waiter terdepan
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        t0 = time.monotonic()
+        wait = self.queue_timeout
+        if until is not None:
+            wait = min(wait, until - t0)
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), max(0.0, wait))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if fut.done() and not fut.cancelled():
+                self.release()  # slot diserahkan tepat saat timeout / batal; teruskan ke waiter berikutnya
+            else:
+                fut.cancel()
+                self._waiters.remove(fut)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            if until is not None and time.monotonic() >= until:
+                raise self._reject(504, "deadline", "Deadline request terlewati saat menunggu antrean.")
+            raise self._reject(503, "queue_timeout", "Server sedang penuh, coba lagi sebentar.", self._retry_hint())
+        finally:
+            self.queue_wait_total += time.monotonic() - t0
+        self.admitted += 1
+
+    def release(self):
+        # serahkan slot ke waiter terdepan yang masih menunggu, kalau tidak ada kurangi in-flight
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.inflight -= 1
+
+    def stats(self):
+        return {
+            "inflight": self.inflight,
+            "max_inflight": self.max_inflight,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "queue_timeout_s": self.queue_timeout,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "queue_wait_s_total": round(self.queue_wait_total, 3),
+            "rate_limit": {"rate_per_s": self.buckets.rate, "burst": self.buckets.burst, "clients": len(self.buckets)},
+            "default_timeout_s": self.default_timeout,
+        }
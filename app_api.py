@@ -1,10 +1,128 @@
-from fastapi import FastAPI, UploadFile, File, Form
-from PIL import Image
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, WebSocket
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.datastructures import UploadFile as StarletteUploadFile
+from starlette.exceptions import HTTPException as StarletteHTTPException
 from io import BytesIO
+from PIL import Image
+from typing import List, Optional
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+import asyncio
+import contextvars
+import functools
 import hashlib
-import random
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+
+import config
+import profiling
+from admission import Admission, Rejected, deadline
+from cache import DiskTier, PredictionCache, cache_key
+from dedup import NearDuplicateIndex
+from executor import Executors
+from exports import FEEDBACK_CSV_FIELDS, HISTORY_CSV_FIELDS, iter_csv, iter_encoded, iter_ndjson
+from image_store import ImageStore, parse_roi_box
+from imaging import ImageRejected, decode_to_size, dhash, probe_image
+from jobs import ARCHIVE_NAME, JOB_ID_RE, JobRunner, JobStore
+from quality import assess_quality, quality_config
+from metrics import CONTENT_TYPE, LATENCY_BUCKETS, SIZE_BUCKETS, Counter, Gauge, Histogram, Registry
+from reports import make_batch_pdf
+from models import ModelRegistry, ModelUnavailable
+from predictors import MicroBatcher, PredictInput, stable_scores
+from storage import FeedbackStore, HistoryStore
+from streaming import FrameStream
+from uploads import CHUNK_SIZE, BodySizeLimitMiddleware, stream_digest, too_large
+
+# thread pool (decode/hash) + process pool (scoring), ukuran dari config.py
+pools = Executors.from_config()
+
+cache = PredictionCache(
+    max_entries=config.CACHE_ENTRIES,
+    max_bytes=config.CACHE_MB * 1024 * 1024,
+    ttl=config.CACHE_TTL,
+    disk=DiskTier(config.CACHE_DB, config.CACHE_TTL) if config.CACHE_DB else None,
+    run_io=pools.io.run,
+    private_error=lambda e: isinstance(e, HTTPException) and e.status_code == 504,
+)
+
+profiler = profiling.Profiler(
+    root=config.PROFILE_DIR,
+    mode=config.PROFILE_MODE,
+    sample_every=config.PROFILE_SAMPLE_N,
+    keep=config.PROFILE_KEEP,
+    token=config.PROFILE_TOKEN,
+    interval_ms=config.PROFILE_INTERVAL_MS,
+)
+
+admission = Admission(
+    max_inflight=config.MAX_INFLIGHT,
+    max_queue=config.MAX_QUEUE,
+    queue_timeout=config.QUEUE_TIMEOUT,
+    rate=config.RATE_LIMIT_RPS,
+    burst=config.RATE_LIMIT_BURST,
+    default_timeout=config.REQUEST_TIMEOUT,
+)
 
-app = FastAPI(title="SmartFresh-ID API (Stable Demo Multi Komoditas)")
+near_dups = NearDuplicateIndex(
+    mode=config.DEDUP_MODE,
+    distance=config.DEDUP_DISTANCE,
+    ttl=config.DEDUP_TTL,
+    max_entries=config.DEDUP_MAX_ENTRIES,
+    hasher=config.DEDUP_HASH,
+)
+
+images = ImageStore(
+    root=config.IMAGE_DIR,
+    ttl=config.IMAGE_TTL,
+    max_items=config.IMAGE_MAX_ITEMS,
+    max_decoded_bytes=config.IMAGE_DECODED_MB * 1024 * 1024,
+)
+
+async def sweep_images():
+    # image session kedaluwarsa (file + metadata) dibersihkan berkala, bukan hanya saat start / get()
+    while True:
+        await asyncio.sleep(max(1.0, config.IMAGE_TTL / 4))
+        try:
+            await pools.io.run(images.cleanup)
+        except OSError:
+            pass  # folder sempat tidak bisa dibaca: coba lagi putaran berikutnya
+
+@asynccontextmanager
+async def lifespan(app):
+    global preload_task
+    pools.start()
+    # warm-up model di background: /health langsung hidup, /ready 503 sampai selesai
+    preload_task = asyncio.create_task(model_registry.preload(PRELOAD_MODELS))
+    await pools.io.run(images.cleanup)  # sisa image session dari proses sebelumnya
+    sweep_task = asyncio.create_task(sweep_images())
+    await start_jobs()
+    yield
+    sweep_task.cancel()
+    preload_task.cancel()
+    await job_runner.close()
+    for b in list(batchers.values()):
+        await b.close()
+    batchers.clear()
+    pools.shutdown()
+    cache.close()
+
+app = FastAPI(title="SmartFresh-ID API (Stable Demo Multi Komoditas)", lifespan=lifespan)
+
+MAX_UPLOAD_BYTES = config.MAX_UPLOAD_MB * 1024 * 1024
+# resolusi minimum sudah dicek probe_image (MIN_IMAGE_SIDE); gate API hanya blur & exposure
+QUALITY_CFG = quality_config({"min_side": 0, **config.QUALITY})
+MAX_BATCH_BYTES = config.MAX_BATCH_MB * 1024 * 1024
+
+# +64 KB untuk overhead multipart & field form lain
+app.add_middleware(BodySizeLimitMiddleware, limits={
+    "/predict": MAX_UPLOAD_BYTES + 64 * 1024,
+    "/predict/batch": MAX_BATCH_BYTES,
+    "/images": MAX_UPLOAD_BYTES + 64 * 1024,
+    "/jobs": config.MAX_JOB_MB * 1024 * 1024,
+})
 
 # Kelas prediksi per komoditas (bisa kamu tambah nanti)
 SPECIES_CLASSES = {
@@ -13,6 +131,131 @@ SPECIES_CLASSES = {
     "daging": ["segar", "kurang_segar", "tidak_layak"],
 }
 
+# Batas batch (satu kiriman dari meja timbang / intake pasar)
+MAX_BATCH_ITEMS = 200
+BATCH_IMAGE_EXT = (".jpg", ".jpeg", ".png")
+
+# ----------------------------- METRICS -----------------------------
+# Per-stage /predict: read (baca file upload), probe (header PIL), hash (sha256),
+# quality (quality gate, hanya cache miss), decode (piksel, hanya backend yang butuh), score (batcher + pool, hanya cache miss),
+# serialize (JSON), total (handler). Receive/parse multipart terjadi sebelum handler.
+PREDICT_STAGES = ("read", "probe", "hash", "quality", "decode", "score", "serialize", "total")
+
+registry = Registry()
+stage_seconds = registry.add(Histogram(
+    "smartfish_predict_stage_seconds", "Durasi tiap tahap prediksi per endpoint (/predict, /predict/batch, /jobs, /ws/predict).",
+    LATENCY_BUCKETS, ["endpoint", "stage"], preset=[("/predict", st) for st in PREDICT_STAGES],
+))
+# endpoint pemilik tahap; item batch / job / frame lewat jalur yang sama dengan /predict.
+# Dibaca di event loop (thread pool tidak mewarisi contextvar) lalu diteruskan sebagai argumen.
+stage_endpoint = contextvars.ContextVar("smartfish_stage_endpoint", default="/predict")
+payload_bytes = registry.add(Histogram(
+    "smartfish_predict_payload_bytes", "Ukuran file gambar yang diupload (byte).", SIZE_BUCKETS, preset=[()],
+))
+predictions_total = registry.add(Counter(
+    "smartfish_predictions_total", "Jumlah prediksi per komoditas & kelas.", ["species", "prediction"],
+))
+predict_errors = registry.add(Counter(
+    "smartfish_predict_errors_total", "Request /predict yang gagal per status HTTP.", ["status"],
+))
+predict_inflight = 0
+registry.add(Gauge("smartfish_predict_inflight", "Request /predict yang sedang diproses.", lambda: predict_inflight))
+registry.add(Gauge("smartfish_admission_inflight", "Slot admission yang terpakai (/predict & /predict/batch).", lambda: admission.inflight))
+registry.add(Gauge("smartfish_admission_queue_depth", "Request yang menunggu slot admission.", lambda: admission.queued))
+registry.add(Gauge("smartfish_admission_admitted_total", "Request yang mendapat slot admission.", lambda: admission.admitted, kind="counter"))
+registry.add(Gauge(
+    "smartfish_admission_rejected_total", "Request yang ditolak admission per alasan (queue_full, queue_timeout, rate_limited, deadline).",
+    lambda: {(k,): v for k, v in admission.rejected.items()}, ["reason"], kind="counter",
+))
+
+def _pool_stat(field):
+    return lambda: {(name,): st[field] for name, st in pools.stats().items()}
+
+registry.add(Gauge("smartfish_pool_inflight", "Task berjalan + antre per pool.", _pool_stat("inflight"), ["pool"]))
+registry.add(Gauge("smartfish_pool_queue_depth", "Task yang menunggu worker per pool.", _pool_stat("queue_depth"), ["pool"]))
+registry.add(Gauge("smartfish_pool_completed_total", "Task selesai per pool.", _pool_stat("completed"), ["pool"], kind="counter"))
+registry.add(Gauge("smartfish_pool_failed_total", "Task gagal per pool.", _pool_stat("failed"), ["pool"], kind="counter"))
+
+def _cache_stat(field):
+    return lambda: cache.stats()[field]
+
+registry.add(Gauge("smartfish_cache_entries", "Entri cache prediksi di memori.", _cache_stat("entries")))
+registry.add(Gauge("smartfish_cache_bytes", "Perkiraan byte cache prediksi.", _cache_stat("bytes")))
+registry.add(Gauge("smartfish_cache_inflight", "Komputasi yang sedang di-coalesce.", _cache_stat("inflight")))
+registry.add(Gauge(
+    "smartfish_cache_lookups_total", "Lookup cache prediksi per hasil.",
+    lambda: {(k,): cache.stats()[k] for k in ("hits", "disk_hits", "misses", "coalesced")}, ["result"], kind="counter",
+))
+registry.add(Gauge(
+    "smartfish_batch_queued", "Item menunggu di antrean micro-batch.",
+    lambda: {(sp,): b.stats()["queued"] for sp, b in list(batchers.items())}, ["model"],
+))
+registry.add(Gauge(
+    "smartfish_batch_avg_size", "Rata-rata ukuran micro-batch.",
+    lambda: {(sp,): b.stats()["avg_batch"] for sp, b in list(batchers.items())}, ["model"],
+))
+registry.add(Gauge(
+    "smartfish_model_resident_bytes", "Perkiraan memori model torch yang sedang dimuat.",
+    lambda: {(k,): e.bytes for k, e in model_registry.entries.items() if e.path and e.state == "ready"}, ["model"],
+))
+registry.add(Gauge(
+    "smartfish_model_evictions_total", "Model yang dievict karena melewati SMARTFISH_MODEL_BUDGET_MB.",
+    lambda: model_registry.evictions, kind="counter",
+))
+registry.add(Gauge(
+    "smartfish_jobs", "Job async per status (queued, running, done, failed).",
+    lambda: {(k,): v for k, v in job_runner.counts.items()} if job_runner is not None else {}, ["status"],
+))
+registry.add(Gauge(
+    "smartfish_job_items_total", "Item job async yang selesai diproses di proses ini.",
+    lambda: job_runner.items_done if job_runner is not None else 0, kind="counter",
+))
+dedup_total = registry.add(Counter(
+    "smartfish_dedup_total", "Lookup near-duplicate saat cache miss per hasil (reused, flagged, miss).", ["result"],
+))
+registry.add(Gauge("smartfish_dedup_entries", "Entri index near-duplicate.", lambda: near_dups.stats()["entries"]))
+registry.add(Gauge("smartfish_image_sessions", "Image session aktif (POST /images).", lambda: images.stats()["images"]))
+ws_frames = registry.add(Counter(
+    "smartfish_ws_frames_total", "Frame /ws/predict per hasil (processed, duplicate, dropped, rejected, error, too_large).", ["result"],
+))
+registry.add(Gauge("smartfish_ws_clients", "Koneksi /ws/predict aktif.", lambda: ws_clients))
+
+def species_label(species: str):
+    # label dibatasi ke komoditas yang dikenal supaya input bebas tidak menambah seri baru
+    return species if species in SPECIES_CLASSES else "other"
+
+def timed(endpoint: str, stage: str, fn, *args):
+    t = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        stage_seconds.observe(time.perf_counter() - t, (endpoint, stage))
+
+@app.get("/metrics")
+async def metrics():
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+# ----------------------------- PROFILES -----------------------------
+def require_profiler(request: Request):
+    if not profiler.enabled:
+        raise HTTPException(404, "Profiling tidak aktif (set SMARTFISH_PROFILE=cprofile|sample).")
+    if not profiler.authorized(request.headers):
+        raise HTTPException(403, "Header X-SmartFish-Profile tidak cocok dengan token.")
+
+@app.get("/profiles")
+async def list_profiles(request: Request):
+    require_profiler(request)
+    return {"profiler": profiler.stats(), "profiles": await pools.io.run(profiler.list)}
+
+@app.get("/profiles/{name}")
+async def download_profile(name: str, request: Request):
+    require_profiler(request)
+    path = profiler.path(name)
+    if path is None:
+        raise HTTPException(404, "Profil tidak ditemukan.")
+    media = "application/octet-stream" if name.endswith(".prof") else "text/plain; charset=utf-8"
+    return FileResponse(path, media_type=media, filename=name)
+
 @app.get("/")
 def root():
     return {
@@ -20,31 +263,107 @@ def root():
         "supported_species": list(SPECIES_CLASSES.keys()),
     }
 
+# async: tidak antre di threadpool, jadi tetap cepat walau pool inferensi penuh
 @app.get("/health")
-def health():
+async def health():
     return {
         "status": "ok",
         "mode": "stable-demo-multi",
         "species": list(SPECIES_CLASSES.keys()),
+        "models": model_registry.describe(),
+        "registry": model_registry.stats(),
+        "pools": pools.stats(),
+        "cache": cache.stats(),
+        "images": images.stats(),
+        "batching": {sp: b.stats() for sp, b in batchers.items()},
+        "profiling": profiler.stats(),
+        "admission": admission.stats(),
+        "dedup": near_dups.stats(),
+        "jobs": job_runner.stats() if job_runner is not None else None,
+        "streams": ws_clients,
     }
 
-def stable_predict(img_bytes: bytes, species: str):
-    classes = SPECIES_CLASSES.get(species, SPECIES_CLASSES["ikan"])
+# terpisah dari /health: load balancer hanya mengirim traffic ke worker yang model preload-nya sudah warm
+@app.get("/ready")
+async def ready():
+    missing = [sp for sp in PRELOAD_MODELS if model_registry.entry(sp).state != "ready"]
+    ok = preload_task is not None and preload_task.done() and not missing
+    body = {"ready": ok, "required": PRELOAD_MODELS, "missing": missing, **model_registry.stats()}
+    return JSONResponse(body, status_code=200 if ok else 503)
 
-    # seed stabil: hash(image_bytes + species)
-    h = hashlib.sha256(img_bytes + species.encode("utf-8")).hexdigest()
-    seed = int(h[:8], 16)
-    rng = random.Random(seed)
+# ----------------------------- ADMISSION -----------------------------
+async def admit(request: Request, default_timeout: float = None):
+    """Slot in-flight + rate limit + deadline untuk request ini; panggil admission.release() setelah selesai.
 
-    pred = rng.choice(classes)
-    conf = round(rng.uniform(0.70, 0.98), 3)
+    Deadline dihitung dari saat handler mulai (body sudah diterima), jadi sedikit lebih longgar
+    dari timeout klien yang juga mencakup waktu upload.
+    """
+    until = admission.request_deadline(request.headers, time.monotonic(), default_timeout)
+    client = admission.client_id(request.headers, request.client.host if request.client else None)
+    try:
+        await admission.acquire(client, until)
+    except Rejected as e:
+        raise HTTPException(e.status_code, e.detail, headers=e.headers())
+    deadline.set(until)
 
-    probs = {}
-    rest = round((1 - conf) / (len(classes) - 1), 3)
-    for c in classes:
-        probs[c] = conf if c == pred else rest
+def check_deadline(stage: str):
+    try:
+        admission.check_deadline(stage)
+    except Rejected as e:
+        raise HTTPException(e.status_code, e.detail)
 
-    return pred, conf, probs
+# ----------------------------- PREDICTOR + MICRO-BATCH -----------------------------
+# Model torch dimuat saat pertama dipakai (atau SMARTFISH_MODEL_PRELOAD saat start) dan
+# dievict LRU kalau melewati SMARTFISH_MODEL_BUDGET_MB. Membangun registry tidak memuat
+# apa pun, jadi worker process pool yang meng-import modul ini tidak ikut memuat model.
+model_registry = ModelRegistry(
+    SPECIES_CLASSES, config.MODELS, config.MODEL_VERSION, pools.io.run,
+    preprocess=config.PREPROCESS, max_batch=config.BATCH_MAX, buffers=config.MODEL_WORKERS,
+    budget_mb=config.MODEL_BUDGET_MB, mode=config.MODEL_MODE,
+    threads=config.TORCH_THREADS, interop_threads=config.TORCH_INTEROP_THREADS,
+)
+PRELOAD_MODELS = [sp for sp in config.MODEL_PRELOAD if sp in SPECIES_CLASSES]
+preload_task = None
+batchers = {}
+
+def predictor_key(species: str):
+    return species if species in SPECIES_CLASSES else "*"
+
+async def get_predictor(key: str):
+    try:
+        return await model_registry.get(key)
+    except ModelUnavailable as e:
+        raise HTTPException(503, str(e))
+
+async def get_model_version(key: str):
+    try:
+        return await model_registry.version(key)
+    except ModelUnavailable as e:
+        raise HTTPException(503, str(e))
+
+def batcher_for(key: str):
+    b = batchers.get(key)
+    if b is None:
+        # predictor di-resolve per batch: model yang dievict dimuat ulang saat dibutuhkan lagi
+        pool = pools.get(model_registry.entry(key).pool)
+        b = batchers[key] = MicroBatcher(
+            functools.partial(get_predictor, key), pool.run, config.BATCH_MAX, config.BATCH_WAIT_MS,
+            concurrency=pool.workers,
+        )
+    return b
+
+def image_digest(img_bytes: bytes, species: str):
+    # seed stabil: hash(image_bytes + species), tanpa membuat salinan gabungan
+    h = hashlib.sha256(img_bytes)
+    h.update(species.encode("utf-8"))
+    return h.hexdigest()
+
+def stable_predict(img_bytes: bytes, species: str):
+    return stable_predict_digest(image_digest(img_bytes, species), species)
+
+def stable_predict_digest(h: str, species: str):
+    classes = SPECIES_CLASSES.get(species, SPECIES_CLASSES["ikan"])
+    return stable_scores(h, classes)
 
 def recommendation(species: str, pred: str):
     if pred == "segar":
@@ -53,23 +372,638 @@ def recommendation(species: str, pred: str):
         return f"{species.upper()}: Sebaiknya segera diolah. Hindari penyimpanan lama."
     return f"{species.upper()}: Tidak layak dikonsumsi. Risiko keamanan pangan."
 
+def probe_upload(fp, species: str, endpoint: str = "/predict"):
+    # validasi header dulu (murah), baru hash seluruh isi file
+    t = time.perf_counter()
+    try:
+        img = probe_image(fp, config.ALLOWED_FORMATS, config.MAX_IMAGE_PIXELS, config.MIN_IMAGE_SIDE)
+    except ImageRejected as e:
+        raise HTTPException(e.status_code, str(e))
+    finally:
+        stage_seconds.observe(time.perf_counter() - t, (endpoint, "probe"))
+    timings = [0.0, 0.0]
+    h, size = stream_digest(fp, species, MAX_UPLOAD_BYTES, timings)
+    stage_seconds.observe(timings[0], (endpoint, "read"))
+    stage_seconds.observe(timings[1], (endpoint, "hash"))
+    payload_bytes.observe(size)
+    return h, img
+
+def build_result(species: str, pred: str, conf: float, probs: dict):
+    return {
+        "species": species,
+        "prediction": pred,
+        "confidence": conf,
+        "probabilities": probs,
+        "recommendation": recommendation(species, pred),
+    }
+
+async def predict_digest(h: str, species: str, load_pixels, check=None):
+    # load_pixels(target_size) -> PIL RGB; dipanggil di thread pool hanya kalau backend butuh piksel
+    # check() -> quality gate + perceptual hash (int, atau None kalau index mati), hanya saat cache miss
+    # (gambar yang sama pasti sudah lolos sebelumnya)
+    key = predictor_key(species)
+    entry = model_registry.entry(key)  # info statis; model baru dimuat saat cache miss
+    version = await get_model_version(key)
+    dup_key = (species, version)  # verdict hanya dipakai ulang untuk komoditas & model yang sama
+
+    async def compute():
+        # klien yang sudah menyerah (deadline lewat) tidak perlu dikerjakan lagi
+        check_deadline("decode")
+        endpoint = stage_endpoint.get()
+        ph = await pools.io.run(timed, endpoint, "quality", check) if check is not None else None
+        near = near_dups.lookup(dup_key, ph) if ph is not None else None
+        if near is not None and near_dups.mode == "reuse":
+            prior, distance, _ = near
+            dedup_total.inc(("reused",))
+            return prior["prediction"], prior["confidence"], prior["probabilities"], {
+                "reused": True, "distance": distance, "of": prior["digest"], "time": prior["time"],
+            }
+        pixels = None
+        if entry.needs_pixels:
+            pixels = await pools.io.run(timed, endpoint, "decode", load_pixels, entry.input_size)
+        check_deadline("inferensi")
+        t = time.perf_counter()
+        if profiling.active() is not None:
+            # request yang diprofil tidak lewat micro-batcher (task batcher di luar konteks request)
+            predictor = await get_predictor(key)
+            fn, args = predictor.batch_call([PredictInput(h, pixels)])
+            out = (await pools.get(predictor.pool).run(fn, *args))[0]
+        else:
+            out = await batcher_for(key).submit(PredictInput(h, pixels))
+        stage_seconds.observe(time.perf_counter() - t, (endpoint, "score"))
+        pred, conf, probs = out
+        dup = None
+        if near is not None:
+            prior, distance, _ = near
+            dedup_total.inc(("flagged",))
+            dup = {"reused": False, "distance": distance, "of": prior["digest"], "time": prior["time"],
+                   "prior_prediction": prior["prediction"], "agrees": prior["prediction"] == pred}
+        elif ph is not None:
+            dedup_total.inc(("miss",))
+            near_dups.add(dup_key, ph, {"digest": h[:16], "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                                        "prediction": pred, "confidence": conf, "probabilities": probs})
+        return pred, conf, probs, dup
+
+    # entry cache lama (sebelum ada index near-duplicate) hanya berisi 3 elemen
+    pred, conf, probs, *rest = await cache.get_or_compute(cache_key(h, species, version), compute)
+    predictions_total.inc((species_label(species), pred))
+    res = build_result(species, pred, conf, probs)
+    if rest and rest[0]:
+        res["near_duplicate"] = rest[0]
+    return res
+
+# probe hanya membaca header: isi yang terpotong / rusak baru ketahuan saat decode
+UNDECODABLE = (OSError, SyntaxError, Image.DecompressionBombError)
+
+def undecodable(e):
+    return HTTPException(400, f"Gambar rusak atau terpotong, tidak bisa di-decode ({type(e).__name__}: {e}).")
+
+def decode_upload(img, target_size):
+    try:
+        return decode_to_size(img, target_size)
+    except UNDECODABLE as e:
+        raise undecodable(e)
+
+def screen_upload(fp):
+    """Quality gate + perceptual hash dari satu decode proxy kecil; balikan hash (None kalau index mati)."""
+    # Image.open tersendiri: draft() proxy tidak boleh mengubah objek yang nanti di-decode untuk model
+    fp.seek(0)
+    try:
+        img = Image.open(fp)
+        if config.QUALITY_GATE:
+            ok, errors, _, _ = assess_quality(img, QUALITY_CFG)
+            if not ok:
+                raise HTTPException(422, " ".join(errors))
+        # setelah quality gate img sudah ter-decode di skala proxy, hash tidak decode ulang
+        return near_dups.hash(img) if near_dups.enabled else None
+    except UNDECODABLE as e:
+        raise undecodable(e)
+    finally:
+        fp.seek(0)
+
+async def predict_file(fp, species: str):
+    h, img = await pools.io.run(probe_upload, fp, species, stage_endpoint.get())
+    # piksel hanya di-decode kalau backend butuh, langsung ke resolusi input model
+    check = functools.partial(screen_upload, fp) if config.QUALITY_GATE or near_dups.enabled else None
+    return await predict_digest(h, species, functools.partial(decode_upload, img), check)
+
+def session_digest(image_id: str, box, species: str):
+    # deterministik per (gambar, ROI, species), seperti hash(bytes + species) untuk upload biasa
+    return image_digest(f"{image_id}:{','.join(map(str, box))}".encode("utf-8"), species)
+
+SESSION_GONE = "image_id tidak ditemukan atau sudah kedaluwarsa. Upload ulang lewat POST /images."
+
+def crop_to_size(image_id: str, box, target_size):
+    # piksel penuh sudah di-cache di ImageStore, crop & resize saja
+    try:
+        img = images.decoded(image_id)
+    except FileNotFoundError:
+        raise HTTPException(404, SESSION_GONE)  # kedaluwarsa di antara get() dan decode
+    return img.crop(box).resize(target_size, reducing_gap=3.0)
+
+def screen_session(image_id: str, box):
+    """Quality gate + perceptual hash untuk crop ROI, sama seperti screen_upload untuk upload biasa."""
+    # dari proxy kecil, bukan piksel penuh: backend tanpa piksel (stable demo) tidak perlu decode 12 MP
+    try:
+        img, sx, sy = images.proxy(image_id)
+    except FileNotFoundError:
+        raise HTTPException(404, SESSION_GONE)
+    left, top, right, bottom = box
+    crop = img.crop((int(left * sx), int(top * sy),
+                     max(int(left * sx) + 1, round(right * sx)), max(int(top * sy) + 1, round(bottom * sy))))
+    if config.QUALITY_GATE:
+        ok, errors, _, _ = assess_quality(crop, QUALITY_CFG)
+        if not ok:
+            raise HTTPException(422, " ".join(errors))
+    return near_dups.hash(crop) if near_dups.enabled else None
+
+async def predict_session(image_id: str, roi_box: Optional[str], species: str):
+    meta = await pools.io.run(images.get, image_id)
+    if meta is None:
+        raise HTTPException(404, SESSION_GONE)
+
+    w, h = meta["width"], meta["height"]
+    if roi_box:
+        try:
+            box = parse_roi_box(roi_box)
+        except ValueError as e:
+            raise HTTPException(422, str(e))
+        left, top, right, bottom = box
+        if not (0 <= left < right <= w and 0 <= top < bottom <= h):
+            raise HTTPException(422, f"roi_box {box} di luar gambar {w}x{h}.")
+    else:
+        box = (0, 0, w, h)
+
+    # ROI yang sama dengan crop yang dikirim sebagai file harus lolos / ditolak dengan aturan yang sama
+    check = functools.partial(screen_session, image_id, box) if config.QUALITY_GATE or near_dups.enabled else None
+    res = await predict_digest(
+        session_digest(image_id, box, species), species, functools.partial(crop_to_size, image_id, box), check
+    )
+    return {**res, "image_id": image_id, "roi_box": list(box)}
+
+async def predict_request(file, species: str, image_id, roi_box):
+    species = species.lower().strip()
+    if image_id:
+        return await predict_session(image_id.strip(), roi_box, species)
+    if file is None:
+        raise HTTPException(422, "Kirim `file` atau `image_id`.")
+    if roi_box:
+        raise HTTPException(422, "`roi_box` hanya bisa dipakai bersama `image_id`.")
+    return await predict_file(file.file, species)
+
 @app.post("/predict")
 async def predict(
-    file: UploadFile = File(...),
+    request: Request,
+    file: Optional[UploadFile] = File(None),
     species: str = Form("ikan"),  # default
+    image_id: Optional[str] = Form(None),  # dari POST /images, pengganti file
+    roi_box: Optional[str] = Form(None),   # "left,top,right,bottom", hanya dengan image_id
 ):
-    img_bytes = await file.read()
+    global predict_inflight
+    t0 = time.perf_counter()
+    predict_inflight += 1
+    session = profiler.start(request.headers)
+    status = 200
+    admitted = False
+    try:
+        await admit(request)
+        admitted = True
+        res = await predict_request(file, species, image_id, roi_box)
+        t = time.perf_counter()
+        resp = JSONResponse(res)
+    except HTTPException as e:
+        status = e.status_code
+        predict_errors.inc((str(status),))
+        raise
+    except Exception:
+        status = 500
+        predict_errors.inc(("500",))
+        raise
+    finally:
+        predict_inflight -= 1
+        if admitted:
+            admission.release()
+        if session is not None:
+            profiler.stop(session)
+            try:
+                name = await pools.io.run(profiler.save, session, {
+                    "endpoint": "/predict", "species": species, "status": status,
+                    "image_id": image_id, "filename": getattr(file, "filename", None),
+                })
+            except OSError:
+                name = None  # gagal tulis profil tidak boleh menggagalkan prediksi
+    t1 = time.perf_counter()
+    stage_seconds.observe(t1 - t, ("/predict", "serialize"))
+    stage_seconds.observe(t1 - t0, ("/predict", "total"))
+    if session is not None and name:
+        resp.headers["X-SmartFish-Profile-Id"] = name
+    return resp
 
-    # validasi gambar
-    Image.open(BytesIO(img_bytes)).convert("RGB")
+# ----------------------------- LIVE STREAM (WEBSOCKET) -----------------------------
+ws_clients = 0
 
-    species = species.lower().strip()
-    pred, conf, probs = stable_predict(img_bytes, species)
+def frame_dhash(data: bytes):
+    return dhash(Image.open(BytesIO(data)))
+
+async def predict_frame(data: bytes, species: str):
+    # jalur sama dengan /predict (validasi header, quality gate, cache, micro-batch)
+    stage_endpoint.set("/ws/predict")
+    return await predict_file(BytesIO(data), species)
+
+@app.websocket("/ws/predict")
+async def ws_predict(ws: WebSocket, species: str = "ikan"):
+    global ws_clients
+    if ws_clients >= config.WS_MAX_CLIENTS:
+        # 1013 = try again later; close sebelum accept menjadi penolakan handshake (403) tanpa kode ini
+        await ws.accept()
+        await ws.close(code=1013, reason="Terlalu banyak stream aktif.")
+        return
+    ws_clients += 1
+    try:
+        await ws.accept()
+        stream = FrameStream(
+            ws,
+            predict=predict_frame,
+            frame_hash=lambda data: pools.io.run(frame_dhash, data),
+            species=species.lower().strip(),
+            max_fps=config.WS_MAX_FPS,
+            dedup_distance=config.WS_DEDUP_DISTANCE,
+            max_frame_bytes=MAX_UPLOAD_BYTES,
+            on_frame=lambda result: ws_frames.inc((result,)),
+        )
+        await stream.run()
+    finally:
+        ws_clients -= 1
+
+# ----------------------------- IMAGE SESSION -----------------------------
+def store_upload(fp):
+    try:
+        img = probe_image(fp, config.ALLOWED_FORMATS, config.MAX_IMAGE_PIXELS, config.MIN_IMAGE_SIDE)
+    except ImageRejected as e:
+        raise HTTPException(e.status_code, str(e))
+    h, _ = stream_digest(fp, "", MAX_UPLOAD_BYTES)
+    image_id = h[:32]
+    meta = images.put(fp, image_id, img.width, img.height, img.format)
+    return image_id, meta
 
+@app.post("/images")
+async def upload_image(file: UploadFile = File(...)):
+    image_id, meta = await pools.io.run(store_upload, file.file)
     return {
-        "species": species,
-        "prediction": pred,
-        "confidence": conf,
-        "probabilities": probs,
-        "recommendation": recommendation(species, pred),
+        "image_id": image_id,
+        "width": meta["width"],
+        "height": meta["height"],
+        "format": meta["format"],
+        "expires_in": config.IMAGE_TTL,
+    }
+
+@app.delete("/images/{image_id}")
+async def delete_image(image_id: str):
+    if await pools.io.run(images.get, image_id) is None:
+        raise HTTPException(404, "image_id tidak ditemukan.")
+    await pools.io.run(images.delete, image_id)
+    return {"deleted": image_id}
+
+# ----------------------------- BATCH -----------------------------
+def read_zip_entries(zf: zipfile.ZipFile, limit: int = MAX_BATCH_ITEMS, too_many: str = None):
+    # too_many: pesan 413 dari pemanggil (batas /jobs beda dengan /predict/batch)
+    entries = []
+    for info in zf.infolist():
+        name = info.filename
+        if info.is_dir() or name.startswith("__MACOSX/"):
+            continue
+        if not name.lower().endswith(BATCH_IMAGE_EXT):
+            continue
+        if len(entries) >= limit:
+            raise HTTPException(413, too_many or f"Maksimal {limit} gambar per batch.")
+        entries.append(info)
+    return entries
+
+def open_zip_member(zf: zipfile.ZipFile, info: zipfile.ZipInfo):
+    # cek ukuran asli dulu supaya zip bomb tidak sempat diekstrak
+    if info.file_size > MAX_UPLOAD_BYTES:
+        raise too_large(MAX_UPLOAD_BYTES)
+    return BytesIO(zf.read(info))
+
+async def predict_many(items, species_list):
+    # item: (nama, file) atau (nama, fungsi pembuka file); member zip baru dibaca saat giliran diproses,
+    # jumlah yang diproses bersamaan dibatasi supaya memori tidak memuat seluruh batch sekaligus
+    sem = asyncio.Semaphore(config.IO_WORKERS)
+
+    async def one(source, species):
+        async with sem:
+            fp = await pools.io.run(source) if callable(source) else source
+            return await predict_file(fp, species)
+
+    # tiap item lewat jalur yang sama dengan /predict (cache + pool); error per item tidak menggagalkan batch
+    outs = await asyncio.gather(
+        *[one(source, sp) for (_, source), sp in zip(items, species_list)],
+        return_exceptions=True,
+    )
+    results = []
+    for i, ((name, _), out) in enumerate(zip(items, outs)):
+        if isinstance(out, HTTPException):
+            results.append({"index": i, "filename": name, "ok": False, "error": out.detail})
+        elif isinstance(out, Exception):
+            results.append({"index": i, "filename": name, "ok": False, "error": f"{type(out).__name__}: {out}"})
+        else:
+            results.append({"index": i, "filename": name, "ok": True, **out})
+    return results
+
+@app.post("/predict/batch")
+async def predict_batch(
+    request: Request,
+    files: Optional[List[UploadFile]] = File(None),
+    archive: Optional[UploadFile] = File(None),  # alternatif: satu file .zip
+    species: List[str] = Form(["ikan"]),  # satu nilai untuk semua, atau satu per item
+):
+    stage_endpoint.set("/predict/batch")
+    items = [(f.filename, f.file) for f in files or []]
+    zf = None
+    if archive is not None:
+        try:
+            # ZipFile membaca langsung dari file spool upload, member diekstrak per item
+            zf = zipfile.ZipFile(archive.file)
+            entries = await pools.io.run(read_zip_entries, zf)
+        except zipfile.BadZipFile:
+            raise HTTPException(400, "File archive bukan zip yang valid.")
+        items.extend((info.filename, functools.partial(open_zip_member, zf, info)) for info in entries)
+
+    if not items:
+        raise HTTPException(400, "Kirim minimal satu gambar lewat `files` atau `archive`.")
+    if len(items) > MAX_BATCH_ITEMS:
+        raise HTTPException(413, f"Maksimal {MAX_BATCH_ITEMS} gambar per batch.")
+
+    species_list = [s.lower().strip() for s in species]
+    if len(species_list) == 1:
+        species_list = species_list * len(items)
+    elif len(species_list) != len(items):
+        raise HTTPException(422, f"Jumlah species ({len(species_list)}) harus 1 atau sama dengan jumlah gambar ({len(items)}).")
+
+    # satu slot untuk seluruh batch (paralelisme di dalamnya sudah dibatasi predict_many);
+    # tanpa X-Request-Timeout tidak ada deadline, batch besar memang bisa lebih dari 30 detik
+    try:
+        await admit(request, default_timeout=0)
+        try:
+            results = await predict_many(items, species_list)
+        finally:
+            admission.release()
+    finally:
+        if zf is not None:
+            zf.close()
+
+    return {
+        "count": len(results),
+        "ok": sum(1 for r in results if r["ok"]),
+        "failed": sum(1 for r in results if not r["ok"]),
+        "results": results,
+    }
+
+# ----------------------------- ASYNC JOBS -----------------------------
+# Store + runner dibuat saat startup (bukan saat import) supaya worker process pool
+# yang meng-import modul ini tidak ikut membuka DB job.
+job_runner = None
+
+async def start_jobs():
+    global job_runner
+    store = await pools.io.run(JobStore, config.JOBS_DB, config.JOBS_DIR)
+    job_runner = JobRunner(
+        store, run_job_items, pools.io.run, workers=config.JOB_WORKERS, chunk=config.JOB_CHUNK,
+        retention=config.JOB_RETENTION_HOURS * 3600,
+    )
+    await job_runner.refresh()
+    job_runner.start()
+
+def read_job_file(path: str):
+    if os.path.getsize(path) > MAX_UPLOAD_BYTES:
+        raise too_large(MAX_UPLOAD_BYTES)
+    with open(path, "rb") as f:
+        return BytesIO(f.read())
+
+async def run_job_items(job, items):
+    """Satu chunk job lewat predict_many (jalur, cache & quality gate yang sama dengan /predict/batch)."""
+    stage_endpoint.set("/jobs")
+    root = job_runner.store.job_dir(job["id"])
+    zf = None
+    try:
+        sources = []
+        for it in items:
+            if it["source"].startswith("zip:"):
+                if zf is None:
+                    zf = await pools.io.run(zipfile.ZipFile, os.path.join(root, ARCHIVE_NAME))
+                info = zf.getinfo(it["source"][4:])
+                sources.append((it["name"], functools.partial(open_zip_member, zf, info)))
+            else:
+                sources.append((it["name"], functools.partial(read_job_file, os.path.join(root, it["source"]))))
+        results = await predict_many(sources, [it["species"] for it in items])
+    finally:
+        if zf is not None:
+            zf.close()
+    return [(it["idx"], {**r, "index": it["idx"]}) for it, r in zip(items, results)]
+
+def save_job_inputs(root: str, files, archive):
+    """Salin upload ke folder job; balikan [(nama, source)] sesuai urutan item."""
+    os.makedirs(root, exist_ok=True)
+    items = []
+    for i, f in enumerate(files):
+        ext = os.path.splitext(f.filename or "")[1].lower()
+        rel = f"{i:06d}{ext if ext in BATCH_IMAGE_EXT else ''}"
+        f.file.seek(0)
+        with open(os.path.join(root, rel), "wb") as out:
+            shutil.copyfileobj(f.file, out, 1024 * 1024)
+        items.append((f.filename, rel))
+    if archive is not None:
+        path = os.path.join(root, ARCHIVE_NAME)
+        archive.file.seek(0)
+        with open(path, "wb") as out:
+            shutil.copyfileobj(archive.file, out, 1024 * 1024)
+        try:
+            with zipfile.ZipFile(path) as zf:
+                entries = read_zip_entries(
+                    zf, config.JOB_MAX_ITEMS - len(items),
+                    f"Maksimal {config.JOB_MAX_ITEMS} gambar per job (SMARTFISH_JOB_MAX_ITEMS), termasuk isi archive.",
+                )
+        except zipfile.BadZipFile:
+            raise HTTPException(400, "File archive bukan zip yang valid.")
+        items.extend((info.filename, f"zip:{info.filename}") for info in entries)
+    return items
+
+def get_job(job_id: str):
+    job = job_runner.store.get(job_id) if JOB_ID_RE.match(job_id) else None
+    if job is None:
+        raise HTTPException(404, "Job tidak ditemukan (id salah atau sudah melewati masa retensi).")
+    return job
+
+def job_view(job):
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "total": job["total"],
+        "processed": job["processed"],
+        "ok": job["ok"],
+        "failed": job["failed"],
+        "progress": job["progress"],
+        "error": job["error"],
+        "created": job["created"],
+        "started": job["started"],
+        "finished": job["finished"],
+        "results_url": f"/jobs/{job['id']}/results",
     }
+
+async def read_job_form(request: Request):
+    """Form /jobs: `files` berulang dan/atau `archive` (.zip) + `species` (satu, atau satu per item).
+
+    Di-parse sendiri: parser bawaan (File/Form) memakai max_files=1000 dari Starlette, jadi job
+    1001..SMARTFISH_JOB_MAX_ITEMS gambar ditolak 400 sebelum batas job sempat dicek.
+    """
+    limit = config.JOB_MAX_ITEMS
+    try:
+        # +2: archive, dan satu file ekstra supaya kelebihan terdeteksi sebagai 413 di bawah
+        form = await request.form(max_files=limit + 2, max_fields=limit + 1)
+    except StarletteHTTPException as e:
+        if str(e.detail).startswith("Too many"):
+            raise HTTPException(413, f"Maksimal {limit} gambar per job (SMARTFISH_JOB_MAX_ITEMS).")
+        raise HTTPException(400, f"Form multipart tidak valid: {e.detail}")
+    files = [f for f in form.getlist("files") if isinstance(f, StarletteUploadFile)]
+    archive = form.get("archive")
+    archive = archive if isinstance(archive, StarletteUploadFile) else None
+    species = [s for s in form.getlist("species") if isinstance(s, str)] or ["ikan"]
+    return form, files, archive, species
+
+@app.post("/jobs", status_code=202)
+async def create_job(request: Request):
+    form, files, archive, species = await read_job_form(request)
+    try:
+        return await submit_job(request, files, archive, species)
+    finally:
+        await form.close()
+
+async def submit_job(request: Request, files, archive, species):
+    if not files and archive is None:
+        raise HTTPException(400, "Kirim minimal satu gambar lewat `files` atau `archive`.")
+    if files and len(files) > config.JOB_MAX_ITEMS:
+        raise HTTPException(413, f"Maksimal {config.JOB_MAX_ITEMS} gambar per job (SMARTFISH_JOB_MAX_ITEMS).")
+    store = job_runner.store
+    job_id = store.new_id()
+    root = store.job_dir(job_id)
+    try:
+        items = await pools.io.run(save_job_inputs, root, files or [], archive)
+        if not items:
+            raise HTTPException(400, "Archive tidak berisi gambar (.jpg/.jpeg/.png).")
+        species_list = [s.lower().strip() for s in species]
+        if len(species_list) == 1:
+            species_list = species_list * len(items)
+        elif len(species_list) != len(items):
+            raise HTTPException(422, f"Jumlah species ({len(species_list)}) harus 1 atau sama dengan jumlah gambar ({len(items)}).")
+        client = admission.client_id(request.headers, request.client.host if request.client else None)
+        job = await pools.io.run(
+            store.create, job_id, [(name, src, sp) for (name, src), sp in zip(items, species_list)], client
+        )
+    except BaseException:
+        await pools.io.run(functools.partial(shutil.rmtree, root, ignore_errors=True))
+        raise
+    job_runner.notify()
+    return job_view(job)
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    return job_view(await pools.io.run(get_job, job_id))
+
+@app.get("/jobs/{job_id}/results")
+def job_results(job_id: str, after: int = -1):
+    """NDJSON hasil item yang sudah selesai (urut index); saat job masih jalan, lanjutkan dengan ?after=<index terakhir>."""
+    job = get_job(job_id)
+    rows = job_runner.store.iter_results(job_id, after=after)
+    return StreamingResponse(
+        iter_encoded(iter_ndjson(rows)),
+        media_type="application/x-ndjson",
+        headers={"X-Job-Status": job["status"], "X-Job-Processed": str(job["processed"]),
+                 "Content-Disposition": f'attachment; filename="job_{job_id}.ndjson"'},
+    )
+
+@app.delete("/jobs/{job_id}")
+async def delete_job(job_id: str):
+    job = await pools.io.run(get_job, job_id)
+    if job["status"] == "running":
+        raise HTTPException(409, "Job sedang diproses; hapus setelah selesai.")
+    await pools.io.run(job_runner.store.delete, job_id)
+    return {"deleted": job_id}
+
+# ----------------------------- EXPORT -----------------------------
+# Database yang sama dengan aplikasi Streamlit; dibuka saat pertama dipakai
+_stores = {}
+
+def get_store(kind: str):
+    if kind not in _stores:
+        _stores[kind] = HistoryStore(config.DB_FILE) if kind == "history" else FeedbackStore(config.DB_FILE)
+    return _stores[kind]
+
+def export_response(chunks, media_type: str, filename: str):
+    # generator sync diiterasi Starlette di threadpool: baca SQLite per chunk, memori konstan
+    return StreamingResponse(
+        iter_encoded(chunks),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.get("/export/history.csv")
+def export_history_csv(since: Optional[str] = None, until: Optional[str] = None):
+    rows = get_store("history").iter_all(since=since, until=until)
+    return export_response(iter_csv(rows, HISTORY_CSV_FIELDS), "text/csv", "SmartFishID_History.csv")
+
+@app.get("/export/history.ndjson")
+def export_history_ndjson(since: Optional[str] = None, until: Optional[str] = None):
+    rows = get_store("history").iter_all(since=since, until=until)
+    return export_response(iter_ndjson(rows), "application/x-ndjson", "SmartFishID_History.ndjson")
+
+@app.get("/export/feedback.csv")
+def export_feedback_csv():
+    rows = get_store("feedback").iter_all()
+    return export_response(iter_csv(rows, FEEDBACK_CSV_FIELDS), "text/csv", "SmartFishID_Feedback.csv")
+
+@app.get("/export/feedback.ndjson")
+def export_feedback_ndjson():
+    rows = get_store("feedback").iter_all()
+    return export_response(iter_ndjson(rows), "application/x-ndjson", "SmartFishID_Feedback.ndjson")
+
+# ----------------------------- LAPORAN PDF -----------------------------
+def build_daily_report(day: str):
+    """PDF laporan harian ditulis ke SpooledTemporaryFile (di memori sampai 8MB, lalu ke disk)."""
+    since = datetime.strptime(day, "%Y-%m-%d")
+    until = since + timedelta(days=1)
+    scans = get_store("history").iter_all(
+        chunk=100, since=since.strftime("%Y-%m-%d"), until=until.strftime("%Y-%m-%d"),
+        with_thumb=True, oldest_first=True,
+    )
+    out = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    try:
+        make_batch_pdf(scans, out, max_scans=config.REPORT_MAX_SCANS)
+    except BaseException:
+        out.close()
+        raise
+    out.seek(0)
+    return out
+
+def iter_file(fp):
+    try:
+        while True:
+            chunk = fp.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        fp.close()
+
+@app.get("/reports/daily")
+async def report_daily(date: str):
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Format date harus YYYY-MM-DD.")
+    # reportlab + baca SQLite: jangan di event loop
+    out = await pools.io.run(build_daily_report, date)
+    return StreamingResponse(
+        iter_file(out),
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="SmartFishID_Laporan_{date}.pdf"'},
+    )
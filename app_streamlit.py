@@ -1,21 +1,34 @@
 import streamlit as st
 import requests
-from PIL import Image, ImageStat
+from requests.adapters import HTTPAdapter
+from PIL import Image
 from io import BytesIO
-from datetime import datetime
+from datetime import datetime, timedelta
+import hashlib
 import json
 import os
+import threading
+import time
 
-# PDF
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
+from bulk import MAX_BULK_ITEMS, BulkScanner, expand_uploads, roi_box
+from quality import validate_image_quality
+from reports import REPORT_MAX_SCANS, THUMB_DPI, badge_for, make_batch_pdf, make_pdf, print_jpeg
+from exports import FEEDBACK_CSV_FIELDS, HISTORY_CSV_FIELDS, collect, iter_csv, iter_json_array
+from storage import DB_FILE, FeedbackStore, HistoryStore
 
 # ----------------------------- DEFAULT CONFIG -----------------------------
 DEFAULT_API_BASE = "http://127.0.0.1:8000"
+HEALTH_TTL = 10.0  # detik; status API di-refresh di background setelah lewat TTL
+PREVIEW_MAX = 1024  # sisi terpanjang gambar preview (px)
+# history tersimpan dipakai bersama semua pengguna: hapus total hanya lewat token admin + konfirmasi
+ADMIN_TOKEN = os.environ.get("SMARTFISH_ADMIN_TOKEN", "")
 
 # ----------------------------- FEEDBACK STORAGE (PERMANEN) -----------------------------
+# SQLite (WAL) dipakai bersama semua sesi; file JSON lama hanya dibaca sekali untuk migrasi
+FEEDBACK_DB = DB_FILE
 FEEDBACK_FILE = "data/feedback_pengguna_smartfishid.json"
+LEGACY_FEEDBACK_FILES = [FEEDBACK_FILE, "feedback_pengguna.json"]
+FEEDBACK_PAGE_SIZE = 10
 
 st.set_page_config(page_title="SmartFish-ID", page_icon="🐟", layout="wide")
 
@@ -132,31 +145,84 @@ header {visibility: hidden;}
 def now_str():
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-def api_health(api_base: str):
-    try:
-        r = requests.get(f"{api_base}/health", timeout=2.0)
-        return r.status_code == 200, (r.json() if r.status_code == 200 else None)
-    except Exception:
-        return False, None
-
-def badge_for(pred: str):
-    if pred == "segar":
-        return ("✅ SEGER", "ok", "Aman dikonsumsi. Simpan dingin dan olah segera untuk kualitas terbaik.")
-    if pred == "kurang_segar":
-        return ("⚠️ KURANG SEGAR", "warn", "Sebaiknya segera diolah. Hindari penyimpanan lama.")
-    return ("❌ TIDAK LAYAK", "bad", "Jangan dikonsumsi. Risiko keamanan pangan.")
-
-def validate_image_quality(img: Image.Image):
-    """Validasi sederhana: resolusi & brightness."""
-    w, h = img.size
-    if w < 200 or h < 200:
-        return False, "Resolusi terlalu kecil. Gunakan foto lebih jelas (min 200x200)."
+@st.cache_resource
+def get_http_session(api_base: str):
+    """Satu session keep-alive per API base, dipakai bersama semua rerun & sesi."""
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
+class HealthMonitor:
+    """Status /health dengan TTL. Rerun hanya membaca status terakhir; probe jalan di thread background."""
+
+    def __init__(self, api_base: str, session: requests.Session, ttl: float = HEALTH_TTL):
+        self.api_base = api_base
+        self.session = session
+        self.ttl = ttl
+        self.ok = False
+        self.data = None
+        self.checked_at = 0.0  # 0 = belum pernah dicek
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def _probe(self):
+        try:
+            r = self.session.get(f"{self.api_base}/health", timeout=2.0)
+            ok, data = r.status_code == 200, (r.json() if r.status_code == 200 else None)
+        except Exception:
+            ok, data = False, None
+        with self._lock:
+            self.ok, self.data, self.checked_at = ok, data, time.time()
+            self._refreshing = False
+        return ok, data
+
+    def refresh_async(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._probe, daemon=True).start()
+
+    def refresh_now(self):
+        with self._lock:
+            self._refreshing = True
+        return self._probe()
+
+    @property
+    def checked(self):
+        return self.checked_at > 0
+
+    def status(self):
+        if time.time() - self.checked_at > self.ttl:
+            self.refresh_async()
+        return self.ok, self.data
+
+@st.cache_resource
+def get_health_monitor(api_base: str):
+    return HealthMonitor(api_base, get_http_session(api_base))
 
-    gray = img.convert("L")
-    mean_brightness = ImageStat.Stat(gray).mean[0]  # 0-255
-    if mean_brightness < 40:
-        return True, "⚠️ Foto terlihat gelap. Coba tambah cahaya agar hasil lebih akurat."
-    return True, ""
+def api_health(api_base: str):
+    # tidak pernah menunggu jaringan; API offline tidak lagi menambah 2 detik tiap interaksi
+    return get_health_monitor(api_base).status()
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def load_upload(digest: str, _data: bytes):
+    """Decode + cek kualitas + thumbnail preview sekali per upload (key: digest), bukan tiap rerun."""
+    img = Image.open(BytesIO(_data)).convert("RGB")
+    preview = img.copy()
+    preview.thumbnail((PREVIEW_MAX, PREVIEW_MAX), Image.BILINEAR, reducing_gap=2.0)
+    return {
+        "digest": digest,
+        "image": img,          # resolusi penuh, hanya untuk crop final & PDF
+        "preview": preview,    # proxy kecil untuk tampilan & preview ROI
+        "scale": preview.width / img.width,
+        "quality": validate_image_quality(preview, size=img.size),  # metrik dari proxy, bukan 12 MP
+    }
+
+def decode_upload(data: bytes):
+    return load_upload(hashlib.blake2b(data, digest_size=16).hexdigest(), data)
 
 def crop_roi(img: Image.Image):
     w, h = img.size
@@ -174,126 +240,133 @@ def crop_roi(img: Image.Image):
     if bottom <= top + 1:
         bottom = min(h, top + 2)
 
-    return img.crop((left, top, right, bottom)), (left, top, right, bottom)
-
-def split_text(text, max_len=78):
-    words = text.split()
-    lines, line = [], ""
-    for w in words:
-        if len(line) + len(w) + 1 <= max_len:
-            line = (line + " " + w).strip()
-        else:
-            lines.append(line)
-            line = w
-    if line:
-        lines.append(line)
-    return lines
-
-def make_pdf(original_img: Image.Image, cropped_img: Image.Image, result: dict):
-    buf = BytesIO()
-    c = canvas.Canvas(buf, pagesize=A4)
-    W, H = A4
-
-    pred = result.get("prediction", "-")
-    conf = float(result.get("confidence", 0.0))
-    headline, _, advice = badge_for(pred)
-
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(40, H - 50, "SmartFish-ID Report (PKM Demo)")
-    c.setFont("Helvetica", 10)
-    c.drawString(40, H - 70, f"Timestamp: {result.get('time','-')}")
-    c.drawString(40, H - 84, f"Prediction: {pred} | Confidence: {conf:.3f}")
-    c.drawString(40, H - 98, f"Source: {result.get('source','-')} | Image: {result.get('image_name','-')}")
-    c.drawString(40, H - 112, f"ROI box: {result.get('roi_box','-')}")
-
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(40, H - 136, "Recommendation")
-    c.setFont("Helvetica", 10)
-    c.drawString(40, H - 152, headline)
-
-    y = H - 168
-    for line in split_text(advice):
-        c.drawString(40, y, line)
-        y -= 14
-
-    probs = result.get("probabilities", {})
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(40, y - 8, "Probabilities")
-    y2 = y - 24
-    c.setFont("Helvetica", 10)
-    for k, v in probs.items():
-        c.drawString(40, y2, f"- {k}: {float(v):.3f}")
-        y2 -= 14
-
-    def to_jpeg_bytes(im: Image.Image):
-        b = BytesIO()
-        im.convert("RGB").save(b, format="JPEG", quality=90)
-        b.seek(0)
-        return b
-
-    def fit(im: Image.Image, max_w, max_h):
-        iw, ih = im.size
-        s = min(max_w/iw, max_h/ih)
-        return int(iw*s), int(ih*s)
-
-    orig_b = to_jpeg_bytes(original_img)
-    crop_b = to_jpeg_bytes(cropped_img)
-
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(40, 320, "Images (Original vs ROI)")
-    oy = 110
-    ow, oh = fit(original_img, 240, 180)
-    cw, ch = fit(cropped_img, 240, 180)
-
-    c.setFont("Helvetica", 10)
-    c.drawString(40, 300, "Original")
-    c.drawImage(ImageReader(orig_b), 40, oy, width=ow, height=oh, mask='auto')
-
-    c.drawString(320, 300, "ROI (Crop)")
-    c.drawImage(ImageReader(crop_b), 320, oy, width=cw, height=ch, mask='auto')
-
-    c.setFont("Helvetica-Oblique", 8)
-    c.drawString(40, 30, "SmartFish-ID • Generated for PKM attachment • Proof of Concept")
-    c.showPage()
-    c.save()
-
-    buf.seek(0)
-    return buf
-
-def history_to_csv(history):
-    header = ["time","prediction","confidence","source","image_name","roi_box"]
-    rows = [",".join(header)]
-    for h in history:
-        row = [
-            str(h.get("time","")),
-            str(h.get("prediction","")),
-            str(h.get("confidence","")),
-            str(h.get("source","")),
-            str(h.get("image_name","")),
-            str(h.get("roi_box","")),
-        ]
-        rows.append(",".join(row))
-    out = BytesIO()
-    out.write("\n".join(rows).encode("utf-8"))
-    out.seek(0)
-    return out
-
-# ----------------------------- FEEDBACK PERMANEN: LOAD/SAVE JSON -----------------------------
-def load_feedbacks():
-    os.makedirs("data", exist_ok=True)
-    if not os.path.exists(FEEDBACK_FILE):
-        return []
+    return (left, top, right, bottom)
+
+def roi_preview(decoded: dict, box):
+    # preview ROI dari proxy; crop resolusi penuh baru dilakukan saat Prediksi
+    s = decoded["scale"]
+    left, top, right, bottom = box
+    pw, ph = decoded["preview"].size
+    pbox = (
+        min(int(left * s), pw - 1),
+        min(int(top * s), ph - 1),
+        max(int(left * s) + 1, min(pw, round(right * s))),
+        max(int(top * s) + 1, min(ph, round(bottom * s))),
+    )
+    return decoded["preview"].crop(pbox)
+
+# timeout klien juga dikirim ke API: prediksi yang tidak lagi ditunggu dibuang sebelum inferensi
+API_TIMEOUT = 30
+API_DEADLINE = {"X-Request-Timeout": str(API_TIMEOUT)}
+
+def api_error_message(r):
+    if r.status_code in (429, 503) and r.headers.get("Retry-After"):
+        return f"Server sedang sibuk, coba lagi dalam {r.headers['Retry-After']} detik."
+    return f"Gagal prediksi: {r.status_code} - {r.text}"
+
+def predict_roi_api(api_base: str, raw: bytes, digest: str, name: str, img: Image.Image, box):
+    """Upload gambar penuh sekali (POST /images), lalu tiap ROI cukup kirim image_id + roi_box.
+
+    Kalau image_id sudah kedaluwarsa di server, upload ulang sekali. API lama tanpa
+    /images tetap dilayani dengan cara lama (crop dikirim sebagai JPEG).
+    """
+    sess = get_http_session(api_base)
+    ids = st.session_state.setdefault("api_image_ids", {})
+    key = f"{api_base}|{digest}"
+    for _ in range(2):
+        image_id = ids.get(key)
+        if image_id is None:
+            up = sess.post(f"{api_base}/images", files={"file": (name or "fish.jpg", raw)}, timeout=API_TIMEOUT)
+            if up.status_code in (404, 405):
+                break
+            if up.status_code != 200:
+                return up
+            image_id = ids[key] = up.json()["image_id"]
+            while len(ids) > 32:
+                ids.pop(next(iter(ids)))
+        r = sess.post(f"{api_base}/predict", data={"image_id": image_id, "roi_box": ",".join(map(str, box))},
+                      headers=API_DEADLINE, timeout=API_TIMEOUT)
+        if r.status_code == 404:
+            ids.pop(key, None)
+            continue
+        return r
+
+    b = BytesIO()
+    img.crop(box).save(b, format="JPEG", quality=95)
+    files = {"file": (name or "fish.jpg", b.getvalue(), "image/jpeg")}
+    return sess.post(f"{api_base}/predict", files=files, headers=API_DEADLINE, timeout=API_TIMEOUT)
+
+# ----------------------------- LIVE SCAN (WEBSOCKET) -----------------------------
+# Kamera lokal (opencv) -> /ws/predict. Satu frame dikirim, tunggu balasan, baru frame
+# berikutnya: klien tidak pernah mengirim lebih cepat dari server memproses.
+LIVE_JPEG_QUALITY = 80
+
+def live_scan(api_base: str, camera_index: int, seconds: int, roi, frame_ph, result_ph, stats_ph):
+    try:
+        import cv2
+        from websockets.sync.client import connect
+    except ImportError:
+        st.info("Mode live butuh paket opsional: `pip install opencv-python websockets`.")
+        return None, None
+
+    ws_url = api_base.replace("https://", "wss://", 1).replace("http://", "ws://", 1) + "/ws/predict?species=ikan"
+    cap = cv2.VideoCapture(camera_index)
+    if not cap.isOpened():
+        st.error(f"Kamera {camera_index} tidak bisa dibuka.")
+        return None, None
+    last, last_frames, counts = None, None, {}
     try:
-        with open(FEEDBACK_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return data if isinstance(data, list) else []
-    except Exception:
-        return []
+        with connect(ws_url, open_timeout=5, max_size=None) as ws:
+            deadline = time.time() + seconds
+            while time.time() < deadline:
+                grabbed, frame = cap.read()
+                if not grabbed:
+                    break
+                rgb = Image.fromarray(frame[:, :, ::-1])
+                box = roi_box(rgb, roi)
+                buf = BytesIO()
+                rgb.crop(box).save(buf, format="JPEG", quality=LIVE_JPEG_QUALITY)
+                ws.send(buf.getvalue())
+                msg = json.loads(ws.recv(timeout=15))
+                counts[msg["type"]] = counts.get(msg["type"], 0) + 1
+
+                frame_ph.image(rgb.crop(box), caption=f"ROI live: {box}", use_container_width=True)
+                if msg["type"] == "result":
+                    last = {**msg, "roi_box": box}
+                    last_frames = (rgb, box)
+                    headline, cls, _ = badge_for(msg["prediction"])
+                    result_ph.markdown(f'<span class="badge {cls}">{headline}</span> '
+                                       f'<span class="badge">confidence: {msg["confidence"]:.3f}</span> '
+                                       f'<span class="badge">{msg["latency_ms"]:.0f} ms</span>',
+                                       unsafe_allow_html=True)
+                elif msg["type"] == "rejected":
+                    result_ph.warning(msg["error"])
+                elif msg["type"] == "skipped":
+                    time.sleep(0.05)  # melebihi batas fps server: beri jeda sebelum frame berikutnya
+                stats_ph.caption(" • ".join(f"{k}: {v}" for k, v in sorted(counts.items())))
+    except Exception as e:
+        st.error(f"Stream terputus: {e}")
+    finally:
+        cap.release()
+    return last, last_frames
+
+# ----------------------------- HISTORY PERMANEN: SQLITE -----------------------------
+@st.cache_resource
+def get_history_store():
+    return HistoryStore(DB_FILE)
+
+def daily_report_pdf(since: str, until: str) -> bytes:
+    buf = BytesIO()
+    scans = history_store.iter_all(chunk=100, since=since, until=until, with_thumb=True, oldest_first=True)
+    make_batch_pdf(scans, buf, max_scans=REPORT_MAX_SCANS)
+    return buf.getvalue()
 
-def save_feedbacks(feedbacks):
-    os.makedirs("data", exist_ok=True)
-    with open(FEEDBACK_FILE, "w", encoding="utf-8") as f:
-        json.dump(feedbacks, f, indent=2, ensure_ascii=False)
+# ----------------------------- FEEDBACK PERMANEN: SQLITE -----------------------------
+@st.cache_resource
+def get_feedback_store():
+    store = FeedbackStore(FEEDBACK_DB)
+    store.migrate_json(LEGACY_FEEDBACK_FILES)  # hanya sekali, ditandai di tabel meta
+    return store
 
 # ----------------------------- Sidebar Settings -----------------------------
 st.sidebar.markdown("## ⚙️ Settings")
@@ -309,23 +382,28 @@ st.sidebar.caption("Tip: Jika API sering error saat demo, pakai **Demo Stabil**.
 # ----------------------------- Session -----------------------------
 if "page" not in st.session_state:
     st.session_state.page = "Home"
-if "history" not in st.session_state:
-    st.session_state.history = []
 if "last" not in st.session_state:
     st.session_state.last = None
 if "last_original" not in st.session_state:
     st.session_state.last_original = None
 if "last_crop_img" not in st.session_state:
     st.session_state.last_crop_img = None
+if "last_pdf" not in st.session_state:
+    st.session_state.last_pdf = None  # (key prediksi, bytes PDF)
+if "bulk_results" not in st.session_state:
+    st.session_state.bulk_results = None
 
-# ✅ load feedback dari file
-if "feedbacks" not in st.session_state:
-    st.session_state.feedbacks = load_feedbacks()
+feedback_store = get_feedback_store()
+history_store = get_history_store()  # dipakai bersama semua sesi
 
 # ----------------------------- Navbar -----------------------------
+health_monitor = get_health_monitor(api_base)
 ok, health = api_health(api_base)
-status_text = "🟢 API Online" if ok else "🔴 API Offline"
-status_cls = "ok" if ok else "bad"
+if not health_monitor.checked:
+    status_text, status_cls = "🟡 Mengecek API...", "warn"
+else:
+    status_text = "🟢 API Online" if ok else "🔴 API Offline"
+    status_cls = "ok" if ok else "bad"
 
 st.markdown(f"""
 <div class="navbar">
@@ -368,34 +446,36 @@ st.write("")
 qa1, qa2, qa3 = st.columns(3)
 
 if qa1.button("🔌 Cek API Sekarang", use_container_width=True):
-    ok2, data2 = api_health(api_base)
+    ok2, data2 = health_monitor.refresh_now()
     st.toast("API Online ✅" if ok2 else "API Offline ❌")
     if data2:
         st.sidebar.json(data2)
 
-if qa2.button("🗑️ Clear History", use_container_width=True):
-    st.session_state.history = []
-    st.session_state.last = None
-    st.success("History dibersihkan ✅")
+if qa2.button("🧹 Clear Sesi", use_container_width=True):
+    # hanya state sesi ini; history tersimpan (dashboard, laporan, export) milik semua pengguna
+    for k in ("last", "last_original", "last_crop_img", "last_pdf", "bulk_results"):
+        st.session_state[k] = None
+    st.success("Hasil scan di sesi ini dibersihkan ✅ (history tersimpan tidak dihapus)")
     st.rerun()
 
-if qa3.button("🗑️ Clear Feedback (Hapus File)", use_container_width=True):
-    st.session_state.feedbacks = []
-    save_feedbacks(st.session_state.feedbacks)
-    st.success("Feedback dibersihkan ✅ (file di-reset)")
+if qa3.button("🗑️ Clear Feedback (Hapus Data)", use_container_width=True):
+    feedback_store.clear()
+    st.success("Feedback dibersihkan ✅ (data di-reset)")
     st.rerun()
 
 st.write("")
 
 # ----------------------------- Navigation Buttons -----------------------------
-c1, c2, c3, c4 = st.columns(4)
+c1, c2, c3, c4, c5 = st.columns(5)
 if c1.button("🏠 Home", use_container_width=True):
     st.session_state.page = "Home"
 if c2.button("📷 Scan Now", use_container_width=True):
     st.session_state.page = "Scan"
-if c3.button("📊 Dashboard", use_container_width=True):
+if c3.button("📦 Bulk Scan", use_container_width=True):
+    st.session_state.page = "Bulk"
+if c4.button("📊 Dashboard", use_container_width=True):
     st.session_state.page = "Dashboard"
-if c4.button("🗣️ Feedback", use_container_width=True):
+if c5.button("🗣️ Feedback", use_container_width=True):
     st.session_state.page = "Feedback"
 
 st.write("")
@@ -444,24 +524,56 @@ elif page == "Scan":
                     unsafe_allow_html=True)
         st.write("")
 
-        mode = st.radio("Sumber gambar", ["Upload", "Webcam"], horizontal=True)
-        img, name = None, None
-
-        if mode == "Upload":
+        mode = st.radio("Sumber gambar", ["Upload", "Webcam", "Live"], horizontal=True)
+        img, name, decoded, raw = None, None, None, None
+
+        if mode == "Live":
+            st.caption("Tahan ikan di depan kamera; prediksi diperbarui terus lewat WebSocket. "
+                       "Frame yang hampir sama tidak diprediksi ulang.")
+            l1, l2, l3 = st.columns(3)
+            camera_index = l1.number_input("Kamera", 0, 9, 0)
+            seconds = l2.slider("Durasi (detik)", 5, 120, 30)
+            live_roi = "auto" if l3.radio("ROI", ["Otomatis", "Penuh"], horizontal=True) == "Otomatis" else "full"
+            if mode_system == "Demo Stabil (Tanpa API)":
+                st.info("Mode live butuh API. Pilih **Real API** di sidebar.")
+            elif st.button("▶️ Mulai Live Scan", use_container_width=True):
+                # klik tombol lain (mis. Stop) memicu rerun dan menghentikan loop
+                st.button("⏹️ Stop", use_container_width=True)
+                frame_ph, result_ph, stats_ph = st.empty(), st.empty(), st.empty()
+                last, frames = live_scan(api_base, int(camera_index), seconds, live_roi, frame_ph, result_ph, stats_ph)
+                if last:
+                    last.update({"time": now_str(), "source": "Live", "mode": "api",
+                                 "image_name": f"live_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"})
+                    for k in ("type", "seq", "received", "dropped", "latency_ms"):
+                        last.pop(k, None)
+                    frame, box = frames
+                    cropped = frame.crop(box)
+                    st.session_state.last = last
+                    st.session_state.last_original = frame
+                    st.session_state.last_crop_img = cropped
+                    # hanya verdict terakhir per sesi live yang masuk history
+                    history_store.add({**last, "thumb": print_jpeg(cropped, dpi=THUMB_DPI)})
+                    st.success("Live scan selesai, hasil terakhir disimpan ✅")
+        elif mode == "Upload":
             up = st.file_uploader("Upload gambar ikan (JPG/PNG)", type=["jpg", "jpeg", "png"])
             if up:
-                img = Image.open(BytesIO(up.getvalue())).convert("RGB")
+                raw = up.getvalue()
+                decoded = decode_upload(raw)
                 name = up.name
         else:
             cam = st.camera_input("Ambil foto ikan via webcam")
             if cam:
-                img = Image.open(BytesIO(cam.getvalue())).convert("RGB")
+                raw = cam.getvalue()
+                decoded = decode_upload(raw)
                 name = f"webcam_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
+        if decoded:
+            img = decoded["image"]
 
         if not img:
-            st.info("Upload foto atau ambil dari webcam untuk mulai.")
+            if mode != "Live":
+                st.info("Upload foto atau ambil dari webcam untuk mulai.")
         else:
-            ok_img, warn_msg = validate_image_quality(img)
+            ok_img, warn_msg = decoded["quality"]
             if not ok_img:
                 st.error(warn_msg)
                 st.stop()
@@ -471,18 +583,15 @@ elif page == "Scan":
             st.markdown('<div class="card"><div class="title">Preview</div>'
                         '<div class="muted">Pastikan foto tidak blur dan cukup cahaya.</div></div>',
                         unsafe_allow_html=True)
-            st.image(img, use_container_width=True)
+            st.image(decoded["preview"], use_container_width=True)
 
             st.write("")
             st.markdown('<div class="card"><div class="title">🎯 Crop ROI (Mata/Insang)</div>'
                         '<div class="muted">Gunakan slider untuk fokus area penting.</div></div>',
                         unsafe_allow_html=True)
 
-            cropped, box = crop_roi(img)
-            st.image(cropped, caption=f"ROI box: {box}", use_container_width=True)
-
-            st.session_state.last_original = img
-            st.session_state.last_crop_img = cropped
+            box = crop_roi(img)
+            st.image(roi_preview(decoded, box), caption=f"ROI box: {box}", use_container_width=True)
 
             st.write("")
             b1, b2, b3 = st.columns(3)
@@ -496,6 +605,12 @@ elif page == "Scan":
                 st.rerun()
 
             if do_predict:
+                cropped = img.crop(box)
+                st.session_state.last_original = img
+                st.session_state.last_crop_img = cropped
+                # thumbnail kecil ikut disimpan di history untuk laporan harian (tanpa gambar asli)
+                thumb = print_jpeg(cropped, dpi=THUMB_DPI)
+
                 if mode_system == "Demo Stabil (Tanpa API)":
                     demo = {
                         "prediction": "segar",
@@ -508,24 +623,23 @@ elif page == "Scan":
                         "mode": "demo"
                     }
                     st.session_state.last = demo
-                    st.session_state.history.insert(0, demo)
+                    history_store.add({**demo, "thumb": thumb})
                     st.success("Prediksi demo berhasil ✅")
                     st.rerun()
                 else:
+                    if not ok:
+                        # status cache bisa basi; cek langsung sebelum menyatakan offline
+                        ok, health = health_monitor.refresh_now()
                     if not ok:
                         st.error("API Offline. Jalankan API dulu:\n"
                                  "`uvicorn api.app_api:app --reload --host 127.0.0.1 --port 8000`")
                     else:
                         try:
                             with st.spinner("Mengirim ROI ke API..."):
-                                b = BytesIO()
-                                cropped.save(b, format="JPEG", quality=95)
-                                b.seek(0)
-                                files = {"file": (name or "fish.jpg", b.getvalue(), "image/jpeg")}
-                                r = requests.post(f"{api_base}/predict", files=files, timeout=30)
+                                r = predict_roi_api(api_base, raw, decoded["digest"], name, img, box)
 
                             if r.status_code != 200:
-                                st.error(f"Gagal prediksi: {r.status_code} - {r.text}")
+                                st.error(api_error_message(r))
                             else:
                                 data = r.json()
                                 data["time"] = now_str()
@@ -534,7 +648,7 @@ elif page == "Scan":
                                 data["roi_box"] = box
                                 data["mode"] = "api"
                                 st.session_state.last = data
-                                st.session_state.history.insert(0, data)
+                                history_store.add({**data, "thumb": thumb})
                                 st.success("Prediksi berhasil ✅")
                                 st.rerun()
                         except Exception as e:
@@ -545,10 +659,15 @@ elif page == "Scan":
                     st.warning("Lakukan prediksi dulu sebelum membuat PDF.")
                 else:
                     try:
-                        pdf_buf = make_pdf(st.session_state.last_original, st.session_state.last_crop_img, st.session_state.last)
+                        last = st.session_state.last
+                        # PDF per prediksi dibuat sekali; klik ulang / rerun memakai bytes yang sama
+                        pdf_key = (last.get("time"), last.get("image_name"), str(last.get("roi_box")), last.get("prediction"))
+                        if st.session_state.last_pdf is None or st.session_state.last_pdf[0] != pdf_key:
+                            pdf_buf = make_pdf(st.session_state.last_original, st.session_state.last_crop_img, last)
+                            st.session_state.last_pdf = (pdf_key, pdf_buf.getvalue())
                         st.download_button(
                             "⬇️ Download PDF Report",
-                            data=pdf_buf.getvalue(),
+                            data=st.session_state.last_pdf[1],
                             file_name=f"SmartFishID_Report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
                             mime="application/pdf",
                             use_container_width=True
@@ -595,26 +714,100 @@ elif page == "Scan":
             for k, v in chart_data.items():
                 st.progress(min(max(v, 0.0), 1.0), text=f"{k}: {v:.3f}")
 
+elif page == "Bulk":
+    st.markdown('<div class="card"><div class="title">📦 Bulk Scan</div>'
+                '<div class="muted">Banyak foto atau satu ZIP sekaligus (satu tangkapan penuh). '
+                'ROI otomatis/tetap, dikirim paralel ke API, hasil langsung masuk history.</div></div>',
+                unsafe_allow_html=True)
+    st.write("")
+
+    ups = st.file_uploader("Upload banyak gambar (JPG/PNG) atau ZIP", type=["jpg", "jpeg", "png", "zip"],
+                           accept_multiple_files=True)
+    b1, b2, b3 = st.columns(3)
+    species = b1.selectbox("Komoditas", ["ikan", "ayam", "daging"])
+    roi_mode = b2.radio("ROI", ["Otomatis", "Gambar penuh", "Tetap (persen)"], horizontal=True)
+    concurrency = b3.slider("Request paralel", 1, 8, 4)
+    roi = "auto" if roi_mode == "Otomatis" else "full"
+    if roi_mode == "Tetap (persen)":
+        r1, r2 = st.columns(2)
+        lr = r1.slider("Kiri–Kanan (%)", 0, 100, (10, 90))
+        tb = r2.slider("Atas–Bawah (%)", 0, 100, (10, 90))
+        roi = (lr[0] / 100, tb[0] / 100, lr[1] / 100, tb[1] / 100)
+
+    if st.button("🚀 Scan Semua", use_container_width=True, disabled=not ups):
+        demo = mode_system == "Demo Stabil (Tanpa API)"
+        if not demo and not ok:
+            ok, health = health_monitor.refresh_now()
+        if not demo and not ok:
+            st.error("API Offline. Jalankan API dulu atau pilih mode Demo Stabil.")
+            st.stop()
+
+        items = expand_uploads([(u.name, u.getvalue()) for u in ups])
+        scanner = BulkScanner(get_http_session(api_base), None if demo else api_base, species, concurrency)
+        progress = st.progress(0.0, text=f"0 / {len(items)} gambar")
+        live = st.empty()
+        results, counts = [], {}
+        t0 = time.perf_counter()
+        for chunk in scanner.run(items, roi=roi, source="Bulk", stamp=now_str):
+            done = [r for r in chunk if r["ok"]]
+            # masuk history per chunk (satu transaksi), hasil tetap tersimpan walau halaman ditinggal
+            history_store.add_many([{k: v for k, v in r.items() if k not in ("ok", "warning")} for r in done])
+            for r in done:
+                counts[r["prediction"]] = counts.get(r["prediction"], 0) + 1
+            results.extend(chunk)
+            progress.progress(len(results) / len(items),
+                              text=f"{len(results)} / {len(items)} gambar • {time.perf_counter() - t0:.1f} dtk")
+            live.caption(" • ".join(f"{k}: {v}" for k, v in sorted(counts.items())) or "Memproses...")
+        st.session_state.bulk_results = {
+            "rows": [{k: v for k, v in r.items() if k != "thumb"} for r in results],
+            "seconds": time.perf_counter() - t0,
+            "batch_endpoint": scanner.batch_supported,
+        }
+        if len(items) >= MAX_BULK_ITEMS:
+            st.warning(f"Hanya {MAX_BULK_ITEMS} gambar pertama yang diproses.")
+
+    res = st.session_state.bulk_results
+    if res:
+        rows = res["rows"]
+        n_ok = sum(1 for r in rows if r["ok"])
+        k1, k2, k3, k4 = st.columns(4)
+        k1.metric("Gambar", len(rows))
+        k2.metric("Berhasil", n_ok)
+        k3.metric("Gagal / ditolak", len(rows) - n_ok)
+        k4.metric("Waktu", f"{res['seconds']:.1f} dtk")
+        st.dataframe(
+            [{"gambar": r["image_name"], "prediksi": r.get("prediction", "-"),
+              "confidence": round(r["confidence"], 3) if r["ok"] else None,
+              "roi": str(r.get("roi_box", "")), "catatan": r.get("error") or r.get("warning") or ""}
+             for r in rows],
+            use_container_width=True,
+        )
+        st.download_button(
+            "⬇️ Export Hasil Bulk (CSV)",
+            data=lambda: collect(iter_csv(rows, ["image_name", "ok", "prediction", "confidence", "roi_box", "error"])),
+            file_name=f"SmartFishID_Bulk_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+            mime="text/csv",
+            use_container_width=True
+        )
+
 elif page == "Dashboard":
     st.markdown('<div class="card"><div class="title">📊 Dashboard</div>'
                 '<div class="muted">Statistik ringkas untuk terlihat “serius” saat demo PKM.</div></div>',
                 unsafe_allow_html=True)
     st.write("")
 
-    if not st.session_state.history:
+    summary = history_store.summary()  # dari tabel agregat, tidak loop seluruh history
+    if not summary["total"]:
         st.info("Belum ada data. Lakukan Scan dulu.")
     else:
         counts = {"segar": 0, "kurang_segar": 0, "tidak_layak": 0}
-        avg_conf = 0.0
-        for item in st.session_state.history:
-            p = item.get("prediction")
+        for p, n in summary["counts"].items():
             if p in counts:
-                counts[p] += 1
-            avg_conf += float(item.get("confidence", 0.0))
-        avg_conf = avg_conf / max(1, len(st.session_state.history))
+                counts[p] = n
+        avg_conf = summary["avg_conf"]
 
         k1, k2, k3, k4 = st.columns(4)
-        k1.metric("Total scan", len(st.session_state.history))
+        k1.metric("Total scan", summary["total"])
         k2.metric("Avg confidence", f"{avg_conf:.3f}")
         k3.metric("Segar", counts["segar"])
         k4.metric("Tidak layak", counts["tidak_layak"])
@@ -623,31 +816,72 @@ elif page == "Dashboard":
         st.markdown('<div class="card"><div class="title">Distribusi Prediksi</div></div>', unsafe_allow_html=True)
         st.bar_chart(counts)
 
+        st.write("")
+        st.markdown('<div class="card"><div class="title">Scan per Jam (24 jam terakhir)</div></div>', unsafe_allow_html=True)
+        since_hour = (datetime.now() - timedelta(hours=23)).strftime("%Y-%m-%d %H")
+        per_hour = {}
+        for row in history_store.hourly(since_hour):
+            per_hour[row["hour"]] = per_hour.get(row["hour"], 0) + row["n"]
+        if per_hour:
+            st.bar_chart(per_hour)
+        else:
+            st.caption("Belum ada scan dalam 24 jam terakhir.")
+
         st.write("")
         colx, coly = st.columns(2)
         with colx:
+            # data berupa callable: export baru dibuat saat tombol diklik, bukan tiap rerun
             st.download_button(
                 "⬇️ Export History (JSON)",
-                data=json.dumps(st.session_state.history, indent=2).encode("utf-8"),
+                data=lambda: collect(iter_json_array(history_store.iter_all())),
                 file_name=f"SmartFishID_History_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
                 mime="application/json",
                 use_container_width=True
             )
         with coly:
-            csv_buf = history_to_csv(st.session_state.history)
             st.download_button(
                 "⬇️ Export History (CSV)",
-                data=csv_buf.getvalue(),
+                data=lambda: collect(iter_csv(history_store.iter_all(), HISTORY_CSV_FIELDS)),
                 file_name=f"SmartFishID_History_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
                 mime="text/csv",
                 use_container_width=True
             )
 
+        st.write("")
+        st.markdown('<div class="card"><div class="title">Laporan Harian (PDF)</div>'
+                    '<div class="muted">Satu halaman per scan + ringkasan, dari history tersimpan.</div></div>',
+                    unsafe_allow_html=True)
+        report_day = st.date_input("Tanggal laporan", value=datetime.now().date())
+        since = report_day.strftime("%Y-%m-%d")
+        until = (report_day + timedelta(days=1)).strftime("%Y-%m-%d")
+        st.download_button(
+            "⬇️ Download Laporan Harian (PDF)",
+            data=lambda: daily_report_pdf(since, until),
+            file_name=f"SmartFishID_Laporan_{since}.pdf",
+            mime="application/pdf",
+            use_container_width=True
+        )
+
+        if ADMIN_TOKEN:
+            st.write("")
+            with st.expander("⚠️ Admin: hapus seluruh history"):
+                st.caption("Menghapus history SEMUA pengguna beserta data dashboard, laporan & export. Tidak bisa dibatalkan.")
+                token = st.text_input("Token admin", type="password")
+                confirm = st.checkbox("Saya paham seluruh history akan dihapus permanen")
+                if st.button("Hapus seluruh history", disabled=not confirm):
+                    if token != ADMIN_TOKEN:
+                        st.error("Token admin salah.")
+                    else:
+                        history_store.clear()
+                        st.session_state.last = None
+                        st.success("Seluruh history dihapus ✅")
+                        st.rerun()
+
 elif page == "Feedback":
     st.markdown('<div class="card"><div class="title">🗣️ Feedback Pengguna</div>'
                 '<div class="muted">Fitur ini penting untuk PKM: bukti uji coba dan evaluasi dari pengguna.</div></div>',
                 unsafe_allow_html=True)
-    st.caption(f"📁 File tersimpan di: {FEEDBACK_FILE}")
+    st.caption(f"📁 Data tersimpan di: {FEEDBACK_DB}")
     st.write("")
 
     with st.form("feedback_form", clear_on_submit=True):
@@ -667,33 +901,45 @@ elif page == "Feedback":
             "last_prediction": (st.session_state.last.get("prediction") if st.session_state.last else None),
             "last_confidence": (st.session_state.last.get("confidence") if st.session_state.last else None),
         }
-        st.session_state.feedbacks.insert(0, fb)
-
-        # ✅ simpan permanen ke file
-        save_feedbacks(st.session_state.feedbacks)
+        # ✅ simpan permanen (append, tidak menulis ulang seluruh data)
+        feedback_store.append(fb)
 
         st.success("Feedback tersimpan ✅ (permanen)")
 
     st.write("")
-    if not st.session_state.feedbacks:
+    total_fb = feedback_store.count()
+    if not total_fb:
         st.info("Belum ada feedback.")
     else:
-        for i, fb in enumerate(st.session_state.feedbacks[:10], start=1):
+        pages = (total_fb + FEEDBACK_PAGE_SIZE - 1) // FEEDBACK_PAGE_SIZE
+        page_no = st.number_input(f"Halaman (total {total_fb} feedback)", 1, pages, 1) if pages > 1 else 1
+        offset = (page_no - 1) * FEEDBACK_PAGE_SIZE
+        for i, fb in enumerate(feedback_store.latest(FEEDBACK_PAGE_SIZE, offset), start=offset + 1):
             st.write(f"{i}. **{fb['time']}** • {fb['peran']} • rating **{fb['rating']}**")
             if fb.get("komentar"):
                 st.caption(fb["komentar"])
 
-        st.download_button(
-            "⬇️ Download Feedback (JSON)",
-            data=json.dumps(st.session_state.feedbacks, indent=2, ensure_ascii=False).encode("utf-8"),
-            file_name=f"SmartFishID_Feedback_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-            mime="application/json",
-            use_container_width=True
-        )
+        fx, fy = st.columns(2)
+        with fx:
+            st.download_button(
+                "⬇️ Download Feedback (JSON)",
+                data=lambda: collect(iter_json_array(feedback_store.iter_all())),
+                file_name=f"SmartFishID_Feedback_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                mime="application/json",
+                use_container_width=True
+            )
+        with fy:
+            st.download_button(
+                "⬇️ Download Feedback (CSV)",
+                data=lambda: collect(iter_csv(feedback_store.iter_all(), FEEDBACK_CSV_FIELDS)),
+                file_name=f"SmartFishID_Feedback_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                mime="text/csv",
+                use_container_width=True
+            )
 
 # Footer
 st.markdown("""
 <div class="footer">
-  SmartFish-ID • Premium UI Demo (Streamlit) • Scan • ROI • PDF Report • Dashboard • Feedback (Permanent JSON) • PKM Ready
+  SmartFish-ID • Premium UI Demo (Streamlit) • Scan • ROI • PDF Report • Dashboard • Feedback (Permanent) • PKM Ready
 </div>
 """, unsafe_allow_html=True)
\ No newline at end of file
@@ -0,0 +1,201 @@
+"""Load test /predict (atau /predict/batch): in-process (ASGI) atau lewat uvicorn lokal; throughput + p50/p95/p99.
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_load --mode inprocess --concurrency 16 --requests 500 --json load.json
+    python -m benchmarks.bench_load --mode uvicorn --workers 2 --concurrency 32
+    python -m benchmarks.bench_load --url http://127.0.0.1:8000   # server yang sudah jalan
+    python -m benchmarks.bench_load --endpoint predict/batch --batch-size 8   # gambar/s /predict vs /predict/batch
+
+Default tiap request membawa byte gambar unik (counter ditempel setelah marker EOI JPEG,
+piksel tetap sama) supaya yang diukur jalur dingin, bukan cache prediksi. Karena pikselnya sama,
+index near-duplicate dimatikan (SMARTFISH_DEDUP=off) untuk server in-process / uvicorn yang
+dijalankan benchmark ini; dengan --url server harus dijalankan dengan SMARTFISH_DEDUP=off sendiri,
+kalau tidak hampir semua request dijawab dari index. --repeat untuk jalur cache.
+Tiap request membawa X-Client-Id sendiri (banyak lapak) supaya rate limit per klien tidak ikut
+terukur; --clients N untuk mensimulasikan N klien (429/503 terlihat di "status").
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import SIZES, emit, known_species, latency_stats, synthetic_jpeg
+
+def build_payloads(sizes, species):
+    return [(size, sp, synthetic_jpeg(SIZES[size], seed=i)) for i, size in enumerate(sizes) for sp in species]
+
+async def run_load(client: httpx.AsyncClient, payloads, concurrency: int, total: int, unique: bool = True,
+                   clients: int = 0, batch_size: int = 0, offset: int = 0):
+    """total gambar; batch_size 0 = satu gambar per POST /predict, N = N gambar per POST /predict/batch.
+
+    offset menggeser counter byte unik supaya putaran berikutnya tidak mengenai cache putaran sebelumnya.
+    """
+    lat_all, lat_by = [], {}
+    status = {}
+    images_ok = 0
+    per_request = batch_size or 1
+    counter = iter(range(0, total, per_request))
+
+    def image(i):
+        size, sp, data = payloads[i % len(payloads)]
+        if unique:
+            data = data + (offset + i).to_bytes(8, "big")
+        return size, sp, data
+
+    async def worker():
+        nonlocal images_ok
+        for start in counter:
+            items = [image(i) for i in range(start, min(start + per_request, total))]
+            headers = {"X-Client-Id": f"bench-{start % clients if clients else start}"}
+            t = time.perf_counter()
+            try:
+                if batch_size:
+                    r = await client.post(
+                        "/predict/batch",
+                        files=[("files", (f"bench{k}.jpg", data, "image/jpeg")) for k, (_, _, data) in enumerate(items)],
+                        data={"species": [sp for _, sp, _ in items]}, headers=headers,
+                    )
+                else:
+                    size, sp, data = items[0]
+                    r = await client.post("/predict", files={"file": ("bench.jpg", data, "image/jpeg")},
+                                          data={"species": sp}, headers=headers)
+                code = r.status_code
+            except httpx.HTTPError as e:
+                code = type(e).__name__
+            dt = time.perf_counter() - t
+            status[str(code)] = status.get(str(code), 0) + 1
+            if code == 200:
+                images_ok += sum(1 for x in r.json()["results"] if x["ok"]) if batch_size else 1
+                lat_all.append(dt)
+                if not batch_size:
+                    lat_by.setdefault(items[0][0], []).append(dt)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    out = {
+        "endpoint": "/predict/batch" if batch_size else "/predict",
+        "batch_size": batch_size or None,
+        "elapsed_s": round(elapsed, 3),
+        "status": status,
+        "images_ok": images_ok,
+        "images_per_s": round(images_ok / elapsed, 1) if elapsed else None,
+        "overall": latency_stats(lat_all, elapsed),  # per request (satu batch = satu request)
+    }
+    if lat_by:
+        out["by_size"] = {k: latency_stats(v) for k, v in lat_by.items()}
+    return out
+
+async def run_bench(client, payloads, args):
+    unique = not args.repeat
+    await run_load(client, payloads, args.concurrency, min(args.warmup, args.requests), unique, offset=1 << 40)
+    single = await run_load(client, payloads, args.concurrency, args.requests, unique, args.clients)
+    if args.endpoint == "predict":
+        return single
+    # gambar yang sama jumlahnya (byte berbeda, jadi tetap jalur dingin) lewat /predict/batch
+    batch = await run_load(client, payloads, args.concurrency, args.requests, unique, args.clients,
+                           batch_size=args.batch_size, offset=args.requests)
+    return {
+        "predict": single,
+        "predict_batch": batch,
+        "speedup_images_per_s": round(batch["images_per_s"] / single["images_per_s"], 2)
+        if single["images_per_s"] and batch["images_per_s"] else None,
+    }
+
+async def bench_inprocess(payloads, args):
+    from app_api import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+            return await run_bench(client, payloads, args)
+
+async def bench_url(payloads, args, url: str):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+        return await run_bench(client, payloads, args)
+
+def start_uvicorn(port: int, workers: int):
+    cmd = [sys.executable, "-m", "uvicorn", "app_api:app", "--host", "127.0.0.1", "--port", str(port),
+           "--workers", str(workers), "--log-level", "warning"]
+    proc = subprocess.Popen(cmd, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"uvicorn berhenti (exit {proc.returncode})")
+        try:
+            if httpx.get(url + "/health", timeout=1).status_code == 200:
+                return proc, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("uvicorn tidak siap dalam 60 detik")
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess")
+    ap.add_argument("--url", help="target server yang sudah jalan (mengabaikan --mode)")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--workers", type=int, default=1, help="worker uvicorn (mode uvicorn)")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--requests", type=int, default=200, help="jumlah gambar per putaran")
+    ap.add_argument("--endpoint", choices=["predict", "predict/batch"], default="predict",
+                    help="predict/batch: bandingkan gambar/detik /predict vs /predict/batch untuk gambar sebanyak --requests")
+    ap.add_argument("--batch-size", type=int, default=8, help="gambar per request /predict/batch")
+    ap.add_argument("--warmup", type=int, default=20)
+    ap.add_argument("--sizes", default="small,medium", help=f"subset dari {','.join(SIZES)}")
+    ap.add_argument("--species", help="komoditas dipisah koma (default: semua yang dikenal API)")
+    ap.add_argument("--repeat", action="store_true", help="kirim byte identik (mengukur jalur cache)")
+    ap.add_argument("--clients", type=int, default=0, help="jumlah klien (X-Client-Id); 0 = satu per request")
+    ap.add_argument("--timeout", type=float, default=60.0)
+    ap.add_argument("--json", help="simpan hasil ke file JSON")
+    args = ap.parse_args()
+
+    # piksel payload berulang: tanpa ini jalur dingin dijawab index near-duplicate, bukan inferensi.
+    # Diset sebelum app_api di-import (in-process) dan diwarisi proses uvicorn.
+    os.environ["SMARTFISH_DEDUP"] = "off"
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    known = known_species()
+    species = [s.strip() for s in args.species.split(",") if s.strip()] if args.species else known
+    unknown = [s for s in species if s not in known]
+    if unknown:
+        # API memetakan komoditas asing ke kelas ikan; angkanya tidak mewakili komoditas itu
+        raise SystemExit(f"Komoditas tidak dikenal API: {', '.join(unknown)} (pilihan: {', '.join(known)})")
+    payloads = build_payloads(sizes, species)
+
+    proc = None
+    try:
+        if args.url:
+            mode, result = "url", asyncio.run(bench_url(payloads, args, args.url))
+        elif args.mode == "uvicorn":
+            proc, url = start_uvicorn(args.port, args.workers)
+            mode, result = "uvicorn", asyncio.run(bench_url(payloads, args, url))
+        else:
+            mode, result = "inprocess", asyncio.run(bench_inprocess(payloads, args))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    emit({
+        "benchmark": "load",
+        "mode": mode,
+        "endpoint": "/" + args.endpoint,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "workers": args.workers if mode == "uvicorn" else None,
+        "sizes": {s: list(SIZES[s]) for s in sizes},
+        "species": species,
+        "cache_path": args.repeat,
+        "clients": args.clients or None,
+        **result,
+    }, args.json)
+
+if __name__ == "__main__":
+    main()
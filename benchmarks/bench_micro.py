@@ -0,0 +1,89 @@
+"""Microbenchmark hot path API & klien: stable_predict, decode/validasi, kualitas, PDF, CSV.
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_micro --iters 50 --json micro.json
+    python -m benchmarks.bench_micro --only stable_predict,make_pdf
+"""
+import argparse
+from io import BytesIO
+
+from PIL import Image
+
+import config
+from app_api import stable_predict
+from exports import history_to_csv
+from imaging import decode_to_size, probe_image
+from quality import validate_image_quality
+from reports import make_pdf
+
+from benchmarks.common import SIZES, bench, emit, synthetic_jpeg
+
+def fake_history(n: int):
+    preds = ["segar", "kurang_segar", "tidak_layak"]
+    return [
+        {
+            "time": f"2026-01-01 {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}",
+            "species": "ikan",
+            "prediction": preds[i % 3],
+            "confidence": 0.5 + (i % 50) / 100,
+            "source": "Upload",
+            "image_name": f"foto_{i}.jpg",
+            "roi_box": (10, 10, 200, 200),
+            "mode": "api",
+        }
+        for i in range(n)
+    ]
+
+def cases(jpegs, history_rows: int):
+    """Nama -> (fungsi tanpa argumen, jumlah iterasi relatif)."""
+    out = {}
+    for name, data in jpegs.items():
+        out[f"stable_predict[{name}]"] = (lambda d=data: stable_predict(d, "ikan"), 10)
+
+        def probe_decode(d=data):
+            img = probe_image(BytesIO(d), config.ALLOWED_FORMATS, config.MAX_IMAGE_PIXELS, config.MIN_IMAGE_SIDE)
+            return decode_to_size(img, (224, 224))
+        out[f"probe_decode[{name}]"] = (probe_decode, 1)
+
+        full = Image.open(BytesIO(data)).convert("RGB")
+        out[f"validate_image_quality[{name}]"] = (lambda im=full: validate_image_quality(im), 1)
+
+    original = Image.open(BytesIO(jpegs["large"] if "large" in jpegs else next(iter(jpegs.values())))).convert("RGB")
+    crop = original.crop((0, 0, original.width // 2, original.height // 2))
+    result = {"prediction": "segar", "confidence": 0.93, "time": "2026-01-01 00:00:00", "source": "Upload",
+              "image_name": "bench.jpg", "roi_box": (0, 0, crop.width, crop.height),
+              "probabilities": {"segar": 0.93, "kurang_segar": 0.05, "tidak_layak": 0.02}}
+    out["make_pdf"] = (lambda: make_pdf(original, crop, result), 1)
+
+    rows = fake_history(history_rows)
+    out[f"history_to_csv[{history_rows}]"] = (lambda: history_to_csv(rows), 1)
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--iters", type=int, default=20)
+    ap.add_argument("--sizes", default=",".join(SIZES), help=f"subset dari {','.join(SIZES)}")
+    ap.add_argument("--history-rows", type=int, default=10_000)
+    ap.add_argument("--only", help="nama benchmark dipisah koma (prefix cocok)")
+    ap.add_argument("--json", help="simpan hasil ke file JSON")
+    args = ap.parse_args()
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    jpegs = {name: synthetic_jpeg(SIZES[name], seed=i) for i, name in enumerate(sizes)}
+    only = [s.strip() for s in args.only.split(",")] if args.only else None
+
+    results = {}
+    for name, (fn, mult) in cases(jpegs, args.history_rows).items():
+        if only and not any(name.startswith(o) for o in only):
+            continue
+        results[name] = bench(fn, max(1, args.iters * mult))
+
+    emit({
+        "benchmark": "micro",
+        "iters": args.iters,
+        "jpeg_bytes": {k: len(v) for k, v in jpegs.items()},
+        "results": results,
+    }, args.json)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""Bandingkan mode inferensi torch (eager fp32, frozen, int8, jumlah thread) pada folder berlabel.
+
+Folder data: <data>/<label>/*.jpg, nama subfolder = kelas (segar, kurang_segar, tidak_layak).
+Tiap kombinasi mode x thread jalan di proses baru (setelan thread torch berlaku per proses,
+RSS tidak tercampur). Laporan: latensi p50/p95/p99, throughput, memori, akurasi terhadap
+label, dan kesepakatan verdict dengan eager fp32.
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_modes --model models/ikan.pt --data dataset/ikan --species ikan
+    python -m benchmarks.bench_modes --model models/ikan.pt --data dataset/ikan --modes eager,int8 --threads 1,2,4 --json modes.json
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+import config
+from imaging import decode_to_size
+from predictors import MODEL_MODES, PredictInput, TorchPredictor
+
+from benchmarks.common import emit, latency_stats
+
+IMAGE_EXT = (".jpg", ".jpeg", ".png", ".webp")
+
+def labelled_files(root: str):
+    """[(path, label)] dari <root>/<label>/*, urut supaya semua mode melihat urutan yang sama."""
+    out = []
+    for label in sorted(os.listdir(root)):
+        d = os.path.join(root, label)
+        if not os.path.isdir(d):
+            continue
+        for name in sorted(os.listdir(d)):
+            if name.lower().endswith(IMAGE_EXT):
+                out.append((os.path.join(d, name), label))
+    return out
+
+def rss_mb():
+    # RSS saat ini (Linux); None di platform lain
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KB, macOS: byte
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def run_mode(model, species, classes, preprocess, mode, threads, interop, files, batch, repeat):
+    """Dijalankan di proses baru: muat + warm-up, lalu ukur forward pass per batch."""
+    rss0 = rss_mb()
+    t = time.perf_counter()
+    p = TorchPredictor(species, classes, model, preprocess, max_batch=batch, mode=mode,
+                       threads=threads, interop_threads=interop)
+    p.warm_up(batch)
+    load_ms = (time.perf_counter() - t) * 1000.0
+    rss_loaded = rss_mb()
+
+    # decode di luar pengukuran: yang dibandingkan hanya forward pass
+    images = [decode_to_size(Image.open(path), p.input_size) for path in files]
+    lat, results = [], []
+    t0 = time.perf_counter()
+    for r in range(repeat):
+        for i in range(0, len(images), batch):
+            inputs = [PredictInput("", im) for im in images[i:i + batch]]
+            t = time.perf_counter()
+            out = p.predict_batch(inputs)
+            lat.append(time.perf_counter() - t)
+            if r == 0:
+                results.extend(out)
+    elapsed = time.perf_counter() - t0
+    stats = latency_stats(lat)
+    stats["throughput_per_s"] = round(len(images) * repeat / elapsed, 1) if elapsed else None
+    return {
+        "mode": mode,
+        "threads": list(p.threads),
+        "load_ms": round(load_ms, 1),
+        "weight_mb": round(p.weight_bytes / (1024 * 1024), 2),
+        "rss_model_mb": round(rss_loaded - rss0, 1) if rss0 is not None else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "latency": stats,
+        "preds": [pred for pred, _, _ in results],
+        "probs": [probs for _, _, probs in results],
+    }
+
+def compare(run, baseline, labels):
+    """Akurasi terhadap label + kesepakatan verdict & selisih probabilitas terhadap baseline fp32."""
+    n = len(labels)
+    out = {"accuracy": round(sum(p == y for p, y in zip(run["preds"], labels)) / n, 4) if n else None}
+    if baseline is not None:
+        same = sum(a == b for a, b in zip(run["preds"], baseline["preds"]))
+        out["agreement_fp32"] = round(same / n, 4) if n else None
+        out["changed_verdicts"] = n - same
+        out["max_prob_diff"] = round(max(
+            (abs(a[c] - b[c]) for a, b in zip(run["probs"], baseline["probs"]) for c in a), default=0.0
+        ), 4)
+    return out
+
+def print_table(rows):
+    head = f"{'mode':<8} {'threads':<8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'img/s':>8} {'MB':>7} {'agree':>7} {'acc':>7}"
+    print(head)
+    print("-" * len(head))
+    for r in rows:
+        lat = r["latency"]
+        agree = r.get("agreement_fp32")
+        print(f"{r['mode']:<8} {'%d/%d' % tuple(r['threads']):<8} {lat['p50_ms']:>8} {lat['p95_ms']:>8} "
+              f"{lat['p99_ms']:>8} {lat['throughput_per_s']:>8} {r['weight_mb']:>7} "
+              f"{'-' if agree is None else agree:>7} {'-' if r['accuracy'] is None else r['accuracy']:>7}")
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--model", required=True, help="path model torch (torch.save / TorchScript)")
+    ap.add_argument("--data", required=True, help="folder berlabel: <data>/<kelas>/*.jpg")
+    ap.add_argument("--species", default="ikan", help="komoditas (kelas & SMARTFISH_PREPROCESS)")
+    ap.add_argument("--modes", default=",".join(MODEL_MODES), help=f"subset dari {','.join(MODEL_MODES)}")
+    ap.add_argument("--threads", default="0", help="intra-op thread dipisah koma, 0 = default torch")
+    ap.add_argument("--interop", type=int, default=0, help="inter-op thread, 0 = default torch")
+    ap.add_argument("--batch", type=int, default=1, help="ukuran batch forward pass")
+    ap.add_argument("--repeat", type=int, default=3, help="putaran pengukuran atas seluruh folder")
+    ap.add_argument("--limit", type=int, default=0, help="maksimal gambar (0 = semua)")
+    ap.add_argument("--json", help="simpan hasil ke file JSON")
+    args = ap.parse_args()
+
+    from app_api import SPECIES_CLASSES
+    classes = SPECIES_CLASSES.get(args.species, SPECIES_CLASSES["ikan"])
+    files = labelled_files(args.data)
+    if args.limit:
+        files = files[:args.limit]
+    if not files:
+        raise SystemExit(f"Tidak ada gambar di {args.data}/<label>/")
+    paths, labels = [f for f, _ in files], [y for _, y in files]
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = [m for m in modes if m not in MODEL_MODES]
+    if unknown:
+        raise SystemExit(f"Mode tidak dikenal: {', '.join(unknown)} (pilihan: {', '.join(MODEL_MODES)})")
+    threads = [int(t) for t in args.threads.split(",") if t.strip()]
+    # eager fp32 selalu diukur sebagai acuan kesepakatan verdict
+    configs = [("eager", threads[0])] if "eager" not in modes else []
+    configs += [(m, t) for m in modes for t in threads]
+
+    ctx = multiprocessing.get_context("spawn")
+    runs = []
+    for mode, t in configs:
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as ex:
+            try:
+                runs.append(ex.submit(run_mode, args.model, args.species, classes,
+                                      config.PREPROCESS.get(args.species), mode, t, args.interop,
+                                      paths, args.batch, args.repeat).result())
+            except Exception as e:
+                # mis. int8 pada model TorchScript: dilaporkan, mode lain tetap jalan
+                print(f"[{mode}/{t}] gagal: {type(e).__name__}: {e}")
+
+    baseline = next((r for r in runs if r["mode"] == "eager"), None)
+    rows = []
+    for r in runs:
+        row = {k: v for k, v in r.items() if k not in ("preds", "probs")}
+        row.update(compare(r, baseline if r is not baseline else None, labels))
+        rows.append(row)
+
+    # tercepat (p50) yang verdict-nya sama persis dengan fp32
+    safe = [r for r in rows if r["mode"] == "eager" or r.get("changed_verdicts") == 0]
+    best = min(safe, key=lambda r: r["latency"]["p50_ms"]) if safe else None
+    print_table(rows)
+    if best:
+        print(f"\nRekomendasi: SMARTFISH_MODEL_MODE={best['mode']} SMARTFISH_TORCH_THREADS={best['threads'][0]}")
+
+    emit({
+        "benchmark": "modes",
+        "model": args.model,
+        "species": args.species,
+        "images": len(files),
+        "batch": args.batch,
+        "repeat": args.repeat,
+        "results": rows,
+        "recommended": {"mode": best["mode"], "threads": best["threads"]} if best else None,
+    }, args.json)
+
+if __name__ == "__main__":
+    main()
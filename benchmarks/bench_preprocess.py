@@ -0,0 +1,95 @@
+"""Microbenchmark preprocessing: buffer pool vs alokasi baru per request.
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_preprocess --batch 16 --iters 50 --json hasil.json
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+from preprocess import DEFAULT_PREPROCESS, TensorBufferPool
+
+def make_images(n: int, size):
+    rng = np.random.default_rng(0)
+    w, h = size
+    return [Image.fromarray(rng.integers(0, 256, (h, w, 3), dtype=np.uint8), "RGB") for _ in range(n)]
+
+def naive_batch(images, size, mean, std):
+    # cara lama: array baru untuk tiap langkah (resize, float, normalisasi, transpose, stack)
+    w, h = size
+    mean = np.asarray(mean, dtype=np.float32).reshape(3, 1, 1)
+    std = np.asarray(std, dtype=np.float32).reshape(3, 1, 1)
+    arrs = []
+    for im in images:
+        arr = np.asarray(im.resize((w, h)), dtype=np.float32).transpose(2, 0, 1)
+        arrs.append((arr / 255.0 - mean) / std)
+    return np.stack(arrs)
+
+def measure(fn, images, iters: int):
+    fn(images)  # warm-up
+    t0 = time.perf_counter()
+    for _ in range(iters):
+        fn(images)
+    elapsed = time.perf_counter() - t0
+
+    tracemalloc.start()
+    fn(images)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    n = iters * len(images)
+    return {
+        "images_per_sec": round(n / elapsed, 1),
+        "ms_per_image": round(elapsed / n * 1000, 4),
+        "peak_alloc_per_batch_bytes": peak,
+        "peak_alloc_per_image_bytes": peak // len(images),
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--batch", type=int, default=16)
+    ap.add_argument("--iters", type=int, default=50)
+    ap.add_argument("--size", type=int, nargs=2, default=DEFAULT_PREPROCESS["size"], metavar=("W", "H"))
+    ap.add_argument("--json", help="simpan hasil ke file JSON")
+    args = ap.parse_args()
+
+    size = tuple(args.size)
+    mean, std = DEFAULT_PREPROCESS["mean"], DEFAULT_PREPROCESS["std"]
+    images = make_images(args.batch, size)
+    pool = TensorBufferPool(size, mean, std, max_batch=args.batch, count=1)
+
+    def pooled(imgs):
+        buf = pool.acquire(len(imgs))
+        try:
+            return buf.fill_batch(imgs).sum()  # pakai hasilnya sebelum buffer dikembalikan
+        finally:
+            pool.release(buf)
+
+    def naive(imgs):
+        return naive_batch(imgs, size, mean, std).sum()
+
+    # pastikan hasil kedua cara sama
+    buf = pool.acquire(len(images))
+    np.testing.assert_allclose(buf.fill_batch(images), naive_batch(images, size, mean, std), rtol=1e-5, atol=1e-5)
+    pool.release(buf)
+
+    result = {
+        "benchmark": "preprocess",
+        "batch": args.batch,
+        "iters": args.iters,
+        "size": list(size),
+        "single_core": True,
+        "pooled": measure(pooled, images, args.iters),
+        "naive": measure(naive, images, args.iters),
+    }
+    print(json.dumps(result, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
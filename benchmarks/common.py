@@ -0,0 +1,84 @@
+"""Helper bersama benchmark: gambar sintetis, statistik latensi, output JSON."""
+import json
+import platform
+import subprocess
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+SIZES = {"small": (640, 480), "medium": (1600, 1200), "large": (4000, 3000)}
+
+def known_species():
+    """Komoditas yang dikenal API; import ditunda supaya env yang diset benchmark ikut terbaca config."""
+    from app_api import SPECIES_CLASSES
+    return list(SPECIES_CLASSES)
+
+def synthetic_jpeg(size, seed: int = 0, quality: int = 90) -> bytes:
+    """JPEG sintetis (gradien + noise + bentuk bertepi tajam) supaya mirip foto asli
+    dan lolos quality gate (blur/exposure), bukan warna polos."""
+    w, h = size
+    rng = np.random.default_rng(seed)
+    base = np.linspace(40, 215, w, dtype=np.float32)[None, :, None]
+    arr = base + rng.normal(0, 25, (h, w, 3)).astype(np.float32)
+    img = Image.fromarray(np.clip(arr, 0, 255).astype(np.uint8), "RGB")
+    draw = ImageDraw.Draw(img)
+    for _ in range(60):
+        x, y = int(rng.integers(0, w)), int(rng.integers(0, h))
+        r = int(rng.integers(max(4, w // 80), max(5, w // 8)))
+        draw.ellipse((x, y, x + r, y + r * 0.6), fill=tuple(int(v) for v in rng.integers(0, 256, 3)))
+    buf = BytesIO()
+    img.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+def latency_stats(latencies, elapsed: float = None):
+    """p50/p95/p99 (ms) + throughput; latencies dalam detik."""
+    if not latencies:
+        return {"count": 0}
+    arr = np.asarray(latencies, dtype=np.float64) * 1000
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    out = {
+        "count": len(arr),
+        "mean_ms": round(float(arr.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(arr.max()), 3),
+    }
+    if elapsed:
+        out["throughput_per_s"] = round(len(arr) / elapsed, 1)
+    return out
+
+def bench(fn, iters: int, warmup: int = 1):
+    """Jalankan fn() berulang; latensi per panggilan + ops/sec."""
+    for _ in range(warmup):
+        fn()
+    lat = []
+    t0 = time.perf_counter()
+    for _ in range(iters):
+        t = time.perf_counter()
+        fn()
+        lat.append(time.perf_counter() - t)
+    return latency_stats(lat, time.perf_counter() - t0)
+
+def environment():
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5).stdout.strip()
+    except Exception:
+        rev = None
+    return {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "git_rev": rev or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+
+def emit(result: dict, path: str = None):
+    result = {"env": environment(), **result}
+    print(json.dumps(result, indent=2))
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    return result
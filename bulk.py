@@ -0,0 +1,224 @@
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from quality import proxy_gray, validate_image_quality
+from reports import THUMB_DPI, print_jpeg
+
+# ----------------------------- BULK SCAN -----------------------------
+# Banyak foto / ZIP sekaligus: tiap chunk disiapkan (decode, quality gate, ROI, encode)
+# lalu dikirim ke /predict/batch di thread pool berukuran tetap. API lama tanpa
+# /predict/batch dilayani per gambar lewat /predict dengan batas konkurensi yang sama.
+# Tidak bergantung pada streamlit; UI hanya membaca hasil per chunk dari BulkScanner.run().
+
+IMAGE_EXT = (".jpg", ".jpeg", ".png")
+MAX_BULK_ITEMS = 500
+MAX_ITEM_BYTES = 15 * 1024 * 1024
+SEND_MAX_SIDE = 1024   # ROI dikirim maksimal segini (model hanya butuh ~224 px)
+CHUNK_SIZE = 8         # gambar per request /predict/batch
+MAX_RETRY_WAIT = 5.0   # detik maksimal menunggu Retry-After dari API yang penuh
+
+DEMO_RESULT = {
+    "prediction": "segar",
+    "confidence": 0.93,
+    "probabilities": {"segar": 0.93, "kurang_segar": 0.05, "tidak_layak": 0.02},
+}
+
+def expand_uploads(files, max_items: int = MAX_BULK_ITEMS):
+    """files: [(nama, bytes)] -> [(nama, bytes atau None, error)]; ZIP dibuka per member."""
+    out = []
+    for name, data in files:
+        if name.lower().endswith(".zip"):
+            try:
+                zf = zipfile.ZipFile(BytesIO(data))
+            except zipfile.BadZipFile:
+                out.append((name, None, "File ZIP tidak valid."))
+                continue
+            with zf:
+                for info in zf.infolist():
+                    if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                        continue
+                    if not info.filename.lower().endswith(IMAGE_EXT):
+                        continue
+                    if len(out) >= max_items:
+                        break
+                    if info.file_size > MAX_ITEM_BYTES:
+                        out.append((info.filename, None, "Ukuran gambar melebihi batas."))
+                        continue
+                    out.append((info.filename, zf.read(info), None))
+        elif len(data) > MAX_ITEM_BYTES:
+            out.append((name, None, "Ukuran gambar melebihi batas."))
+        else:
+            out.append((name, data, None))
+        if len(out) >= max_items:
+            break
+    return out[:max_items]
+
+def auto_roi(img: Image.Image, pad: float = 0.04):
+    """Bounding box objek yang berbeda dari warna latar (median tepi gambar); fallback gambar penuh."""
+    w, h = img.size
+    g = proxy_gray(img, 256)
+    border = np.concatenate([g[0], g[-1], g[:, 0], g[:, -1]])
+    bg = float(np.median(border))
+    thr = max(20.0, 2.5 * float(np.median(np.abs(border - bg))))
+    mask = np.abs(g - bg) > thr
+    if mask.mean() < 0.01:
+        return (0, 0, w, h)
+    rows = np.flatnonzero(mask.mean(axis=1) > 0.02)
+    cols = np.flatnonzero(mask.mean(axis=0) > 0.02)
+    if rows.size == 0 or cols.size == 0:
+        return (0, 0, w, h)
+    sy, sx = h / g.shape[0], w / g.shape[1]
+    px, py = pad * w, pad * h
+    left = max(0, int(cols[0] * sx - px))
+    top = max(0, int(rows[0] * sy - py))
+    right = min(w, int((cols[-1] + 1) * sx + px))
+    bottom = min(h, int((rows[-1] + 1) * sy + py))
+    if right - left < 16 or bottom - top < 16:
+        return (0, 0, w, h)
+    return (left, top, right, bottom)
+
+def roi_box(img: Image.Image, roi):
+    """roi: "auto", "full", atau (l, t, r, b) relatif 0..1."""
+    w, h = img.size
+    if roi == "auto":
+        return auto_roi(img)
+    if roi == "full" or roi is None:
+        return (0, 0, w, h)
+    l, t, r, b = roi
+    box = (int(l * w), int(t * h), max(int(l * w) + 2, int(r * w)), max(int(t * h) + 2, int(b * h)))
+    return (min(box[0], w - 2), min(box[1], h - 2), min(box[2], w), min(box[3], h))
+
+def prepare_item(name: str, data: bytes, roi):
+    """Decode (JPEG di skala kecil), quality gate, ROI, encode crop + thumbnail history."""
+    try:
+        img = Image.open(BytesIO(data))
+        size = img.size
+        if img.format == "JPEG":
+            # draft butuh kedua sisi >= target: minta kotak seproporsi gambar, bukan persegi
+            k = SEND_MAX_SIDE / max(size)
+            img.draft("RGB", (int(size[0] * k), int(size[1] * k)))
+        img = img.convert("RGB")
+    except Exception as e:
+        return {"image_name": name, "error": f"Gagal membaca gambar: {e}"}
+
+    ok, msg = validate_image_quality(img, size=size)
+    if not ok:
+        return {"image_name": name, "error": msg}
+
+    box = roi_box(img, roi)
+    crop = img.crop(box)
+    if max(crop.size) > SEND_MAX_SIDE:
+        # hanya crop yang diperkecil, bukan seluruh gambar
+        crop.thumbnail((SEND_MAX_SIDE, SEND_MAX_SIDE), Image.BILINEAR, reducing_gap=2.0)
+    buf = BytesIO()
+    crop.save(buf, format="JPEG", quality=90)
+    # koordinat ROI dilaporkan dalam ukuran gambar asli
+    s = size[0] / img.size[0]
+    orig_box = tuple(int(round(v * s)) for v in box)
+    return {
+        "image_name": name,
+        "roi_box": orig_box,
+        "jpeg": buf.getvalue(),
+        "thumb": print_jpeg(crop, dpi=THUMB_DPI),
+        "warning": msg,
+    }
+
+class BulkScanner:
+    def __init__(self, session, api_base: str = None, species: str = "ikan", concurrency: int = 4,
+                 chunk_size: int = CHUNK_SIZE, timeout: float = 120.0):
+        self.session = session
+        self.api_base = api_base  # None = mode demo (tanpa API)
+        self.species = species
+        self.concurrency = max(1, concurrency)
+        self.chunk_size = max(1, chunk_size)
+        self.timeout = timeout
+        self.batch_supported = True  # jadi False kalau API menjawab 404/405 untuk /predict/batch
+
+    def _post(self, path: str, files, retries: int = 2):
+        # timeout klien dikirim sebagai deadline; 429/503 (server penuh) diulang sesuai Retry-After
+        for attempt in range(retries + 1):
+            r = self.session.post(f"{self.api_base}{path}", files=files, data={"species": self.species},
+                                  headers={"X-Request-Timeout": str(self.timeout)}, timeout=self.timeout)
+            if r.status_code not in (429, 503) or attempt == retries:
+                return r
+            try:
+                wait = float(r.headers.get("Retry-After", 1))
+            except ValueError:
+                wait = 1.0
+            time.sleep(min(max(wait, 0.5), MAX_RETRY_WAIT))
+        return r
+
+    def _predict_single(self, item):
+        files = {"file": (item["image_name"], item["jpeg"], "image/jpeg")}
+        r = self._post("/predict", files)
+        if r.status_code != 200:
+            return {"error": f"{r.status_code}: {r.text[:200]}"}
+        return r.json()
+
+    def _predict_chunk(self, items):
+        if not items:
+            return []
+        if self.api_base is None:
+            return [dict(DEMO_RESULT) for _ in items]
+        if self.batch_supported:
+            files = [("files", (it["image_name"], it["jpeg"], "image/jpeg")) for it in items]
+            r = self._post("/predict/batch", files)
+            if r.status_code in (404, 405):
+                self.batch_supported = False
+            elif r.status_code != 200:
+                return [{"error": f"{r.status_code}: {r.text[:200]}"} for _ in items]
+            else:
+                outs = r.json()["results"]
+                return [o if o.get("ok") else {"error": o.get("error")} for o in outs]
+        return [self._predict_single(it) for it in items]
+
+    def _run_chunk(self, chunk, roi, source: str, stamp):
+        prepared = [prepare_item(name, data, roi) if data is not None else {"image_name": name, "error": err}
+                    for name, data, err in chunk]
+        ready = [p for p in prepared if "error" not in p]
+        try:
+            outs = iter(self._predict_chunk(ready))
+        except Exception as e:
+            outs = iter([{"error": f"Error koneksi ke API: {e}"}] * len(ready))
+        results = []
+        for p in prepared:
+            if "error" in p:
+                results.append({"image_name": p["image_name"], "ok": False, "error": p["error"]})
+                continue
+            out = next(outs)
+            if "error" in out:
+                results.append({"image_name": p["image_name"], "ok": False, "error": out["error"]})
+                continue
+            results.append({
+                "ok": True,
+                "time": stamp(),
+                "species": self.species,
+                "prediction": out.get("prediction"),
+                "confidence": float(out.get("confidence", 0.0)),
+                "probabilities": out.get("probabilities", {}),
+                "source": source,
+                "image_name": p["image_name"],
+                "roi_box": p["roi_box"],
+                "mode": "api" if self.api_base else "demo",
+                "warning": p["warning"] or None,
+                "thumb": p["thumb"],
+            })
+        return results
+
+    def run(self, items, roi="auto", source: str = "Bulk", stamp=None):
+        """items dari expand_uploads; yield list hasil per chunk begitu selesai (urutan selesai)."""
+        stamp = stamp or (lambda: "")
+        chunks = [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="smartfish-bulk") as ex:
+            futures = [ex.submit(self._run_chunk, c, roi, source, stamp) for c in chunks]
+            try:
+                for fut in as_completed(futures):
+                    yield fut.result()
+            finally:
+                for f in futures:
+                    f.cancel()
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# ----------------------------- PREDICTION CACHE -----------------------------
+# Key = model_version:species:sha256(gambar+species). Hasil stable_predict
+# deterministik terhadap key ini, jadi foto yang dikirim ulang (rerun Streamlit,
+# retry, penjual upload ulang) tidak perlu dihitung lagi.
+
+ENTRY_OVERHEAD = 200  # perkiraan kasar overhead dict/tuple per entry (byte)
+
+def cache_key(digest: str, species: str, model_version: str):
+    return f"{model_version}:{species}:{digest}"
+
+class DiskTier:
+    """Tier SQLite opsional supaya beberapa worker uvicorn bisa berbagi hit."""
+
+    def __init__(self, path: str, ttl: float):
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS prediction_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM prediction_cache WHERE key = ? AND expires > ?", (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, value):
+        with self._lock:
+            now = time.time()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO prediction_cache (key, value, expires) VALUES (?, ?, ?)",
+                (key, json.dumps(value), now + self.ttl),
+            )
+            self._puts += 1
+            if self._puts % 1000 == 0:
+                self._conn.execute("DELETE FROM prediction_cache WHERE expires <= ?", (now,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_RETRY = object()  # hasil future single-flight: leader gagal karena alasan miliknya sendiri, waiter coba lagi
+
+class PredictionCache:
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float, disk: DiskTier = None, run_io=None,
+                 private_error=None):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max(1, max_bytes)
+        self.ttl = ttl
+        self.disk = disk
+        # run_io(fn, *args) -> awaitable; akses SQLite jangan di event loop
+        self._run_io = run_io
+        # private_error(exc) -> True kalau error hanya berlaku untuk request leader (mis. deadline-nya
+        # sendiri habis); waiter yang ikut menunggu tidak menerima error itu tapi menghitung ulang
+        self._private_error = private_error or (lambda e: False)
+        self._data = OrderedDict()  # key -> (value, size, expires)
+        self._bytes = 0
+        self._inflight = {}  # key -> asyncio.Future (single-flight)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def _get_mem(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, size, expires = entry
+        if expires <= time.monotonic():
+            self._drop(key)
+            self.expired += 1
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def _drop(self, key):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def _put_mem(self, key, value):
+        if key in self._data:
+            self._drop(key)
+        size = len(json.dumps(value)) + len(key) + ENTRY_OVERHEAD
+        self._data[key] = (value, size, time.monotonic() + self.ttl)
+        self._bytes += size
+        while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._data))
+            self._drop(oldest)
+            self.evictions += 1
+
+    async def get_or_compute(self, key: str, compute):
+        """compute: fungsi async tanpa argumen, hanya dipanggil sekali per key walau request bersamaan."""
+        while True:
+            value = self._get_mem(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            fut = self._inflight.get(key)
+            if fut is None:
+                break
+            self.coalesced += 1
+            value = await asyncio.shield(fut)
+            if value is not _RETRY:
+                return value
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            value = None
+            if self.disk is not None:
+                value = await self._run_io(self.disk.get, key)
+            if value is not None:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+                value = await compute()
+                if self.disk is not None:
+                    await self._run_io(self.disk.put, key, value)
+            self._put_mem(key, value)
+            fut.set_result(value)
+            return value
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError) or self._private_error(e):
+                # leader dibatalkan / deadline leader habis: waiter lain jalan dengan deadline masing-masing
+                fut.set_result(_RETRY)
+                raise
+            fut.set_exception(e)
+            # hindari "Future exception was never retrieved" kalau tidak ada yang menunggu
+            fut.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_s": self.ttl,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "hit_ratio": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+            "inflight": len(self._inflight),
+            "disk": self.disk is not None,
+        }
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
@@ -0,0 +1,136 @@
+import json
+import os
+
+# ----------------------------- KONFIGURASI API -----------------------------
+# Semua nilai bisa diubah lewat environment variable tanpa ubah kode,
+# contoh: SMARTFISH_CPU_WORKERS=2 uvicorn app_api:app
+
+def env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+def env_str(name: str, default: str) -> str:
+    return os.getenv(name, default).strip()
+
+def env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+def env_json(name: str, default):
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return default
+
+CPU_COUNT = os.cpu_count() or 1
+
+# Thread pool: decode PIL & SHA-256 (keduanya melepas GIL)
+IO_WORKERS = env_int("SMARTFISH_IO_WORKERS", min(32, CPU_COUNT + 4))
+
+# Pool untuk scoring/model: "process" (default) atau "thread"
+CPU_POOL = env_str("SMARTFISH_CPU_POOL", "process").lower()
+CPU_WORKERS = env_int("SMARTFISH_CPU_WORKERS", CPU_COUNT)
+
+# Versi model ikut jadi bagian key cache; naikkan kalau model/logika scoring berubah
+MODEL_VERSION = env_str("SMARTFISH_MODEL_VERSION", "stable-demo-v1")
+
+# Cache prediksi (LRU + TTL, dibatasi jumlah entry dan memori)
+CACHE_ENTRIES = env_int("SMARTFISH_CACHE_ENTRIES", 10000)
+CACHE_MB = env_int("SMARTFISH_CACHE_MB", 64)
+CACHE_TTL = env_int("SMARTFISH_CACHE_TTL", 3600)  # detik
+# Path SQLite untuk tier disk (kosong = nonaktif), contoh: data/prediction_cache.db
+CACHE_DB = env_str("SMARTFISH_CACHE_DB", "")
+
+# Batas ukuran upload (413 kalau lewat)
+MAX_UPLOAD_MB = env_int("SMARTFISH_MAX_UPLOAD_MB", 15)     # per gambar
+MAX_BATCH_MB = env_int("SMARTFISH_MAX_BATCH_MB", 200)      # total body /predict/batch
+
+# Model per species (JSON), contoh: SMARTFISH_MODELS='{"ikan": "models/ikan.pt"}'
+# Species yang tidak ada di sini memakai backend stable demo.
+MODELS = env_json("SMARTFISH_MODELS", {})
+MODEL_WORKERS = env_int("SMARTFISH_MODEL_WORKERS", 1)
+# Registry model: dimuat saat pertama dipakai, LRU dievict kalau total melewati budget.
+# SMARTFISH_MODEL_PRELOAD="ikan,ayam" -> dimuat & di-warm-up saat start, /ready 503 sampai selesai.
+MODEL_BUDGET_MB = env_int("SMARTFISH_MODEL_BUDGET_MB", 1024)
+MODEL_PRELOAD = [s.strip() for s in env_str("SMARTFISH_MODEL_PRELOAD", "").split(",") if s.strip()]
+# Mode inferensi CPU: eager (fp32) | frozen (TorchScript freeze) | int8 (dynamic quantization).
+# Bandingkan dulu dengan `python -m benchmarks.bench_modes` sebelum mengganti mode.
+MODEL_MODE = env_str("SMARTFISH_MODEL_MODE", "eager")
+TORCH_THREADS = env_int("SMARTFISH_TORCH_THREADS", 0)                  # intra-op, 0 = default torch
+TORCH_INTEROP_THREADS = env_int("SMARTFISH_TORCH_INTEROP_THREADS", 0)  # inter-op, 0 = default torch
+# Ukuran input & mean/std per species (JSON), contoh:
+# SMARTFISH_PREPROCESS='{"ayam": {"size": [256, 256], "mean": [0.5, 0.5, 0.5], "std": [0.5, 0.5, 0.5]}}'
+PREPROCESS = env_json("SMARTFISH_PREPROCESS", {})
+
+# Dynamic micro-batching: kumpulkan request sampai BATCH_MAX atau BATCH_WAIT_MS
+BATCH_MAX = env_int("SMARTFISH_BATCH_MAX", 16)
+BATCH_WAIT_MS = env_float("SMARTFISH_BATCH_WAIT_MS", 5.0)
+
+# Admission control /predict & /predict/batch: lewat batas -> 503 + Retry-After (antrean)
+# atau 429 (rate limit per klien, X-Client-Id atau IP). 0 = rate limit mati.
+MAX_INFLIGHT = env_int("SMARTFISH_MAX_INFLIGHT", 64)
+MAX_QUEUE = env_int("SMARTFISH_MAX_QUEUE", 128)
+QUEUE_TIMEOUT = env_float("SMARTFISH_QUEUE_TIMEOUT", 10.0)        # detik maksimal menunggu slot
+RATE_LIMIT_RPS = env_float("SMARTFISH_RATE_LIMIT_RPS", 10.0)      # request/detik per klien
+RATE_LIMIT_BURST = env_int("SMARTFISH_RATE_LIMIT_BURST", 20)
+# Deadline /predict kalau klien tidak mengirim X-Request-Timeout (sama dengan timeout klien Streamlit)
+REQUEST_TIMEOUT = env_float("SMARTFISH_REQUEST_TIMEOUT", 30.0)
+
+# Database SQLite bersama aplikasi Streamlit (history & feedback), dipakai endpoint /export
+DB_FILE = env_str("SMARTFISH_DB", "data/smartfishid.db")
+REPORT_MAX_SCANS = env_int("SMARTFISH_REPORT_MAX_SCANS", 500)  # halaman maks /reports/daily
+
+# Validasi gambar dari header saja (tanpa decode piksel)
+ALLOWED_FORMATS = {f.strip().upper() for f in env_str("SMARTFISH_ALLOWED_FORMATS", "JPEG,PNG,WEBP").split(",") if f.strip()}
+MAX_IMAGE_PIXELS = env_int("SMARTFISH_MAX_IMAGE_PIXELS", 50_000_000)
+MIN_IMAGE_SIDE = env_int("SMARTFISH_MIN_IMAGE_SIDE", 16)
+
+# Quality gate (blur & exposure dari proxy kecil) sebelum inferensi upload /predict & /predict/batch
+# SMARTFISH_QUALITY='{"blur_min": 25, "clip_max": 0.7}' -> override ambang di quality.DEFAULT_QUALITY
+QUALITY_GATE = env_int("SMARTFISH_QUALITY_GATE", 1)
+QUALITY = env_json("SMARTFISH_QUALITY", {})
+
+# Job async (POST /jobs): antrean SQLite + file input di disk, bertahan saat restart.
+# SMARTFISH_JOB_WORKERS = job yang diproses bersamaan per proses (0 = proses ini hanya menerima job).
+JOBS_DB = env_str("SMARTFISH_JOBS_DB", "data/jobs.db")
+JOBS_DIR = env_str("SMARTFISH_JOBS_DIR", "data/jobs")
+JOB_WORKERS = env_int("SMARTFISH_JOB_WORKERS", 1)
+JOB_CHUNK = env_int("SMARTFISH_JOB_CHUNK", 16)                  # item per langkah (hasil disimpan per chunk)
+JOB_MAX_ITEMS = env_int("SMARTFISH_JOB_MAX_ITEMS", 10000)
+MAX_JOB_MB = env_int("SMARTFISH_MAX_JOB_MB", 2048)              # total body POST /jobs
+JOB_RETENTION_HOURS = env_float("SMARTFISH_JOB_RETENTION_HOURS", 72.0)  # hasil job selesai disimpan selama ini
+
+# Near-duplicate index: foto ulang (perceptual hash dekat dengan scan sebelumnya, species & model sama)
+# reuse = verdict lama dipakai ulang tanpa inferensi, flag = tetap inferensi tapi ditandai, off = mati.
+DEDUP_MODE = env_str("SMARTFISH_DEDUP", "reuse")
+DEDUP_HASH = env_str("SMARTFISH_DEDUP_HASH", "phash")           # phash | dhash
+DEDUP_DISTANCE = env_int("SMARTFISH_DEDUP_DISTANCE", 4)         # bit berbeda maksimal dari 64
+DEDUP_TTL = env_float("SMARTFISH_DEDUP_TTL", 600.0)             # detik; scan lebih lama tidak dipakai
+DEDUP_MAX_ENTRIES = env_int("SMARTFISH_DEDUP_MAX_ENTRIES", 50000)  # per species & versi model
+
+# Image session: upload sekali, prediksi banyak ROI (POST /images)
+IMAGE_DIR = env_str("SMARTFISH_IMAGE_DIR", "data/images")
+IMAGE_TTL = env_int("SMARTFISH_IMAGE_TTL", 1800)               # detik
+IMAGE_MAX_ITEMS = env_int("SMARTFISH_IMAGE_MAX_ITEMS", 500)
+IMAGE_DECODED_MB = env_int("SMARTFISH_IMAGE_DECODED_MB", 256)  # cache piksel hasil decode
+
+# Live stream /ws/predict: batas koneksi, frame per detik per klien, jarak dHash (bit) frame "sama"
+WS_MAX_CLIENTS = env_int("SMARTFISH_WS_MAX_CLIENTS", 32)
+WS_MAX_FPS = env_float("SMARTFISH_WS_MAX_FPS", 10.0)
+WS_DEDUP_DISTANCE = env_int("SMARTFISH_WS_DEDUP_DISTANCE", 4)
+
+# Profiling per request (opt-in): off | cprofile | sample
+# dipicu header X-SmartFish-Profile (nilai = PROFILE_TOKEN kalau diisi) atau 1 dari PROFILE_SAMPLE_N request
+PROFILE_MODE = env_str("SMARTFISH_PROFILE", "off").lower()
+PROFILE_SAMPLE_N = env_int("SMARTFISH_PROFILE_SAMPLE_N", 0)   # 0 = hanya lewat header
+PROFILE_DIR = env_str("SMARTFISH_PROFILE_DIR", "data/profiles")
+PROFILE_KEEP = env_int("SMARTFISH_PROFILE_KEEP", 50)
+PROFILE_TOKEN = env_str("SMARTFISH_PROFILE_TOKEN", "")
+PROFILE_INTERVAL_MS = env_float("SMARTFISH_PROFILE_INTERVAL_MS", 2.0)  # mode sample
@@ -0,0 +1,116 @@
+import time
+
+import numpy as np
+
+from imaging import dhash, phash
+
+# ----------------------------- NEAR-DUPLICATE INDEX -----------------------------
+# Foto ikan yang sama diambil ulang sedetik kemudian punya byte berbeda (cache exact-hash
+# meleset) padahal isinya sama. Index ini menyimpan perceptual hash 64-bit scan terakhir
+# per (species, versi model) dan mencari yang jarak Hamming-nya <= distance:
+#   reuse : verdict sebelumnya dipakai ulang tanpa inferensi (hasil konsisten untuk foto ulang)
+#   flag  : inferensi tetap jalan, respons ditandai near_duplicate + verdict sebelumnya
+# Hash disimpan sebagai array uint64 dan dicari dengan XOR + popcount vektor (NumPy),
+# ~puluhan mikrodetik untuk ribuan entri, jadi cukup dijalankan di event loop.
+# TTL pendek disengaja: ikan yang sama beberapa jam kemudian memang bisa berubah kesegarannya.
+
+DEDUP_MODES = ("off", "flag", "reuse")
+HASHERS = {"phash": phash, "dhash": dhash}
+
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def hamming_many(hashes: np.ndarray, h: int) -> np.ndarray:
+    """Jarak Hamming satu hash 64-bit terhadap array uint64."""
+    x = hashes ^ np.uint64(h)
+    if hasattr(np, "bitwise_count"):  # NumPy >= 2.0
+        return np.bitwise_count(x)
+    return _POPCOUNT8[x.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+class HashShard:
+    """Ring buffer hash + waktu + metadata untuk satu (species, versi model)."""
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        size = min(self.capacity, 1024)
+        self.hashes = np.zeros(size, dtype=np.uint64)
+        self.times = np.zeros(size, dtype=np.float64)
+        self.meta = [None] * size
+        self.n = 0     # entri terisi
+        self.pos = 0   # slot tulis berikutnya (setelah penuh: menimpa yang tertua)
+
+    def add(self, h: int, meta, now: float):
+        if self.pos == len(self.hashes) and len(self.hashes) < self.capacity:
+            size = min(self.capacity, len(self.hashes) * 2)
+            self.hashes = np.resize(self.hashes, size)
+            self.times = np.resize(self.times, size)
+            self.meta.extend([None] * (size - len(self.meta)))
+        if self.pos == len(self.hashes):
+            self.pos = 0
+        self.hashes[self.pos] = h
+        self.times[self.pos] = now
+        self.meta[self.pos] = meta
+        self.pos += 1
+        self.n = max(self.n, self.pos)
+
+    def nearest(self, h: int, max_distance: int, since: float):
+        if self.n == 0:
+            return None
+        d = hamming_many(self.hashes[:self.n], h).astype(np.int16)
+        d[self.times[:self.n] < since] = 99  # kedaluwarsa
+        i = int(np.argmin(d))
+        if d[i] > max_distance:
+            return None
+        return self.meta[i], int(d[i]), float(self.times[i])
+
+class NearDuplicateIndex:
+    def __init__(self, mode: str = "reuse", distance: int = 4, ttl: float = 600.0,
+                 max_entries: int = 50000, hasher: str = "phash"):
+        if mode not in DEDUP_MODES:
+            raise ValueError(f"SMARTFISH_DEDUP tidak dikenal: {mode} (pilihan: {', '.join(DEDUP_MODES)})")
+        if hasher not in HASHERS:
+            raise ValueError(f"SMARTFISH_DEDUP_HASH tidak dikenal: {hasher} (pilihan: {', '.join(HASHERS)})")
+        self.mode = mode
+        self.distance = distance
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hasher = hasher
+        self._hash = HASHERS[hasher]
+        self._shards = {}
+        self.lookups = 0
+        self.matches = 0
+
+    @property
+    def enabled(self):
+        return self.mode != "off"
+
+    def hash(self, img) -> int:
+        """Perceptual hash gambar (PIL); dipanggil di thread pool."""
+        return self._hash(img)
+
+    def lookup(self, key, h: int):
+        """(meta, jarak, waktu) scan terdekat yang belum kedaluwarsa dalam batas jarak, atau None."""
+        self.lookups += 1
+        shard = self._shards.get(key)
+        if shard is None:
+            return None
+        found = shard.nearest(h, self.distance, time.time() - self.ttl)
+        if found is not None:
+            self.matches += 1
+        return found
+
+    def add(self, key, h: int, meta):
+        shard = self._shards.get(key)
+        if shard is None:
+            shard = self._shards[key] = HashShard(self.max_entries)
+        shard.add(h, meta, time.time())
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "hash": self.hasher,
+            "distance": self.distance,
+            "ttl_s": self.ttl,
+            "entries": sum(s.n for s in self._shards.values()),
+            "lookups": self.lookups,
+            "matches": self.matches,
+        }
@@ -0,0 +1,109 @@
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import config
+import profiling
+
+# ----------------------------- EXECUTOR LAYER -----------------------------
+# Handler async tidak boleh menjalankan kerja CPU langsung di event loop.
+# Kerja berat di-await lewat pool di bawah ini supaya /health tetap responsif.
+
+class Pool:
+    def __init__(self, name: str, kind: str, workers: int):
+        self.name = name
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.inflight = 0   # sudah disubmit, belum selesai
+        self.completed = 0
+        self.failed = 0
+        self._executor = None
+
+    def _get(self):
+        if self._executor is None:
+            if self.kind == "process":
+                # spawn: aman walau proses induk sudah punya thread (uvicorn, thread pool)
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix=f"smartfish-{self.name}",
+                )
+        return self._executor
+
+    async def run(self, fn, *args, **kwargs):
+        if kwargs:
+            fn = functools.partial(fn, **kwargs)
+        loop = asyncio.get_running_loop()
+        # counter hanya diubah dari thread event loop, jadi tidak perlu lock
+        self.inflight += 1
+        try:
+            session = profiling.active()
+            if session is not None:
+                # request sedang diprofil: worker ikut menjalankan cProfile, stats digabung
+                res, stats = await loop.run_in_executor(self._get(), profiling.run_profiled, fn, *args)
+                session.add_stats(stats)
+            else:
+                res = await loop.run_in_executor(self._get(), fn, *args)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.inflight -= 1
+        # completed = selesai tanpa error; yang raise hanya masuk failed
+        self.completed += 1
+        return res
+
+    def stats(self):
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "inflight": self.inflight,
+            "queue_depth": max(0, self.inflight - self.workers),
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+    def start(self):
+        ex = self._get()
+        if self.kind == "process":
+            # panaskan worker supaya request pertama tidak menanggung biaya spawn
+            for f in [ex.submit(int, 0) for _ in range(self.workers)]:
+                f.result()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+class Executors:
+    def __init__(self, io_workers: int, cpu_workers: int, cpu_kind: str, model_workers: int = 1):
+        if cpu_kind not in ("process", "thread"):
+            cpu_kind = "process"
+        self.io = Pool("io", "thread", io_workers)
+        self.cpu = Pool("cpu", cpu_kind, cpu_workers)
+        # model torch tinggal di proses ini; paralelisme dari intra-op thread torch
+        self.model = Pool("model", "thread", model_workers)
+
+    @classmethod
+    def from_config(cls):
+        return cls(config.IO_WORKERS, config.CPU_WORKERS, config.CPU_POOL, config.MODEL_WORKERS)
+
+    def get(self, name: str) -> Pool:
+        return getattr(self, name)
+
+    def start(self):
+        self.io.start()
+        self.cpu.start()
+
+    def shutdown(self):
+        self.io.shutdown()
+        self.cpu.shutdown()
+        self.model.shutdown()
+
+    def stats(self):
+        return {"io": self.io.stats(), "cpu": self.cpu.stats(), "model": self.model.stats()}
@@ -0,0 +1,58 @@
+import csv
+import io
+import json
+
+# ----------------------------- EXPORT STREAMING -----------------------------
+# Generator CSV / NDJSON / JSON array: baris dibaca dan ditulis bertahap,
+# jadi export history besar memakai memori konstan. Dipakai oleh tombol
+# download Streamlit dan endpoint /export di API.
+
+HISTORY_CSV_FIELDS = ["time", "prediction", "confidence", "source", "image_name", "roi_box"]
+FEEDBACK_CSV_FIELDS = ["time", "nama", "peran", "rating", "komentar", "last_prediction", "last_confidence"]
+
+def iter_csv(rows, fields, rows_per_chunk: int = 256):
+    """CSV dengan quoting yang benar (koma di image_name / roi_box tidak merusak kolom)."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(fields)
+    n = 0
+    for row in rows:
+        writer.writerow(["" if row.get(k) is None else row.get(k) for k in fields])
+        n += 1
+        if n % rows_per_chunk == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    tail = buf.getvalue()
+    if tail:
+        yield tail
+
+def iter_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False, default=list) + "\n"
+
+def iter_json_array(rows, indent: int = 2):
+    """Array JSON ditulis per item (format sama seperti json.dumps(list, indent=2))."""
+    pad = " " * indent
+    first = True
+    yield "["
+    for row in rows:
+        item = json.dumps(row, indent=indent, ensure_ascii=False, default=list)
+        yield ("\n" if first else ",\n") + pad + item.replace("\n", "\n" + pad)
+        first = False
+    yield "]" if first else "\n]"
+
+def iter_encoded(chunks, encoding: str = "utf-8"):
+    for chunk in chunks:
+        yield chunk.encode(encoding)
+
+def collect(chunks) -> bytes:
+    """Gabungkan generator jadi bytes (untuk st.download_button yang butuh isi lengkap)."""
+    return b"".join(iter_encoded(chunks))
+
+def history_to_csv(history):
+    out = io.BytesIO()
+    for chunk in iter_encoded(iter_csv(history, HISTORY_CSV_FIELDS)):
+        out.write(chunk)
+    out.seek(0)
+    return out
@@ -0,0 +1,206 @@
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+from PIL import Image
+
+# ----------------------------- IMAGE SESSIONS -----------------------------
+# Gambar penuh di-upload sekali (POST /images) lalu dipakai berkali-kali lewat
+# image_id + roi_box. File mentah disimpan di disk (bisa dibaca semua worker),
+# piksel hasil decode di-cache di memori dengan batas byte. Proxy kecil (JPEG di-decode
+# langsung di skala kecil lewat draft) cukup untuk quality gate & perceptual hash ROI,
+# jadi backend yang tidak butuh piksel tidak pernah men-decode resolusi penuh.
+
+PROXY_MAX_SIDE = 1024
+
+IMAGE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+class ImageStore:
+    def __init__(self, root: str, ttl: float, max_items: int, max_decoded_bytes: int):
+        self.root = root
+        self.ttl = ttl
+        self.max_items = max(1, max_items)
+        self.max_decoded_bytes = max(1, max_decoded_bytes)
+        self._lock = threading.Lock()
+        self._meta = OrderedDict()     # image_id -> {"size", "width", "height", "format", "expires"}
+        self._decoded = OrderedDict()  # (image_id, max_side | None) -> PIL.Image RGB
+        self._decoded_bytes = 0
+        self.decode_hits = 0
+        self.decode_misses = 0
+        self.evictions = 0
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, image_id: str):
+        return os.path.join(self.root, image_id)
+
+    def put(self, fp, image_id: str, width: int, height: int, fmt: str):
+        """Simpan isi file upload (fp) sebagai image_id; id berbasis isi, jadi upload ulang tidak menggandakan."""
+        path = self._path(image_id)
+        if not os.path.exists(path):
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            fp.seek(0)
+            with open(tmp, "wb") as out:
+                shutil.copyfileobj(fp, out, 1024 * 1024)
+            os.replace(tmp, path)
+        else:
+            os.utime(path)  # perpanjang TTL
+        with self._lock:
+            self._meta.pop(image_id, None)
+            self._meta[image_id] = {
+                "size": os.path.getsize(path),
+                "width": width,
+                "height": height,
+                "format": fmt,
+                "expires": time.time() + self.ttl,
+            }
+            evicted = self._evict_locked()
+        self._remove_files(evicted)
+        return self._meta.get(image_id)
+
+    def get(self, image_id: str):
+        """Metadata gambar, atau None kalau tidak ada / kedaluwarsa."""
+        if not IMAGE_ID_RE.match(image_id or ""):
+            return None
+        now = time.time()
+        with self._lock:
+            meta = self._meta.get(image_id)
+            if meta is not None and meta["expires"] > now:
+                self._meta.move_to_end(image_id)
+                return meta
+        # mungkin di-upload lewat worker uvicorn lain: cek file di disk
+        path = self._path(image_id)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        if mtime + self.ttl <= now:
+            self.delete(image_id)
+            return None
+        try:
+            with Image.open(path) as img:
+                meta = {"size": os.path.getsize(path), "width": img.width, "height": img.height,
+                        "format": img.format, "expires": mtime + self.ttl}
+        except FileNotFoundError:
+            return None  # dihapus cleanup / worker lain di antara cek dan open
+        with self._lock:
+            self._meta[image_id] = meta
+            evicted = self._evict_locked()
+        self._remove_files(evicted)
+        return meta
+
+    def decoded(self, image_id: str):
+        """Piksel RGB resolusi penuh (di-cache). Jangan dimodifikasi, crop menghasilkan objek baru.
+
+        FileNotFoundError kalau file sudah dihapus (TTL) setelah get() berhasil.
+        """
+        return self._cached((image_id, None))
+
+    def proxy(self, image_id: str, max_side: int = PROXY_MAX_SIDE):
+        """Versi kecil RGB (sisi terpanjang ~max_side..2*max_side untuk JPEG, di-cache); (img, skala x, skala y)."""
+        with self._lock:
+            meta = self._meta.get(image_id)
+        img = self._cached((image_id, max_side))
+        w, h = (meta["width"], meta["height"]) if meta else img.size
+        return img, img.width / w, img.height / h
+
+    def _load(self, image_id: str, max_side: int = None):
+        with Image.open(self._path(image_id)) as raw:
+            if max_side is not None:
+                w, h = raw.size
+                k = min(1.0, max_side / max(w, h))
+                if raw.format == "JPEG":
+                    # draft butuh kedua sisi >= target: kotak seproporsi gambar
+                    raw.draft("RGB", (int(w * k), int(h * k)))
+                img = raw.convert("RGB")
+                if max(img.size) > 2 * max_side:
+                    img = img.reduce(max(1, int(max(img.size) // max_side)))
+                return img
+            return raw.convert("RGB")
+
+    def _cached(self, key):
+        with self._lock:
+            img = self._decoded.get(key)
+            if img is not None:
+                self._decoded.move_to_end(key)
+                self.decode_hits += 1
+                return img
+        img = self._load(*key)
+        nbytes = img.width * img.height * 3
+        with self._lock:
+            self.decode_misses += 1
+            if key not in self._decoded:
+                self._decoded[key] = img
+                self._decoded_bytes += nbytes
+            while self._decoded_bytes > self.max_decoded_bytes and len(self._decoded) > 1:
+                _, old = self._decoded.popitem(last=False)
+                self._decoded_bytes -= old.width * old.height * 3
+        return img
+
+    def delete(self, image_id: str):
+        with self._lock:
+            self._meta.pop(image_id, None)
+            self._drop_decoded_locked(image_id)
+        self._remove_files([image_id])
+
+    def cleanup(self):
+        now = time.time()
+        with self._lock:
+            expired = [i for i, m in self._meta.items() if m["expires"] <= now]
+            for image_id in expired:
+                del self._meta[image_id]
+                self._drop_decoded_locked(image_id)
+        # file dari worker lain yang sudah lewat TTL
+        for name in os.listdir(self.root):
+            if IMAGE_ID_RE.match(name) and name not in expired:
+                try:
+                    if os.path.getmtime(self._path(name)) + self.ttl <= now:
+                        expired.append(name)
+                except OSError:
+                    pass
+        self._remove_files(expired)
+        return len(expired)
+
+    def _evict_locked(self):
+        evicted = []
+        while len(self._meta) > self.max_items:
+            image_id, _ = self._meta.popitem(last=False)
+            self._drop_decoded_locked(image_id)
+            evicted.append(image_id)
+            self.evictions += 1
+        return evicted
+
+    def _drop_decoded_locked(self, image_id: str):
+        for key in [k for k in self._decoded if k[0] == image_id]:
+            img = self._decoded.pop(key)
+            self._decoded_bytes -= img.width * img.height * 3
+
+    def _remove_files(self, ids):
+        for image_id in ids:
+            try:
+                os.remove(self._path(image_id))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "images": len(self._meta),
+                "max_items": self.max_items,
+                "ttl_s": self.ttl,
+                "decoded": len(self._decoded),
+                "decoded_bytes": self._decoded_bytes,
+                "max_decoded_bytes": self.max_decoded_bytes,
+                "decode_hits": self.decode_hits,
+                "decode_misses": self.decode_misses,
+                "evictions": self.evictions,
+            }
+
+def parse_roi_box(text: str):
+    """'l,t,r,b', '(l, t, r, b)' atau '[l, t, r, b]' -> tuple int."""
+    parts = [p for p in re.split(r"[\s,()\[\]]+", text or "") if p]
+    if len(parts) != 4:
+        raise ValueError("roi_box harus berisi 4 angka: left,top,right,bottom")
+    return tuple(int(float(p)) for p in parts)
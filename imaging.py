@@ -0,0 +1,88 @@
+import warnings
+
+import numpy as np
+from PIL import Image, UnidentifiedImageError
+
+# ----------------------------- IMAGE PROBE & DECODE -----------------------------
+# Validasi cukup dari header (format, ukuran, batas decompression bomb) tanpa
+# decode piksel. Kalau piksel dibutuhkan model, JPEG di-decode langsung ke skala
+# 1/2, 1/4 atau 1/8 lewat draft() sebelum di-resize ke resolusi input model.
+
+class ImageRejected(ValueError):
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def probe_image(fp, allowed_formats, max_pixels: int, min_side: int = 1):
+    """Buka gambar secara lazy (hanya header) dan cek format & dimensi."""
+    fp.seek(0)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", Image.DecompressionBombWarning)
+            img = Image.open(fp)
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        raise ImageRejected(f"Gambar terlalu besar (maks {max_pixels} piksel).", 413)
+    except UnidentifiedImageError:
+        raise ImageRejected("File bukan gambar yang dikenali.", 400)
+
+    if img.format not in allowed_formats:
+        raise ImageRejected(f"Format {img.format} tidak didukung. Gunakan: {', '.join(sorted(allowed_formats))}.", 415)
+    w, h = img.size
+    if w * h > max_pixels:
+        raise ImageRejected(f"Gambar terlalu besar: {w}x{h} (maks {max_pixels} piksel).", 413)
+    if min(w, h) < min_side:
+        raise ImageRejected(f"Resolusi terlalu kecil: {w}x{h} (min sisi {min_side} px).", 422)
+    return img
+
+def decode_to_size(img: Image.Image, target_size):
+    """Decode piksel langsung ke target_size (w, h); JPEG memakai DCT scaling."""
+    if img.format == "JPEG":
+        # draft memilih skala terkecil yang masih >= target, jadi kualitas resize tetap terjaga
+        img.draft("RGB", target_size)
+    img = img.convert("RGB")
+    if img.size != tuple(target_size):
+        img = img.resize(target_size, Image.BILINEAR, reducing_gap=3.0)
+    return img
+
+# ----------------------------- PERCEPTUAL HASH -----------------------------
+def dhash(img: Image.Image, size: int = 8) -> int:
+    """Difference hash 64-bit (size x size bit): murah, tahan kompresi & noise kecil.
+
+    JPEG yang masih lazy di-decode di skala 1/8 lewat draft(); objek img ikut berubah.
+    """
+    if img.format == "JPEG":
+        img.draft("L", (size * 8, size * 8))
+    small = np.asarray(img.convert("L").resize((size + 1, size), Image.BILINEAR), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+_DCT = {}
+
+def _dct_matrix(n: int):
+    # matriks DCT-II ortonormal n x n; DCT 2D = M @ X @ M.T
+    m = _DCT.get(n)
+    if m is None:
+        k = np.arange(n, dtype=np.float64)[:, None]
+        x = np.arange(n, dtype=np.float64)[None, :]
+        m = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+        m[0] /= np.sqrt(2.0)
+        m = _DCT[n] = m.astype(np.float32)
+    return m
+
+def phash(img: Image.Image, size: int = 8, factor: int = 4) -> int:
+    """Perceptual hash 64-bit: DCT thumbnail grayscale (size*factor)^2, bit = frekuensi rendah > median.
+
+    Lebih tahan geser kecil, exposure & kompresi dibanding dHash; JPEG lazy di-decode
+    kecil lewat draft(), objek img ikut berubah.
+    """
+    n = size * factor
+    if img.format == "JPEG":
+        img.draft("L", (n * 4, n * 4))
+    small = np.asarray(img.convert("L").resize((n, n), Image.BILINEAR), dtype=np.float32)
+    m = _dct_matrix(n)
+    low = (m @ small @ m.T)[:size, :size].ravel()
+    bits = low > np.median(low[1:])  # koefisien DC (rata-rata terang) tidak ikut menentukan median
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
@@ -0,0 +1,317 @@
+import asyncio
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+
+from storage import connect
+
+# ----------------------------- ASYNC JOBS -----------------------------
+# Kiriman besar (lelang grosir, ribuan foto) tidak perlu menahan koneksi HTTP:
+# POST /jobs menyimpan file ke disk + antrean SQLite lalu langsung membalas job_id.
+# Worker di background memproses item per chunk lewat jalur prediksi yang sama,
+# hasil per item disimpan begitu selesai. Job yang sedang jalan saat proses mati
+# (heartbeat basi) diantrekan ulang dan dilanjutkan dari item yang belum selesai.
+
+JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+JOB_STATES = ("queued", "running", "done", "failed")
+ARCHIVE_NAME = "archive.zip"
+
+class JobLost(RuntimeError):
+    """Job sudah tidak dipegang worker ini (diantrekan ulang karena heartbeat basi, diklaim worker lain)."""
+
+class JobStore:
+    def __init__(self, path: str, root: str):
+        self.path = path
+        self.root = root
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        os.makedirs(root, exist_ok=True)
+        with self._conn:
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, status TEXT NOT NULL, created REAL, started REAL, finished REAL,"
+                " heartbeat REAL, worker TEXT, total INTEGER, processed INTEGER DEFAULT 0,"
+                " ok INTEGER DEFAULT 0, failed INTEGER DEFAULT 0, error TEXT, client TEXT);"
+                "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created);"
+                "CREATE TABLE IF NOT EXISTS job_items ("
+                " job_id TEXT NOT NULL, idx INTEGER NOT NULL, name TEXT, source TEXT, species TEXT,"
+                " status TEXT NOT NULL DEFAULT 'pending', result TEXT, PRIMARY KEY (job_id, idx));"
+                "CREATE INDEX IF NOT EXISTS idx_job_items_pending ON job_items(job_id, status, idx);"
+            )
+
+    @staticmethod
+    def new_id():
+        return uuid.uuid4().hex
+
+    def job_dir(self, job_id: str):
+        if not JOB_ID_RE.match(job_id):
+            raise ValueError("job_id tidak valid")
+        return os.path.join(self.root, job_id)
+
+    def create(self, job_id: str, items, client: str = None):
+        """items: [(name, source, species)]; source = path relatif di job_dir atau 'zip:<member>'."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, created, total, client) VALUES (?, 'queued', ?, ?, ?)",
+                (job_id, now, len(items), client),
+            )
+            self._conn.executemany(
+                "INSERT INTO job_items (job_id, idx, name, source, species) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, i, name, source, species) for i, (name, source, species) in enumerate(items)],
+            )
+        return self.get(job_id)
+
+    def claim(self, worker: str):
+        """Ambil job antrean tertua; UPDATE bersyarat supaya aman walau beberapa proses uvicorn berbagi DB.
+
+        worker = token unik per klaim; save_results / finish / heartbeat hanya berlaku untuk pemegang token.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            claimed = self._conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, heartbeat = ?, started = COALESCE(started, ?) "
+                "WHERE id = ? AND status = 'queued'",
+                (worker, now, now, row["id"]),
+            ).rowcount
+        return self.get(row["id"]) if claimed else None
+
+    def pending(self, job_id: str, limit: int):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT idx, name, source, species FROM job_items WHERE job_id = ? AND status = 'pending' "
+                "ORDER BY idx LIMIT ?",
+                (job_id, limit),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def save_results(self, job_id: str, results, worker: str):
+        """results: [(idx, dict hasil dengan key 'ok')]; counter job ikut di-update dalam transaksi yang sama.
+
+        JobLost kalau job sudah bukan milik worker. Counter hanya bertambah untuk item yang benar-benar
+        berubah dari 'pending' (item yang sudah disimpan worker lain tidak dihitung dua kali).
+        """
+        with self._lock, self._conn:
+            # UPDATE pertama sekaligus cek kepemilikan & membuka write transaction: requeue dari proses
+            # lain tidak bisa menyela di antara cek dan simpan
+            owned = self._conn.execute(
+                "UPDATE jobs SET heartbeat = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (time.time(), job_id, worker),
+            ).rowcount
+            if not owned:
+                raise JobLost(job_id)
+            done = ok = 0
+            for idx, r in results:
+                changed = self._conn.execute(
+                    "UPDATE job_items SET status = ?, result = ? WHERE job_id = ? AND idx = ? AND status = 'pending'",
+                    ("ok" if r.get("ok") else "error", json.dumps(r, ensure_ascii=False), job_id, idx),
+                ).rowcount
+                if changed:
+                    done += 1
+                    ok += 1 if r.get("ok") else 0
+            self._conn.execute(
+                "UPDATE jobs SET processed = processed + ?, ok = ok + ?, failed = failed + ? WHERE id = ?",
+                (done, ok, done - ok, job_id),
+            )
+        return done
+
+    def heartbeat(self, claims):
+        """claims: [(job_id, worker)]."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE jobs SET heartbeat = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                                   [(now, j, w) for j, w in claims])
+
+    def finish(self, job_id: str, status: str, error: str = None, worker: str = None):
+        """False kalau job sudah bukan milik worker (status & file input dibiarkan untuk pemegang baru)."""
+        with self._lock, self._conn:
+            changed = self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (status, error, time.time(), job_id, worker),
+            ).rowcount
+        if not changed:
+            return False
+        # file input tidak dibutuhkan lagi; hasil tetap di DB sampai masa retensi habis
+        shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+        return True
+
+    def requeue_stale(self, stale_after: float):
+        """Job 'running' tanpa heartbeat (proses mati / restart) kembali ke antrean."""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND heartbeat < ?",
+                (time.time() - stale_after,),
+            ).rowcount
+
+    def get(self, job_id: str):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        d = dict(row)
+        d["progress"] = round(d["processed"] / d["total"], 4) if d["total"] else 1.0
+        return d
+
+    def iter_results(self, job_id: str, after: int = -1, chunk: int = 500):
+        """Hasil item yang sudah selesai, urut idx, dibaca per chunk (memori konstan)."""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT idx, result FROM job_items WHERE job_id = ? AND idx > ? AND status != 'pending' "
+                    "ORDER BY idx LIMIT ?",
+                    (job_id, after, chunk),
+                ).fetchall()
+            if not rows:
+                return
+            for r in rows:
+                yield json.loads(r["result"])
+            after = rows[-1]["idx"]
+
+    def purge(self, retention: float):
+        """Hapus job selesai yang lebih tua dari retention detik (baris + sisa file)."""
+        cutoff = time.time() - retention
+        with self._lock, self._conn:
+            ids = [r["id"] for r in self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('done', 'failed') AND finished < ?", (cutoff,)
+            )]
+            self._conn.executemany("DELETE FROM job_items WHERE job_id = ?", [(j,) for j in ids])
+            self._conn.executemany("DELETE FROM jobs WHERE id = ?", [(j,) for j in ids])
+        for j in ids:
+            shutil.rmtree(self.job_dir(j), ignore_errors=True)
+        return len(ids)
+
+    def delete(self, job_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM job_items WHERE job_id = ?", (job_id,))
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = {s: 0 for s in JOB_STATES}
+        counts.update({r["status"]: r["n"] for r in rows})
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class JobRunner:
+    """Worker asyncio: klaim job, proses item pending per chunk, simpan hasil, ulangi."""
+
+    def __init__(self, store: JobStore, process, run_io, workers: int = 1, chunk: int = 16,
+                 retention: float = 72 * 3600, stale_after: float = 60.0, poll: float = 2.0):
+        """process: async process(job, items) -> [(idx, hasil)]; run_io: async run(fn, *args)."""
+        self.store = store
+        self.process = process
+        self.run_io = run_io
+        self.workers = max(0, workers)
+        self.chunk = max(1, chunk)
+        self.retention = retention
+        self.stale_after = stale_after
+        self.poll = poll
+        self.worker_id = f"{os.getpid()}"
+        self.running = {}  # job_id -> token klaim
+        self.items_done = 0
+        # jumlah job per status dari DB; query jalan di run_io, /metrics hanya membaca nilai ini
+        self.counts = {st: 0 for st in JOB_STATES}
+        self._wake = asyncio.Event()
+        self._tasks = []
+
+    def start(self):
+        if self.workers == 0:
+            # proses ini hanya menerima job (worker jalan di proses lain); counts tetap di-refresh
+            self._tasks = [asyncio.create_task(self._refresh_loop())]
+            return
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._housekeeping()))
+
+    def notify(self):
+        self._wake.set()
+
+    async def _worker(self):
+        while True:
+            self._wake.clear()
+            job = await self.run_io(self.store.claim, f"{self.worker_id}:{uuid.uuid4().hex[:12]}")
+            if job is None:
+                # poll tetap jalan: job dari proses lain / sisa sebelum restart ikut terambil
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+            self._wake.set()  # mungkin masih ada job lain di antrean
+
+    async def _run(self, job):
+        job_id, worker = job["id"], job["worker"]
+        self.running[job_id] = worker
+        status, error = "done", None
+        try:
+            while True:
+                items = await self.run_io(self.store.pending, job_id, self.chunk)
+                if not items:
+                    break
+                results = await self.process(job, items)
+                self.items_done += await self.run_io(self.store.save_results, job_id, results, worker)
+        except asyncio.CancelledError:
+            # shutdown: biarkan 'running', heartbeat basi membuat job diantrekan ulang saat start berikutnya
+            raise
+        except JobLost:
+            return  # diantrekan ulang / dipegang worker lain: jangan tandai selesai
+        except Exception as e:
+            status, error = "failed", f"{type(e).__name__}: {e}"
+        finally:
+            self.running.pop(job_id, None)
+        await self.run_io(self.store.finish, job_id, status, error, worker)
+        try:
+            await self.refresh()
+        except Exception:
+            pass  # hanya angka /health & /metrics; housekeeping mencoba lagi
+
+    async def _housekeeping(self):
+        while True:
+            try:
+                if self.running:
+                    await self.run_io(self.store.heartbeat, list(self.running.items()))
+                await self.run_io(self.store.requeue_stale, self.stale_after)
+                await self.run_io(self.store.purge, self.retention)
+                await self.refresh()
+            except Exception:
+                pass  # housekeeping gagal sesekali (DB sibuk) dicoba lagi putaran berikutnya
+            await asyncio.sleep(self.stale_after / 4)
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                pass  # DB sibuk: counts lama tetap dipakai sampai putaran berikutnya
+            await asyncio.sleep(self.stale_after / 4)
+
+    async def refresh(self):
+        """Baca ulang jumlah job per status (GROUP BY di thread io, bukan di event loop)."""
+        self.counts = await self.run_io(self.store.stats)
+        return self.counts
+
+    def stats(self):
+        # tanpa akses DB: lock store bisa sedang dipegang worker (save_results / purge);
+        # /health & /metrics membaca nilai cache yang di-refresh di background
+        return {"workers": self.workers, "active": sorted(self.running), "items_done": self.items_done,
+                "chunk": self.chunk, **self.counts}
+
+    async def close(self):
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
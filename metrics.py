@@ -0,0 +1,114 @@
+import threading
+from bisect import bisect_left
+
+# ----------------------------- METRICS (PROMETHEUS TEXT) -----------------------------
+# Tanpa dependency: histogram dengan bucket tetap (array count dialokasikan sekali per
+# kombinasi label), counter, dan gauge yang dibaca dari callback saat /metrics di-scrape.
+# observe() cukup bisect + increment di bawah lock, aman dipanggil dari thread pool.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# detik; dari cache hit (~0.1 ms) sampai decode gambar besar
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# byte; 16 KB .. 16 MB (batas upload default 15 MB)
+SIZE_BUCKETS = tuple(16 * 1024 * 2 ** i for i in range(11))
+
+def _fmt(v):
+    if v == float("inf"):
+        return "+Inf"
+    if isinstance(v, float) and v.is_integer():
+        return repr(v)
+    return str(v)
+
+def _labels(names, values, extra=""):
+    parts = ['%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets, labelnames=(), preset=()):
+        self.name, self.help = name, help
+        self.bounds = tuple(float(b) for b in buckets)
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series = {}  # labels -> [counts per bucket (+Inf terakhir), sum]
+        for labels in preset:
+            self._get(tuple(labels))
+
+    def _get(self, labels):
+        s = self._series.get(labels)
+        if s is None:
+            s = self._series[labels] = [[0] * (len(self.bounds) + 1), 0.0]
+        return s
+
+    def observe(self, value: float, labels=()):
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            s = self._get(labels)
+            s[0][i] += 1
+            s[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(k, list(v[0]), v[1]) for k, v in self._series.items()]
+        for labels, counts, total in series:
+            acc = 0
+            for bound, n in zip(self.bounds + (float("inf"),), counts):
+                acc += n
+                le = 'le="%s"' % _fmt(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {acc}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {acc}")
+        return lines
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name, self.help = name, help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, labels=(), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        lines += [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in items]
+        return lines
+
+class Gauge:
+    """Nilai diambil dari fn() saat render: angka, atau dict {tuple label: angka}.
+
+    kind="counter" untuk nilai monoton yang sudah dihitung komponen lain (mis. cache hits).
+    """
+
+    def __init__(self, name: str, help: str, fn, labelnames=(), kind: str = "gauge"):
+        self.name, self.help, self.fn = name, help, fn
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        value = self.fn()
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        lines += [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for m in self._metrics:
+            lines += m.render()
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,159 @@
+import asyncio
+import time
+
+from predictors import MODEL_MODES, StableDemoPredictor, TorchPredictor, model_version
+from preprocess import preprocess_config
+
+# ----------------------------- MODEL REGISTRY -----------------------------
+# Model torch per species dimuat saat pertama dipakai (bukan saat start), di-warm-up
+# sebelum dianggap siap, dan model yang paling lama tidak dipakai dievict kalau total
+# memori melewati budget. Species tanpa model (stable demo) selalu resident.
+
+class ModelUnavailable(RuntimeError):
+    pass
+
+class ModelEntry:
+    def __init__(self, key: str, classes, path: str = None, preprocess: dict = None):
+        self.key = key
+        self.classes = list(classes)
+        self.path = path
+        self.preprocess = preprocess
+        self.kind = TorchPredictor.name if path else StableDemoPredictor.name
+        # info statis: cukup untuk key cache & decode piksel tanpa memuat model
+        self.pool = TorchPredictor.pool if path else StableDemoPredictor.pool
+        self.needs_pixels = bool(path)
+        self.input_size = tuple(preprocess_config(preprocess)["size"]) if path else None
+        self.version = None
+        self.predictor = None
+        self.state = "unloaded"  # unloaded | loading | ready | failed
+        self.error = None
+        self.bytes = 0
+        self.last_used = 0.0
+        self.loads = 0
+        self.evictions = 0
+        self.load_ms = None
+        self._loading = None  # future single-flight saat load berjalan
+
+    def describe(self):
+        d = {"backend": self.kind, "state": self.state, "version": self.version, "classes": self.classes}
+        if self.path:
+            d.update({"path": self.path, "bytes": self.bytes, "loads": self.loads,
+                      "evictions": self.evictions, "load_ms": self.load_ms, "error": self.error})
+        if self.predictor is not None and self.path:
+            d.update({"format": self.predictor.format, "mode": self.predictor.mode,
+                      "threads": list(self.predictor.threads), "buffers": self.predictor.buffers.stats()})
+        return d
+
+class ModelRegistry:
+    def __init__(self, species_classes: dict, models: dict, stable_version: str, run_load,
+                 preprocess: dict = None, max_batch: int = 16, buffers: int = 1,
+                 budget_mb: int = 1024, warmup_batch: int = 1, mode: str = "eager",
+                 threads: int = 0, interop_threads: int = 0):
+        """models: {species: path_model}; run_load: async run(fn, *args), tempat load + warm-up jalan.
+
+        mode / threads: mode inferensi torch (lihat predictors.MODEL_MODES) untuk semua model.
+        """
+        if mode not in MODEL_MODES:
+            raise ValueError(f"SMARTFISH_MODEL_MODE tidak dikenal: {mode} (pilihan: {', '.join(MODEL_MODES)})")
+        preprocess = preprocess or {}
+        self.mode = mode
+        self.threads = threads
+        self.interop_threads = interop_threads
+        self._run_load = run_load
+        self.max_batch = max_batch
+        self.buffers = buffers
+        self.budget = budget_mb * 1024 * 1024
+        self.warmup_batch = warmup_batch
+        self.entries = {}
+        for species, classes in species_classes.items():
+            path = models.get(species)
+            self.entries[species] = ModelEntry(species, classes, path, preprocess.get(species) if path else None)
+        # species di luar daftar memakai kelas "ikan", sama seperti stable_predict
+        self.entries["*"] = ModelEntry("*", species_classes["ikan"])
+        for e in self.entries.values():
+            if e.path is None:
+                e.predictor = StableDemoPredictor(e.key, e.classes, stable_version)
+                e.version = stable_version
+                e.state = "ready"
+        self.evictions = 0
+
+    def entry(self, key: str) -> ModelEntry:
+        return self.entries[key]
+
+    async def version(self, key: str) -> str:
+        e = self.entries[key]
+        if e.version is None:
+            try:
+                e.version = await self._run_load(model_version, e.path, self.mode)
+            except OSError as ex:
+                raise ModelUnavailable(f"Model '{e.key}' tidak bisa dibaca: {ex}") from ex
+        return e.version
+
+    async def get(self, key: str):
+        e = self.entries[key]
+        e.last_used = time.monotonic()
+        if e.state == "ready":
+            return e.predictor
+        if e._loading is None:
+            e._loading = asyncio.ensure_future(self._load(e))
+        # shield: request yang dibatalkan tidak ikut membatalkan load untuk request lain
+        return await asyncio.shield(e._loading)
+
+    def _build(self, e: ModelEntry):
+        p = TorchPredictor(e.key, e.classes, e.path, e.preprocess, max_batch=self.max_batch, buffers=self.buffers,
+                           mode=self.mode, threads=self.threads, interop_threads=self.interop_threads)
+        p.warm_up(self.warmup_batch)
+        return p, p.memory_bytes()
+
+    async def _load(self, e: ModelEntry):
+        e.state = "loading"
+        t = time.perf_counter()
+        try:
+            predictor, size = await self._run_load(self._build, e)
+        except Exception as ex:
+            e.state, e.error = "failed", f"{type(ex).__name__}: {ex}"
+            raise ModelUnavailable(f"Model '{e.key}' gagal dimuat: {e.error}") from ex
+        finally:
+            e._loading = None
+        e.predictor, e.bytes, e.version = predictor, size, predictor.version
+        e.load_ms = round((time.perf_counter() - t) * 1000.0, 1)
+        e.state, e.error = "ready", None
+        e.loads += 1
+        e.last_used = time.monotonic()
+        self._evict(keep=e)
+        return predictor
+
+    def _evict(self, keep: ModelEntry):
+        # model yang baru dimuat tidak pernah dievict, walau sendirian melebihi budget
+        resident = [x for x in self.entries.values() if x.path and x.state == "ready" and x is not keep]
+        resident.sort(key=lambda x: x.last_used)
+        while resident and self.used_bytes() > self.budget:
+            x = resident.pop(0)
+            # batch yang sedang jalan masih memegang referensinya; memori lepas setelah selesai
+            x.predictor, x.bytes, x.state = None, 0, "unloaded"
+            x.evictions += 1
+            self.evictions += 1
+
+    def used_bytes(self) -> int:
+        return sum(e.bytes for e in self.entries.values() if e.state == "ready")
+
+    async def preload(self, keys):
+        # warm-up saat start; gagal satu model tidak menghentikan yang lain (terlihat di /ready)
+        await asyncio.gather(*(self.get(k) for k in keys), return_exceptions=True)
+
+    def resident(self):
+        return [k for k, e in self.entries.items() if e.state == "ready"]
+
+    def describe(self):
+        return {k: e.describe() for k, e in self.entries.items()}
+
+    def stats(self):
+        return {
+            "resident": self.resident(),
+            "loading": [k for k, e in self.entries.items() if e.state == "loading"],
+            "failed": [k for k, e in self.entries.items() if e.state == "failed"],
+            "used_mb": round(self.used_bytes() / (1024 * 1024), 1),
+            "budget_mb": round(self.budget / (1024 * 1024), 1),
+            "evictions": self.evictions,
+            "mode": self.mode,
+        }
@@ -0,0 +1,286 @@
+import asyncio
+import hashlib
+import random
+import time
+from typing import NamedTuple, Optional
+
+from preprocess import TensorBufferPool, preprocess_config
+
+# ----------------------------- PREDICTOR BACKENDS -----------------------------
+# Satu interface untuk semua backend: "stable-demo" (hash-seeded, tanpa model)
+# dan "torch" (TorchScript / eager di CPU). Backend dipilih per species.
+
+class PredictInput(NamedTuple):
+    digest: str                 # sha256(gambar + species)
+    image: Optional[object]     # PIL.Image RGB, hanya diisi kalau backend butuh piksel
+
+def stable_scores(h: str, classes):
+    seed = int(h[:8], 16)
+    rng = random.Random(seed)
+
+    pred = rng.choice(classes)
+    conf = round(rng.uniform(0.70, 0.98), 3)
+
+    probs = {}
+    rest = round((1 - conf) / (len(classes) - 1), 3)
+    for c in classes:
+        probs[c] = conf if c == pred else rest
+
+    return pred, conf, probs
+
+def stable_scores_batch(digests, classes):
+    # level modul supaya bisa dikirim ke process pool
+    return [stable_scores(h, classes) for h in digests]
+
+class Predictor:
+    name = "base"
+    needs_pixels = False
+    input_size = None  # (w, h) kalau needs_pixels
+    pool = "cpu"  # nama pool di executor.Executors tempat batch dijalankan
+
+    def __init__(self, species: str, classes):
+        self.species = species
+        self.classes = list(classes)
+
+    @property
+    def version(self) -> str:
+        raise NotImplementedError
+
+    def batch_call(self, inputs):
+        """(fn, args) yang dijalankan di pool; hasil: list (pred, conf, probs) sesuai urutan inputs."""
+        raise NotImplementedError
+
+    def describe(self):
+        return {"backend": self.name, "version": self.version, "classes": self.classes}
+
+class StableDemoPredictor(Predictor):
+    name = "stable-demo"
+
+    def __init__(self, species: str, classes, version: str):
+        super().__init__(species, classes)
+        self._version = version
+
+    @property
+    def version(self):
+        return self._version
+
+    def batch_call(self, inputs):
+        return stable_scores_batch, ([i.digest for i in inputs], self.classes)
+
+# Mode inferensi CPU per deployment (SMARTFISH_MODEL_MODE):
+#   eager  : model apa adanya, fp32
+#   frozen : TorchScript (trace kalau model eager) + freeze + optimize_for_inference
+#   int8   : dynamic quantization nn.Linear ke int8 (butuh model eager, bukan TorchScript)
+MODEL_MODES = ("eager", "frozen", "int8")
+
+_torch_threads = None
+
+def configure_torch_threads(torch, threads: int = 0, interop_threads: int = 0):
+    """Jumlah intra-op / inter-op thread torch, sekali per proses (0 = default torch).
+
+    set_num_interop_threads hanya boleh dipanggil sebelum ada kerja paralel, jadi
+    model berikutnya di proses yang sama memakai setelan pertama.
+    """
+    global _torch_threads
+    if _torch_threads is None:
+        if threads > 0:
+            torch.set_num_threads(threads)
+        if interop_threads > 0:
+            try:
+                torch.set_num_interop_threads(interop_threads)
+            except RuntimeError:
+                pass
+        _torch_threads = (torch.get_num_threads(), torch.get_num_interop_threads())
+    return _torch_threads
+
+def tensor_bytes(obj) -> int:
+    # state_dict model int8 berisi tuple (weight, bias) packed, bukan hanya tensor
+    if isinstance(obj, (tuple, list)):
+        return sum(tensor_bytes(o) for o in obj)
+    if hasattr(obj, "element_size"):
+        return obj.numel() * obj.element_size()
+    return 0
+
+class TorchPredictor(Predictor):
+    name = "torch"
+    needs_pixels = True
+    pool = "model"  # model tidak bisa dikirim ke process pool, jalan di thread (torch melepas GIL)
+
+    def __init__(self, species: str, classes, path: str, preprocess: dict = None,
+                 max_batch: int = 16, buffers: int = 1, mode: str = "eager",
+                 threads: int = 0, interop_threads: int = 0):
+        super().__init__(species, classes)
+        if mode not in MODEL_MODES:
+            raise ValueError(f"Mode model tidak dikenal: {mode} (pilihan: {', '.join(MODEL_MODES)})")
+        import torch  # opsional: hanya dibutuhkan kalau ada model yang dikonfigurasi
+
+        self.torch = torch
+        self.path = path
+        self.mode = mode
+        self.threads = configure_torch_threads(torch, threads, interop_threads)
+        cfg = preprocess_config(preprocess)
+        self.input_size = tuple(cfg["size"])
+        self.buffers = TensorBufferPool(cfg["size"], cfg["mean"], cfg["std"], max_batch, buffers)
+
+        self._version = model_version(path, mode)
+        try:
+            self.model = torch.jit.load(path, map_location="cpu")
+            self.format = "torchscript"
+        except RuntimeError:
+            self.model = torch.load(path, map_location="cpu", weights_only=False)
+            self.format = "eager"
+        self.model.eval()
+        self.model = self._optimize(self.model)
+
+    def _optimize(self, model):
+        torch = self.torch
+        if self.mode == "int8":
+            if self.format == "torchscript":
+                raise ValueError("Mode int8 butuh model eager (torch.save), bukan TorchScript.")
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        # dihitung sebelum freeze: setelah freeze bobot jadi konstanta graph, tidak lagi terlihat di state_dict
+        self.weight_bytes = sum(tensor_bytes(v) for v in model.state_dict().values())
+        if self.mode == "frozen":
+            if self.format == "eager":
+                w, h = self.input_size
+                with torch.no_grad():
+                    model = torch.jit.trace(model, torch.zeros(1, 3, h, w))
+            model = torch.jit.optimize_for_inference(torch.jit.freeze(model.eval()))
+        return model
+
+    @property
+    def version(self):
+        return self._version
+
+    def predict_batch(self, inputs):
+        buf = self.buffers.acquire(len(inputs))
+        try:
+            x = self.torch.from_numpy(buf.fill_batch([i.image for i in inputs]))  # berbagi memori, tanpa salinan
+            with self.torch.inference_mode():
+                probs = self.torch.softmax(self.model(x), dim=1).tolist()
+        finally:
+            self.buffers.release(buf)
+        out = []
+        for row in probs:
+            p = {c: round(float(v), 3) for c, v in zip(self.classes, row)}
+            pred = max(p, key=p.get)
+            out.append((pred, p[pred], p))
+        return out
+
+    def batch_call(self, inputs):
+        return self.predict_batch, (inputs,)
+
+    def warm_up(self, batch: int = 1):
+        """Forward pass dummy: alokasi & inisialisasi lazy torch terjadi di sini, bukan di request pertama."""
+        from PIL import Image
+
+        img = Image.new("RGB", self.input_size, (128, 128, 128))
+        self.predict_batch([PredictInput("0" * 64, img)] * max(1, batch))
+
+    def memory_bytes(self) -> int:
+        # bobot model + buffer tensor input; perkiraan RSS yang dilepas saat model dievict
+        return self.weight_bytes + self.buffers.stats()["bytes"]
+
+    def describe(self):
+        d = super().describe()
+        d.update({"path": self.path, "format": self.format, "mode": self.mode, "threads": list(self.threads),
+                  "input_size": list(self.input_size), "buffers": self.buffers.stats()})
+        return d
+
+def model_version(path: str, mode: str = "eager") -> str:
+    # sha256 file streaming: versi (key cache) tersedia tanpa memuat model.
+    # Mode selain eager bisa menggeser probabilitas, jadi ikut masuk key cache.
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    version = f"torch:{h.hexdigest()[:12]}"
+    return version if mode == "eager" else f"{version}:{mode}"
+
+# ----------------------------- DYNAMIC MICRO-BATCHING -----------------------------
+# Request yang datang bersamaan dikumpulkan sampai max_batch atau max_wait,
+# lalu dijalankan sebagai satu forward pass.
+
+class MicroBatcher:
+    # predictor: Predictor, atau async callable () -> Predictor yang dipanggil per batch
+    # (registry model: dimuat saat dibutuhkan, batcher tidak menahan model yang sudah dievict)
+    def __init__(self, predictor, run, max_batch: int, max_wait_ms: float, concurrency: int = 1):
+        self.predictor = predictor
+        self._run = run  # async run(fn, *args) -> hasil, biasanya Pool.run
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.concurrency = max(1, concurrency)
+        self._queue = None
+        self._tasks = []
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_started(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def submit(self, item: PredictInput):
+        self._ensure_started()
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, fut))
+        return await fut
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _worker(self):
+        while True:
+            batch = await self._collect()
+            # request yang sudah dibatalkan (client putus) tidak ikut dihitung
+            batch = [(item, fut) for item, fut in batch if not fut.done()]
+            if not batch:
+                continue
+            try:
+                predictor = self.predictor
+                if not isinstance(predictor, Predictor):
+                    predictor = await predictor()
+                fn, args = predictor.batch_call([item for item, _ in batch])
+                results = await self._run(fn, *args)
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for (_, fut), res in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(res)
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+    async def close(self):
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
@@ -0,0 +1,78 @@
+import queue
+
+import numpy as np
+
+# ----------------------------- PREPROCESSING (NUMPY) -----------------------------
+# resize -> normalisasi -> HWC ke CHW, ditulis langsung ke buffer float32 batch
+# yang sudah dialokasikan di awal. Setelah warm-up, alokasi per gambar hanya
+# array uint8 sementara dari PIL.
+
+DEFAULT_PREPROCESS = {
+    "size": [224, 224],                  # (w, h) input model
+    "mean": [0.485, 0.456, 0.406],       # ImageNet
+    "std": [0.229, 0.224, 0.225],
+}
+
+def preprocess_config(overrides: dict = None):
+    cfg = dict(DEFAULT_PREPROCESS)
+    cfg.update(overrides or {})
+    return cfg
+
+class TensorBuffer:
+    def __init__(self, max_batch: int, size, scale, shift):
+        w, h = size
+        self.size = (w, h)
+        self.array = np.empty((max_batch, 3, h, w), dtype=np.float32)
+        self._scale = scale
+        self._shift = shift
+
+    def fill(self, i: int, img):
+        """Tulis satu gambar PIL RGB (sudah seukuran input) ke slot i."""
+        if img.size != self.size:
+            img = img.resize(self.size)
+        hwc = np.asarray(img, dtype=np.uint8)
+        out = self.array[i]
+        # (x/255 - mean)/std == x*scale - shift, dua operasi in-place tanpa array baru
+        np.multiply(hwc.transpose(2, 0, 1), self._scale, out=out)
+        np.subtract(out, self._shift, out=out)
+
+    def fill_batch(self, images):
+        for i, img in enumerate(images):
+            self.fill(i, img)
+        return self.array[:len(images)]  # view, bukan salinan
+
+class TensorBufferPool:
+    """Pool kecil buffer batch; jumlah buffer = jumlah batch yang boleh jalan bersamaan."""
+
+    def __init__(self, size, mean, std, max_batch: int, count: int = 1):
+        self.size = tuple(size)
+        self.max_batch = max(1, max_batch)
+        std = np.asarray(std, dtype=np.float32).reshape(3, 1, 1)
+        mean = np.asarray(mean, dtype=np.float32).reshape(3, 1, 1)
+        self._scale = (1.0 / (255.0 * std)).astype(np.float32)
+        self._shift = (mean / std).astype(np.float32)
+        self._free = queue.Queue()
+        self.count = max(1, count)
+        for _ in range(self.count):
+            self._free.put(TensorBuffer(self.max_batch, self.size, self._scale, self._shift))
+        self.oversize = 0  # batch > max_batch, terpaksa alokasi buffer baru
+
+    def acquire(self, n: int = None):
+        if n is not None and n > self.max_batch:
+            self.oversize += 1
+            return TensorBuffer(n, self.size, self._scale, self._shift)
+        return self._free.get()
+
+    def release(self, buf: TensorBuffer):
+        if buf.array.shape[0] == self.max_batch:
+            self._free.put(buf)
+
+    def stats(self):
+        return {
+            "size": list(self.size),
+            "max_batch": self.max_batch,
+            "buffers": self.count,
+            "free": self._free.qsize(),
+            "bytes": self.count * self.max_batch * 3 * self.size[0] * self.size[1] * 4,
+            "oversize": self.oversize,
+        }
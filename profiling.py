@@ -0,0 +1,223 @@
+import contextvars
+import cProfile
+import itertools
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+
+# ----------------------------- PROFILING -----------------------------
+# Opt-in, per request: header X-SmartFish-Profile atau sampling 1 dari N request.
+#   cprofile: cProfile di thread event loop + tiap task pool yang disubmit request tsb.
+#             (termasuk worker process pool; stats dikirim balik & digabung) -> .prof (pstats)
+#   sample:   thread sampler membaca stack semua thread tiap interval -> .collapsed
+#             (format flamegraph); worker process pool tidak ikut tersampel.
+# Hanya satu request diprofil pada satu waktu; request lain tetap jalan normal.
+
+PROFILE_HEADER = "x-smartfish-profile"
+NAME_RE = re.compile(r"^[0-9]{8}T[0-9]{6}_[0-9a-f]{8}\.(prof|collapsed)$")
+
+# frame daun thread yang sedang menganggur (tidak menarik di flamegraph)
+IDLE_LEAVES = {("thread.py", "_worker"), ("selectors.py", "select"), ("threading.py", "wait"),
+               ("threading.py", "_wait_for_tstate_lock")}
+
+current = contextvars.ContextVar("smartfish_profile", default=None)
+
+def active():
+    """Session cprofile milik request saat ini (None kalau request tidak diprofil)."""
+    s = current.get()
+    return s if s is not None and s.mode == "cprofile" else None
+
+def run_profiled(fn, *args):
+    """Dijalankan di worker (thread/process): hasil + stats cProfile (dict, picklable)."""
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        res = fn(*args)
+    finally:
+        prof.disable()
+    prof.create_stats()
+    return res, prof.stats
+
+class _StatsHolder:
+    # pstats.Stats menerima objek dengan create_stats() + .stats
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+class ProfileSession:
+    def __init__(self, mode: str, trigger: str, interval: float):
+        self.id = uuid.uuid4().hex[:8]
+        self.mode = mode
+        self.trigger = trigger
+        self.started = time.time()
+        self.t0 = time.perf_counter()
+        self.duration = 0.0
+        self.interval = interval
+        self.worker_stats = []  # dict stats dari run_profiled
+        self.samples = {}       # stack collapsed -> count
+        self._prof = None
+        self._stop = None
+        self._thread = None
+        self._token = None
+
+    def add_stats(self, stats):
+        self.worker_stats.append(stats)
+
+    def _sample_loop(self):
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                leaf = (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name)
+                if leaf in IDLE_LEAVES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack.append(names.get(ident, str(ident)))
+                key = ";".join(reversed(stack))
+                self.samples[key] = self.samples.get(key, 0) + 1
+
+    def start(self):
+        self._token = current.set(self)
+        if self.mode == "cprofile":
+            self._prof = cProfile.Profile()
+            self._prof.enable()
+        else:
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._sample_loop, name="smartfish-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self.duration = time.perf_counter() - self.t0
+        if self._prof is not None:
+            self._prof.disable()
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+        current.reset(self._token)
+
+class Profiler:
+    def __init__(self, root: str, mode: str = "off", sample_every: int = 0, keep: int = 50,
+                 token: str = "", interval_ms: float = 2.0):
+        self.root = root
+        self.mode = mode if mode in ("cprofile", "sample") else "off"
+        self.sample_every = max(0, sample_every)
+        self.keep = max(1, keep)
+        self.token = token
+        self.interval = max(0.0005, interval_ms / 1000.0)
+        self._counter = itertools.count(1)
+        self._busy = False  # hanya diubah dari thread event loop
+        self.skipped = 0
+
+    @property
+    def enabled(self):
+        return self.mode != "off"
+
+    def authorized(self, headers):
+        return not self.token or headers.get(PROFILE_HEADER) == self.token
+
+    def start(self, headers):
+        """Mulai session kalau request ini dipilih (header / sampling); None kalau tidak."""
+        if not self.enabled:
+            return None
+        if headers.get(PROFILE_HEADER) and self.authorized(headers):
+            trigger = "header"
+        elif self.sample_every and next(self._counter) % self.sample_every == 0:
+            trigger = "sample"
+        else:
+            return None
+        if self._busy:
+            self.skipped += 1
+            return None
+        self._busy = True
+        session = ProfileSession(self.mode, trigger, self.interval)
+        session.start()
+        return session
+
+    def stop(self, session: ProfileSession):
+        try:
+            session.stop()
+        finally:
+            self._busy = False
+
+    def save(self, session: ProfileSession, meta: dict = None):
+        """Tulis hasil ke disk + hapus profil lama di luar retensi; nama file hasil."""
+        os.makedirs(self.root, exist_ok=True)
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.localtime(session.started))
+        ext = "prof" if session.mode == "cprofile" else "collapsed"
+        name = f"{stamp}_{session.id}.{ext}"
+        path = os.path.join(self.root, name)
+        if session.mode == "cprofile":
+            stats = pstats.Stats(session._prof)
+            for s in session.worker_stats:
+                stats.add(_StatsHolder(s))
+            stats.dump_stats(path)
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, n in sorted(session.samples.items()):
+                    f.write(f"{stack} {n}\n")
+        info = {
+            "name": name,
+            "mode": session.mode,
+            "trigger": session.trigger,
+            "started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(session.started)),
+            "duration_ms": round(session.duration * 1000, 3),
+            "samples": sum(session.samples.values()) if session.mode == "sample" else None,
+            **(meta or {}),
+        }
+        with open(path + ".json", "w", encoding="utf-8") as f:
+            json.dump(info, f, ensure_ascii=False)
+        self.prune()
+        return name
+
+    def _names(self):
+        try:
+            return sorted((n for n in os.listdir(self.root) if NAME_RE.match(n)), reverse=True)
+        except FileNotFoundError:
+            return []
+
+    def prune(self):
+        for name in self._names()[self.keep:]:
+            for p in (name, name + ".json"):
+                try:
+                    os.remove(os.path.join(self.root, p))
+                except FileNotFoundError:
+                    pass
+
+    def list(self):
+        out = []
+        for name in self._names():
+            path = os.path.join(self.root, name)
+            try:
+                with open(path + ".json", encoding="utf-8") as f:
+                    info = json.load(f)
+            except (OSError, ValueError):
+                info = {"name": name}
+            info["bytes"] = os.path.getsize(path) if os.path.exists(path) else 0
+            out.append(info)
+        return out
+
+    def path(self, name: str):
+        """Path file profil; None kalau nama tidak valid / tidak ada (tanpa path traversal)."""
+        if not NAME_RE.match(name):
+            return None
+        path = os.path.join(self.root, name)
+        return path if os.path.exists(path) else None
+
+    def stats(self):
+        return {"mode": self.mode, "sample_every": self.sample_every, "keep": self.keep,
+                "busy": self._busy, "skipped": self.skipped}
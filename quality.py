@@ -0,0 +1,95 @@
+import numpy as np
+from PIL import Image
+
+# ----------------------------- QUALITY GATE -----------------------------
+# Semua metrik dihitung dari proxy grayscale kecil (sisi terpanjang PROXY_SIZE px),
+# jadi biayanya tetap beberapa ms berapa pun resolusi foto. Gambar JPEG yang belum
+# di-decode (lazy, dari probe_image) memakai draft() -> decode langsung di skala 1/2..1/8.
+# Dipakai aplikasi Streamlit (sebelum upload) dan API (sebelum inferensi).
+
+PROXY_SIZE = 512
+
+DEFAULT_QUALITY = {
+    "min_side": 200,       # px, gambar asli
+    "blur_min": 40.0,      # varians Laplacian di proxy; di bawah ini = blur -> ditolak
+    "dark_mean": 40.0,     # rata-rata brightness (0-255) di bawah ini = gelap (peringatan)
+    "bright_mean": 225.0,  # di atas ini = terlalu terang (peringatan)
+    "min_contrast": 12.0,  # std brightness; di bawah ini = datar/berkabut (peringatan)
+    "clip_low": 16,        # piksel <= nilai ini dihitung underexposed
+    "clip_high": 245,      # piksel >= nilai ini dihitung overexposed
+    "clip_max": 0.5,       # fraksi piksel under/over di atas ini -> ditolak
+}
+
+def quality_config(overrides: dict = None):
+    cfg = dict(DEFAULT_QUALITY)
+    cfg.update(overrides or {})
+    return cfg
+
+def proxy_gray(img: Image.Image, max_side: int = PROXY_SIZE):
+    """Array float32 grayscale dengan sisi terpanjang <= max_side (tidak pernah diperbesar).
+
+    JPEG yang belum di-decode ikut di-draft (mode/ukuran berubah), jadi berikan objek
+    Image.open tersendiri kalau piksel resolusi penuh masih dibutuhkan setelahnya.
+    """
+    if img.format == "JPEG":
+        # no-op kalau sudah di-decode; kalau masih lazy: decode DCT langsung di skala kecil + grayscale
+        img.draft("L", (max_side, max_side))
+    small = img
+    if max(small.size) >= 4 * max_side:
+        # sudah di-decode penuh: ambil sampel nearest ke 2x proxy lalu box-reduce 2x,
+        # hanya ~4x piksel proxy yang disentuh (reduce() langsung tetap membaca seluruh 12 MP)
+        small = small.resize(_fit(small.size, 2 * max_side), Image.NEAREST).reduce(2)
+    if small.mode != "L":
+        small = small.convert("L")
+    if max(small.size) > max_side:
+        small = small.resize(_fit(small.size, max_side), Image.BILINEAR)
+    return np.asarray(small, dtype=np.float32)
+
+def _fit(size, max_side):
+    w, h = size
+    s = max_side / max(w, h)
+    return max(1, round(w * s)), max(1, round(h * s))
+
+def quality_metrics(img: Image.Image, max_side: int = PROXY_SIZE, clip_low: int = 16, clip_high: int = 245):
+    g = proxy_gray(img, max_side)
+    n = g.size
+    # Laplacian 4-tetangga lewat slicing (tanpa konvolusi/scipy)
+    lap = g[1:-1, :-2] + g[1:-1, 2:] + g[:-2, 1:-1] + g[2:, 1:-1] - 4.0 * g[1:-1, 1:-1]
+    return {
+        "brightness": float(g.mean()),
+        "contrast": float(g.std()),
+        "underexposed": float(np.count_nonzero(g <= clip_low)) / n,
+        "overexposed": float(np.count_nonzero(g >= clip_high)) / n,
+        "blur": float(lap.var()) if lap.size else 0.0,
+        "proxy_size": [int(g.shape[1]), int(g.shape[0])],
+    }
+
+def assess_quality(img: Image.Image, cfg: dict = None, size=None):
+    """(ok, errors, warnings, metrics). size = ukuran asli kalau img adalah preview/proxy."""
+    cfg = quality_config(cfg)
+    w, h = size or img.size
+    if min(w, h) < cfg["min_side"]:
+        msg = f"Resolusi terlalu kecil. Gunakan foto lebih jelas (min {cfg['min_side']}x{cfg['min_side']})."
+        return False, [msg], [], {"width": w, "height": h}
+
+    m = quality_metrics(img, clip_low=cfg["clip_low"], clip_high=cfg["clip_high"])
+    errors, warnings = [], []
+    if m["blur"] < cfg["blur_min"]:
+        errors.append("Foto buram/tidak fokus. Tahan kamera lebih stabil dan fokuskan pada ikan.")
+    if m["underexposed"] > cfg["clip_max"]:
+        errors.append("Foto terlalu gelap (sebagian besar piksel hitam). Tambah cahaya.")
+    elif m["overexposed"] > cfg["clip_max"]:
+        errors.append("Foto terlalu terang (sebagian besar piksel putih). Hindari flash/pantulan langsung.")
+    if m["brightness"] < cfg["dark_mean"]:
+        warnings.append("⚠️ Foto terlihat gelap. Coba tambah cahaya agar hasil lebih akurat.")
+    elif m["brightness"] > cfg["bright_mean"]:
+        warnings.append("⚠️ Foto terlihat terlalu terang. Kurangi cahaya/pantulan.")
+    if m["contrast"] < cfg["min_contrast"]:
+        warnings.append("⚠️ Kontras rendah (foto berkabut/datar). Bersihkan lensa atau ubah sudut.")
+    m.update({"width": w, "height": h})
+    return not errors, errors, warnings, m
+
+def validate_image_quality(img: Image.Image, size=None, cfg: dict = None):
+    """(ok, pesan) untuk UI: ditolak kalau kecil/blur/exposure ekstrem, peringatan untuk gelap/kontras."""
+    ok, errors, warnings, _ = assess_quality(img, cfg, size)
+    return ok, " ".join(errors if not ok else warnings)
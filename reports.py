@@ -0,0 +1,166 @@
+from io import BytesIO
+
+from PIL import Image
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+# ----------------------------- PDF REPORT -----------------------------
+# Gambar di-thumbnail ke resolusi cetak sebelum di-embed (kotak gambar maks
+# 240x180 pt), jadi foto kamera 12 MP tidak ikut masuk PDF utuh.
+
+IMAGE_BOX = (240, 180)  # pt
+PRINT_DPI = 150
+THUMB_DPI = 96          # thumbnail ROI yang disimpan di history untuk laporan batch
+REPORT_MAX_SCANS = 500  # batas halaman laporan harian
+
+def badge_for(pred: str):
+    if pred == "segar":
+        return ("✅ SEGER", "ok", "Aman dikonsumsi. Simpan dingin dan olah segera untuk kualitas terbaik.")
+    if pred == "kurang_segar":
+        return ("⚠️ KURANG SEGAR", "warn", "Sebaiknya segera diolah. Hindari penyimpanan lama.")
+    return ("❌ TIDAK LAYAK", "bad", "Jangan dikonsumsi. Risiko keamanan pangan.")
+
+def split_text(text, max_len=78):
+    words = text.split()
+    lines, line = [], ""
+    for w in words:
+        if len(line) + len(w) + 1 <= max_len:
+            line = (line + " " + w).strip()
+        else:
+            lines.append(line)
+            line = w
+    if line:
+        lines.append(line)
+    return lines
+
+def print_jpeg(im: Image.Image, box=IMAGE_BOX, dpi: int = PRINT_DPI, quality: int = 85) -> bytes:
+    """JPEG seukuran kotak cetak (pt) pada dpi tertentu; tidak pernah memperbesar gambar."""
+    max_px = (int(box[0] / 72 * dpi), int(box[1] / 72 * dpi))
+    thumb = im.copy() if im.mode == "RGB" else im.convert("RGB")
+    thumb.thumbnail(max_px, Image.BILINEAR, reducing_gap=2.0)
+    b = BytesIO()
+    thumb.save(b, format="JPEG", quality=quality, optimize=True)
+    return b.getvalue()
+
+def fit(size, max_w, max_h):
+    iw, ih = size
+    s = min(max_w/iw, max_h/ih)
+    return int(iw*s), int(ih*s)
+
+def draw_scan_page(c: canvas.Canvas, result: dict, original_jpeg: bytes = None, crop_jpeg: bytes = None,
+                   title: str = "SmartFish-ID Report (PKM Demo)"):
+    W, H = A4
+
+    pred = result.get("prediction", "-")
+    conf = float(result.get("confidence", 0.0))
+    headline, _, advice = badge_for(pred)
+
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(40, H - 50, title)
+    c.setFont("Helvetica", 10)
+    c.drawString(40, H - 70, f"Timestamp: {result.get('time','-')}")
+    c.drawString(40, H - 84, f"Prediction: {pred} | Confidence: {conf:.3f}")
+    c.drawString(40, H - 98, f"Source: {result.get('source','-')} | Image: {result.get('image_name','-')}")
+    c.drawString(40, H - 112, f"ROI box: {result.get('roi_box','-')}")
+
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(40, H - 136, "Recommendation")
+    c.setFont("Helvetica", 10)
+    c.drawString(40, H - 152, headline)
+
+    y = H - 168
+    for line in split_text(advice):
+        c.drawString(40, y, line)
+        y -= 14
+
+    probs = result.get("probabilities", {}) or {}
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(40, y - 8, "Probabilities")
+    y2 = y - 24
+    c.setFont("Helvetica", 10)
+    for k, v in probs.items():
+        c.drawString(40, y2, f"- {k}: {float(v):.3f}")
+        y2 -= 14
+
+    oy = 110
+    if original_jpeg is not None or crop_jpeg is not None:
+        c.setFont("Helvetica-Bold", 11)
+        c.drawString(40, 320, "Images (Original vs ROI)" if original_jpeg is not None else "Image (ROI)")
+        c.setFont("Helvetica", 10)
+    if original_jpeg is not None:
+        reader = ImageReader(BytesIO(original_jpeg))
+        ow, oh = fit(reader.getSize(), *IMAGE_BOX)
+        c.drawString(40, 300, "Original")
+        c.drawImage(reader, 40, oy, width=ow, height=oh, mask='auto')
+    if crop_jpeg is not None:
+        reader = ImageReader(BytesIO(crop_jpeg))
+        cw, ch = fit(reader.getSize(), *IMAGE_BOX)
+        x = 320 if original_jpeg is not None else 40
+        c.drawString(x, 300, "ROI (Crop)")
+        c.drawImage(reader, x, oy, width=cw, height=ch, mask='auto')
+
+    c.setFont("Helvetica-Oblique", 8)
+    c.drawString(40, 30, "SmartFish-ID • Generated for PKM attachment • Proof of Concept")
+    c.showPage()
+
+def make_pdf(original_img: Image.Image, cropped_img: Image.Image, result: dict):
+    buf = BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    draw_scan_page(c, result, print_jpeg(original_img), print_jpeg(cropped_img))
+    c.save()
+
+    buf.seek(0)
+    return buf
+
+def make_batch_pdf(scans, out, title: str = "SmartFish-ID Laporan Harian", max_scans: int = None):
+    """Satu halaman per scan + halaman ringkasan di akhir; ditulis halaman demi halaman ke `out`.
+
+    scans: iterable dict history (boleh generator); key "thumb" berisi JPEG ROI kalau ada.
+    Ringkasan dihitung sambil jalan, jadi scans tidak perlu dimuat sekaligus.
+    """
+    c = canvas.Canvas(out, pagesize=A4)
+    c.setTitle(title)
+    total, sum_conf, counts, species = 0, 0.0, {}, {}
+    first_time, last_time = None, None
+    for scan in scans:
+        if max_scans is not None and total >= max_scans:
+            break
+        total += 1
+        sum_conf += float(scan.get("confidence", 0.0) or 0.0)
+        pred = scan.get("prediction") or "-"
+        counts[pred] = counts.get(pred, 0) + 1
+        sp = scan.get("species") or "ikan"
+        species[sp] = species.get(sp, 0) + 1
+        t = str(scan.get("time", ""))
+        first_time = t if first_time is None or t < first_time else first_time
+        last_time = t if last_time is None or t > last_time else last_time
+        draw_scan_page(c, scan, crop_jpeg=scan.get("thumb"), title=f"{title} — Scan #{total}")
+
+    W, H = A4
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(40, H - 50, f"{title} — Ringkasan")
+    c.setFont("Helvetica", 10)
+    c.drawString(40, H - 70, f"Periode: {first_time or '-'} s/d {last_time or '-'}")
+    c.drawString(40, H - 84, f"Total scan: {total}")
+    c.drawString(40, H - 98, f"Rata-rata confidence: {(sum_conf / total if total else 0.0):.3f}")
+    y = H - 122
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(40, y, "Distribusi prediksi")
+    c.setFont("Helvetica", 10)
+    for pred in sorted(counts):
+        y -= 14
+        n = counts[pred]
+        c.drawString(40, y, f"- {pred}: {n} ({n / total * 100:.1f}%)")
+    y -= 24
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(40, y, "Per komoditas")
+    c.setFont("Helvetica", 10)
+    for sp in sorted(species):
+        y -= 14
+        c.drawString(40, y, f"- {sp}: {species[sp]}")
+    c.setFont("Helvetica-Oblique", 8)
+    c.drawString(40, 30, "SmartFish-ID • Generated for PKM attachment • Proof of Concept")
+    c.showPage()
+    c.save()
+    return total
@@ -0,0 +1,302 @@
+import json
+import os
+import sqlite3
+import threading
+
+# ----------------------------- PENYIMPANAN PERMANEN (SQLITE) -----------------------------
+# Satu file SQLite mode WAL dipakai bersama oleh semua sesi Streamlit (dan API):
+# append O(1), baca per halaman, aman untuk penulisan bersamaan.
+
+DB_FILE = "data/smartfishid.db"
+
+FEEDBACK_FIELDS = ["time", "nama", "peran", "rating", "komentar", "last_prediction", "last_confidence"]
+
+def connect(path: str):
+    d = os.path.dirname(path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10.0, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    return conn
+
+class FeedbackStore:
+    def __init__(self, path: str = DB_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS feedback ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, time TEXT, nama TEXT, peran TEXT, rating INTEGER, "
+                "komentar TEXT, last_prediction TEXT, last_confidence REAL)"
+            )
+
+    def append(self, fb: dict):
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT INTO feedback ({', '.join(FEEDBACK_FIELDS)}) VALUES ({', '.join('?' * len(FEEDBACK_FIELDS))})",
+                [fb.get(k) for k in FEEDBACK_FIELDS],
+            )
+
+    def latest(self, limit: int = 10, offset: int = 0):
+        """Feedback terbaru dulu, per halaman."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(FEEDBACK_FIELDS)} FROM feedback ORDER BY id DESC LIMIT ? OFFSET ?",
+                (limit, offset),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM feedback").fetchone()[0]
+
+    def iter_all(self, chunk: int = 500):
+        """Semua feedback (terbaru dulu) dibaca per chunk, tanpa memuat seluruh tabel."""
+        last_id = None
+        while True:
+            with self._lock:
+                if last_id is None:
+                    rows = self._conn.execute(
+                        f"SELECT id, {', '.join(FEEDBACK_FIELDS)} FROM feedback ORDER BY id DESC LIMIT ?", (chunk,)
+                    ).fetchall()
+                else:
+                    rows = self._conn.execute(
+                        f"SELECT id, {', '.join(FEEDBACK_FIELDS)} FROM feedback WHERE id < ? ORDER BY id DESC LIMIT ?",
+                        (last_id, chunk),
+                    ).fetchall()
+            if not rows:
+                return
+            for r in rows:
+                yield {k: r[k] for k in FEEDBACK_FIELDS}
+            last_id = rows[-1]["id"]
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM feedback")
+
+    def migrate_json(self, paths):
+        """Impor sekali dari file JSON lama; file sumber tidak diubah."""
+        with self._lock:
+            done = self._conn.execute("SELECT value FROM meta WHERE key = 'feedback_json_migrated'").fetchone()
+        if done:
+            return 0
+
+        items = []
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except Exception:
+                continue
+            if isinstance(data, list):
+                items.extend(x for x in data if isinstance(x, dict))
+
+        # urut kronologis supaya id (urutan insert) = urutan waktu
+        seen, rows = set(), []
+        for fb in sorted(items, key=lambda x: str(x.get("time", ""))):
+            row = tuple(fb.get(k) for k in FEEDBACK_FIELDS)
+            if row not in seen:
+                seen.add(row)
+                rows.append(row)
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO feedback ({', '.join(FEEDBACK_FIELDS)}) VALUES ({', '.join('?' * len(FEEDBACK_FIELDS))})",
+                rows,
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('feedback_json_migrated', ?)",
+                (json.dumps(list(paths)),),
+            )
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+HISTORY_FIELDS = ["time", "species", "prediction", "confidence", "source", "image_name", "roi_box", "mode"]
+# kolom yang dibaca untuk listing/ekspor; thumb (BLOB) sengaja tidak ikut
+SCAN_COLUMNS = "id, " + ", ".join(HISTORY_FIELDS) + ", extra"
+
+class HistoryStore:
+    """Riwayat scan permanen + agregat yang di-update saat insert (dashboard tidak perlu scan ulang tabel)."""
+
+    def __init__(self, path: str = DB_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        with self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS scans (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    time TEXT NOT NULL,
+                    species TEXT NOT NULL,
+                    prediction TEXT,
+                    confidence REAL,
+                    source TEXT,
+                    image_name TEXT,
+                    roi_box TEXT,
+                    mode TEXT,
+                    extra TEXT,
+                    thumb BLOB
+                );
+                CREATE INDEX IF NOT EXISTS idx_scans_time ON scans(time);
+                CREATE INDEX IF NOT EXISTS idx_scans_prediction ON scans(prediction);
+                CREATE INDEX IF NOT EXISTS idx_scans_species ON scans(species);
+
+                CREATE TABLE IF NOT EXISTS scan_agg (
+                    species TEXT NOT NULL,
+                    prediction TEXT NOT NULL,
+                    n INTEGER NOT NULL DEFAULT 0,
+                    sum_conf REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (species, prediction)
+                );
+                CREATE TABLE IF NOT EXISTS scan_hourly (
+                    hour TEXT NOT NULL,           -- 'YYYY-MM-DD HH'
+                    species TEXT NOT NULL,
+                    prediction TEXT NOT NULL,
+                    n INTEGER NOT NULL DEFAULT 0,
+                    sum_conf REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (hour, species, prediction)
+                );
+                """
+            )
+            # DB lama (sebelum ada thumbnail laporan) -> tambah kolom, baris lama tetap NULL
+            cols = {r["name"] for r in self._conn.execute("PRAGMA table_info(scans)")}
+            if "thumb" not in cols:
+                self._conn.execute("ALTER TABLE scans ADD COLUMN thumb BLOB")
+
+    @staticmethod
+    def _row(item: dict):
+        roi = item.get("roi_box")
+        # field lain (probabilities, recommendation, dll.) disimpan utuh sebagai JSON
+        extra = {k: v for k, v in item.items() if k not in HISTORY_FIELDS and k != "thumb"}
+        return (
+            str(item.get("time", "")),
+            str(item.get("species") or "ikan"),
+            item.get("prediction"),
+            float(item.get("confidence", 0.0) or 0.0),
+            item.get("source"),
+            item.get("image_name"),
+            json.dumps(list(roi)) if isinstance(roi, (list, tuple)) else roi,
+            item.get("mode"),
+            json.dumps(extra, ensure_ascii=False) if extra else None,
+            item.get("thumb"),
+        )
+
+    def _insert_locked(self, rows):
+        self._conn.executemany(
+            "INSERT INTO scans (time, species, prediction, confidence, source, image_name, roi_box, mode, extra, thumb) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        self._conn.executemany(
+            "INSERT INTO scan_agg (species, prediction, n, sum_conf) VALUES (?, ?, 1, ?) "
+            "ON CONFLICT(species, prediction) DO UPDATE SET n = n + 1, sum_conf = sum_conf + excluded.sum_conf",
+            [(r[1], r[2] or "-", r[3]) for r in rows],
+        )
+        self._conn.executemany(
+            "INSERT INTO scan_hourly (hour, species, prediction, n, sum_conf) VALUES (?, ?, ?, 1, ?) "
+            "ON CONFLICT(hour, species, prediction) DO UPDATE SET n = n + 1, sum_conf = sum_conf + excluded.sum_conf",
+            [(r[0][:13], r[1], r[2] or "-", r[3]) for r in rows],
+        )
+
+    def add(self, item: dict):
+        self.add_many([item])
+
+    def add_many(self, items):
+        rows = [self._row(x) for x in items]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._insert_locked(rows)
+
+    def _to_dict(self, r):
+        d = {k: r[k] for k in HISTORY_FIELDS}
+        if d["roi_box"] and d["roi_box"].startswith("["):
+            d["roi_box"] = tuple(json.loads(d["roi_box"]))
+        if r["extra"]:
+            d.update(json.loads(r["extra"]))
+        if "thumb" in r.keys():
+            d["thumb"] = r["thumb"]
+        return d
+
+    def iter_all(self, chunk: int = 1000, since: str = None, until: str = None,
+                 with_thumb: bool = False, oldest_first: bool = False):
+        """Semua scan (default terbaru dulu) per chunk; since/until membandingkan kolom time (string 'YYYY-MM-DD ...').
+
+        Thumbnail (BLOB) hanya ikut dibaca kalau with_thumb=True (laporan PDF), bukan untuk ekspor CSV.
+        """
+        cols = SCAN_COLUMNS + (", thumb" if with_thumb else "")
+        cmp, order = (">", "ASC") if oldest_first else ("<", "DESC")
+        last_id = None
+        while True:
+            where, args = [], []
+            if last_id is not None:
+                where.append(f"id {cmp} ?")
+                args.append(last_id)
+            if since:
+                where.append("time >= ?")
+                args.append(since)
+            if until:
+                where.append("time < ?")
+                args.append(until)
+            sql = f"SELECT {cols} FROM scans" + (" WHERE " + " AND ".join(where) if where else "")
+            with self._lock:
+                rows = self._conn.execute(sql + f" ORDER BY id {order} LIMIT ?", args + [chunk]).fetchall()
+            if not rows:
+                return
+            for r in rows:
+                yield self._to_dict(r)
+            last_id = rows[-1]["id"]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(n), 0) FROM scan_agg").fetchone()[0]
+
+    def summary(self, species: str = None):
+        """Total, rata-rata confidence & jumlah per kelas, dibaca dari tabel agregat (bukan dari scans)."""
+        sql = "SELECT prediction, SUM(n) AS n, SUM(sum_conf) AS s FROM scan_agg"
+        args = []
+        if species:
+            sql += " WHERE species = ?"
+            args.append(species)
+        with self._lock:
+            rows = self._conn.execute(sql + " GROUP BY prediction", args).fetchall()
+        counts = {r["prediction"]: r["n"] for r in rows}
+        total = sum(counts.values())
+        sum_conf = sum(r["s"] for r in rows)
+        return {
+            "total": total,
+            "avg_conf": sum_conf / total if total else 0.0,
+            "counts": counts,
+        }
+
+    def hourly(self, since_hour: str = None):
+        """Rollup per jam: list {"hour", "prediction", "n", "avg_conf"} urut waktu."""
+        sql = "SELECT hour, prediction, SUM(n) AS n, SUM(sum_conf) AS s FROM scan_hourly"
+        args = []
+        if since_hour:
+            sql += " WHERE hour >= ?"
+            args.append(since_hour)
+        with self._lock:
+            rows = self._conn.execute(sql + " GROUP BY hour, prediction ORDER BY hour", args).fetchall()
+        return [{"hour": r["hour"], "prediction": r["prediction"], "n": r["n"], "avg_conf": r["s"] / r["n"]}
+                for r in rows]
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM scans")
+            self._conn.execute("DELETE FROM scan_agg")
+            self._conn.execute("DELETE FROM scan_hourly")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
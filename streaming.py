@@ -0,0 +1,147 @@
+import asyncio
+import json
+import time
+
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+
+# ----------------------------- LIVE FRAME STREAM -----------------------------
+# Satu koneksi WebSocket = satu FrameStream. Receiver selalu membaca socket (klien
+# tidak pernah tertahan TCP), tapi hanya frame TERBARU yang disimpan di satu slot:
+# kalau inferensi tertinggal, frame lama ditimpa (frame skipping). Processor memproses
+# slot satu per satu -> maksimal satu inferensi per klien pada satu waktu (backpressure).
+# Frame yang dHash-nya hampir sama dengan frame terakhir yang diprediksi tidak dikirim
+# ke model. Setelah tiap frame diproses server mengirim pesan; klien yang sopan
+# menunggu pesan itu sebelum mengirim frame berikutnya.
+#
+# Protokol:
+#   klien -> server: frame JPEG/PNG sebagai pesan binary; teks JSON {"species": "..."} untuk ganti komoditas
+#   server -> klien: {"type": "result" | "duplicate" | "rejected" | "skipped" | "error", "seq": n, ...}
+#   ("skipped" = melebihi max_fps; frame yang ditimpa di slot tidak dibalas)
+
+class FrameStream:
+    def __init__(self, ws: WebSocket, predict, frame_hash, species: str = "ikan",
+                 max_fps: float = 10.0, dedup_distance: int = 4, max_frame_bytes: int = 15 * 1024 * 1024,
+                 on_frame=None):
+        self.ws = ws
+        self.predict = predict          # async (bytes, species) -> dict
+        self.frame_hash = frame_hash    # async (bytes) -> int
+        self.species = species
+        self.min_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self.dedup_distance = dedup_distance
+        self.max_frame_bytes = max_frame_bytes
+        self.on_frame = on_frame or (lambda result: None)  # hook metrics: "processed", "dropped", ...
+
+        self._slot = None               # (seq, bytes, t_terima) frame terbaru yang belum diproses
+        self._ready = asyncio.Event()
+        self._closed = False
+        self.received = 0
+        self.dropped = 0                # ditimpa frame baru / melebihi max_fps
+        self.duplicates = 0
+        self.processed = 0
+        self._last_hash = None
+        self._last_seq = None
+        self._last_accept = 0.0
+
+    async def _send(self, msg: dict):
+        await self.ws.send_text(json.dumps(msg, ensure_ascii=False))
+
+    async def _receive(self):
+        try:
+            while True:
+                msg = await self.ws.receive()
+                if msg["type"] == "websocket.disconnect":
+                    return
+                if msg.get("text") is not None:
+                    await self._control(msg["text"])
+                    continue
+                data = msg.get("bytes")
+                if not data:
+                    continue
+                self.received += 1
+                seq = self.received
+                if len(data) > self.max_frame_bytes:
+                    self.dropped += 1
+                    self.on_frame("too_large")
+                    await self._send({"type": "error", "seq": seq, "error": "Frame melebihi batas ukuran."})
+                    continue
+                now = time.monotonic()
+                if now - self._last_accept < self.min_interval:
+                    self.dropped += 1
+                    self.on_frame("dropped")
+                    # dibalas supaya klien yang menunggu balasan tiap frame tidak menggantung
+                    await self._send({"type": "skipped", "seq": seq, "reason": "rate"})
+                    continue
+                self._last_accept = now
+                if self._slot is not None:
+                    self.dropped += 1  # processor tertinggal: frame lama dibuang
+                    self.on_frame("dropped")
+                self._slot = (seq, data, now)
+                self._ready.set()
+        except WebSocketDisconnect:
+            return
+        finally:
+            self._closed = True
+            self._ready.set()
+
+    async def _control(self, text: str):
+        try:
+            cmd = json.loads(text)
+        except ValueError:
+            await self._send({"type": "error", "error": "Pesan teks harus JSON."})
+            return
+        if isinstance(cmd, dict) and cmd.get("species"):
+            self.species = str(cmd["species"]).lower().strip()
+            self._last_hash = None  # komoditas lain -> hasil lama tidak berlaku
+
+    async def _process(self):
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            if self._closed:
+                return
+            if self._slot is None:
+                continue
+            seq, data, t_recv = self._slot
+            self._slot = None
+            base = {"seq": seq, "received": self.received, "dropped": self.dropped}
+
+            try:
+                h = await self.frame_hash(data)
+            except Exception:
+                h = None
+            if h is not None and self._last_hash is not None and (h ^ self._last_hash).bit_count() <= self.dedup_distance:
+                self.duplicates += 1
+                self.on_frame("duplicate")
+                await self._send({"type": "duplicate", "of": self._last_seq, **base})
+                continue
+
+            try:
+                res = await self.predict(data, self.species)
+            except HTTPException as e:
+                self.on_frame("rejected")
+                await self._send({"type": "rejected", "status": e.status_code, "error": e.detail, **base})
+                continue
+            except Exception as e:
+                # mis. frame JPEG terpotong: balas error untuk frame ini, stream tetap jalan
+                self.on_frame("error")
+                await self._send({"type": "error", "error": f"Frame gagal diproses: {type(e).__name__}: {e}", **base})
+                continue
+            self.processed += 1
+            self.on_frame("processed")
+            self._last_hash, self._last_seq = h, seq
+            await self._send({"type": "result", **res, **base,
+                              "latency_ms": round((time.monotonic() - t_recv) * 1000, 1)})
+
+    async def run(self):
+        receiver = asyncio.create_task(self._receive())
+        processor = asyncio.create_task(self._process())
+        try:
+            await asyncio.wait({receiver, processor}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for t in (receiver, processor):
+                t.cancel()
+            await asyncio.gather(receiver, processor, return_exceptions=True)
+
+    def stats(self):
+        return {"received": self.received, "dropped": self.dropped,
+                "duplicates": self.duplicates, "processed": self.processed}
@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import zipfile
+from io import BytesIO
+
+from PIL import Image
+
+# config dibaca saat import: data job di folder sementara, tanpa worker (job cukup diterima)
+DATA = tempfile.mkdtemp(prefix="smartfish-test-")
+os.environ.update({
+    "SMARTFISH_JOBS_DB": os.path.join(DATA, "jobs.db"),
+    "SMARTFISH_JOBS_DIR": os.path.join(DATA, "jobs"),
+    "SMARTFISH_IMAGE_DIR": os.path.join(DATA, "images"),
+    "SMARTFISH_DB": os.path.join(DATA, "smartfishid.db"),
+    "SMARTFISH_JOB_WORKERS": "0",
+    "SMARTFISH_JOB_MAX_ITEMS": "1100",
+})
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app_api
+
+def tiny_jpeg():
+    buf = BytesIO()
+    Image.new("RGB", (32, 32), (120, 80, 40)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app_api.app) as c:
+        yield c
+    shutil.rmtree(DATA, ignore_errors=True)
+
+def post_files(client, n):
+    data = tiny_jpeg()
+    return client.post("/jobs", files=[("files", (f"{i}.jpg", data, "image/jpeg")) for i in range(n)])
+
+def test_job_accepts_more_than_1000_files(client):
+    # default Starlette max_files=1000 tidak boleh memotong batas SMARTFISH_JOB_MAX_ITEMS
+    r = post_files(client, 1001)
+    assert r.status_code == 202, r.text
+    assert r.json()["total"] == 1001
+
+def test_job_over_limit_is_413(client):
+    r = post_files(client, 1101)
+    assert r.status_code == 413
+    assert "SMARTFISH_JOB_MAX_ITEMS" in r.json()["detail"]
+
+def test_job_species_per_item(client):
+    data = tiny_jpeg()
+    r = client.post("/jobs", files=[("files", ("a.jpg", data, "image/jpeg")), ("files", ("b.jpg", data, "image/jpeg"))],
+                    data={"species": ["ikan", "ayam", "daging"]})
+    assert r.status_code == 422
+
+def test_job_archive_over_limit_names_job_limit(client):
+    data = tiny_jpeg()
+    buf = BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for i in range(11):
+            zf.writestr(f"{i}.jpg", data)
+    files = [("files", (f"{i}.jpg", data, "image/jpeg")) for i in range(1090)]
+    files.append(("archive", ("a.zip", buf.getvalue(), "application/zip")))
+    r = client.post("/jobs", files=files)
+    assert r.status_code == 413
+    assert "per job" in r.json()["detail"]
@@ -0,0 +1,36 @@
+import pytest
+
+from jobs import JobLost, JobStore
+
+@pytest.fixture
+def store(tmp_path):
+    s = JobStore(str(tmp_path / "jobs.db"), str(tmp_path / "jobs"))
+    yield s
+    s.close()
+
+def new_job(store, n=3):
+    job_id = store.new_id()
+    store.create(job_id, [(f"{i}.jpg", f"{i:06d}.jpg", "ikan") for i in range(n)])
+    return job_id
+
+def test_requeued_job_is_not_double_counted(store):
+    job_id = new_job(store)
+    a = store.claim("a:1")
+    store.save_results(job_id, [(0, {"ok": True})], "a:1")
+
+    # heartbeat A terlambat: housekeeping proses lain mengantrekan ulang, B mengklaim
+    assert store.requeue_stale(stale_after=-1) == 1
+    b = store.claim("b:1")
+    assert a["worker"] == "a:1" and b["worker"] == "b:1"
+
+    # A yang masih jalan tidak boleh menyimpan / menyelesaikan job milik B
+    with pytest.raises(JobLost):
+        store.save_results(job_id, [(1, {"ok": True})], "a:1")
+    assert store.finish(job_id, "done", worker="a:1") is False
+
+    # B memproses ulang item 0 (sudah selesai) + sisanya: hanya item pending yang dihitung
+    assert store.save_results(job_id, [(0, {"ok": True}), (1, {"ok": False}), (2, {"ok": True})], "b:1") == 2
+    assert store.finish(job_id, "done", worker="b:1") is True
+    job = store.get(job_id)
+    assert (job["processed"], job["ok"], job["failed"], job["progress"]) == (3, 2, 1, 1.0)
+    assert job["status"] == "done"
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import time
+
+from fastapi import HTTPException
+
+# ----------------------------- STREAMING UPLOAD -----------------------------
+# Upload dibaca per chunk dari SpooledTemporaryFile milik Starlette:
+# digest di-update bertahap, tanpa `await file.read()` dan tanpa salinan
+# `img_bytes + species`. Decoder PIL membaca langsung dari file yang sama.
+
+CHUNK_SIZE = 64 * 1024
+
+def too_large(max_bytes: int):
+    return HTTPException(413, f"Ukuran upload melebihi batas {max_bytes // (1024 * 1024)} MB.")
+
+def stream_digest(fp, species: str, max_bytes: int, timings: list = None):
+    """sha256(isi file + species) secara bertahap; hasil sama dengan image_digest(bytes, species).
+
+    timings: list [detik baca, detik hash] yang ditambah (opsional, untuk /metrics).
+    """
+    h = hashlib.sha256()
+    size = 0
+    fp.seek(0)
+    if timings is None:
+        while True:
+            chunk = fp.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise too_large(max_bytes)
+            h.update(chunk)
+    else:
+        clock = time.perf_counter
+        read_s = hash_s = 0.0
+        while True:
+            t0 = clock()
+            chunk = fp.read(CHUNK_SIZE)
+            t1 = clock()
+            read_s += t1 - t0
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise too_large(max_bytes)
+            h.update(chunk)
+            hash_s += clock() - t1
+        timings[0] += read_s
+        timings[1] += hash_s
+    fp.seek(0)
+    h.update(species.encode("utf-8"))
+    return h.hexdigest(), size
+
+class BodySizeLimitMiddleware:
+    """Tolak body terlalu besar dengan 413 sebelum multipart selesai di-parse.
+
+    limits: {path: max_bytes}. Content-Length dicek di awal; untuk chunked
+    transfer, byte yang masuk dihitung dan parsing dihentikan begitu lewat batas.
+    """
+
+    def __init__(self, app, limits: dict):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        for k, v in scope.get("headers", []):
+            if k == b"content-length":
+                try:
+                    declared = int(v)
+                except ValueError:
+                    declared = 0
+                if declared > limit:
+                    await self._reject(send, limit)
+                    return
+                break
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # diubah jadi response 413 oleh exception handler FastAPI
+                    raise too_large(limit)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    async def _reject(self, send, limit: int):
+        body = json.dumps({"detail": too_large(limit).detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})